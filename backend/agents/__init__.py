@@ -5,4 +5,5 @@ from .embedding_agent import EmbeddingAgent
 from .llama3_llm import Llama3LLM
 from agents.langchain_integration import LangchainAgent
 from .azure_language_service import AzureLanguageService
-from .cache import async_cache
+from .cache import AsyncCache, async_cache, cache_stats, invalidate_namespace
+from .tiered_cache import SharedCacheStore, get_shared_store
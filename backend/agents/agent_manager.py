@@ -12,6 +12,8 @@ from agents.embedding_agent import EmbeddingAgent
 from agents.llama3_llm import Llama3LLM
 from agents.langchain_integration import LangchainAgent
 from agents.document_enhancer import DocumentEnhancer
+from agents.ingestion_worker import IngestionWorkerPool
+from agents.ann_index import local_index_from_config, train_periodically
 from config.config import Config  # Changed this line
 
 class AgentManager:
@@ -23,14 +25,16 @@ class AgentManager:
         self.embedding_agent = None
         self.llm = None
         self.langchain_agent = None
+        self.ingestion_jobs = None
+        self.local_index_trainer = None
 
     async def initialize(self):
         try:
             logging.info("Initializing AgentManager")
             self.search_agent = SearchAgent()
             self.indexing_agent = IndexingAgent()
-            self.ingestion_agent = DocumentIngestionAgent()
             self.embedding_agent = EmbeddingAgent()
+            self.ingestion_agent = DocumentIngestionAgent(embedding_agent=self.embedding_agent)
             self.llm = Llama3LLM()
 
             initialization_tasks = [
@@ -43,8 +47,24 @@ class AgentManager:
 
             await asyncio.gather(*initialization_tasks)
 
-            self.langchain_agent = LangchainAgent(self.search_agent, self.embedding_agent, self.llm)
+            local_index = local_index_from_config(self.config)
+            self.langchain_agent = LangchainAgent(self.search_agent, self.embedding_agent, self.llm, local_index=local_index)
             await self.langchain_agent.initialize()
+            if local_index is not None:
+                # Training is kept off the ingestion path, which only appends vectors
+                self.local_index_trainer = asyncio.create_task(
+                    train_periodically(local_index, self.config.LOCAL_INDEX_TRAIN_INTERVAL)
+                )
+
+            if self.config.INGESTION_WORKERS > 0:
+                self.ingestion_jobs = IngestionWorkerPool(
+                    db_path=self.config.INGESTION_JOB_DB_PATH,
+                    staging_dir=self.config.INGESTION_STAGING_DIR,
+                    processes=self.config.INGESTION_WORKERS,
+                    stale_after=self.config.INGESTION_JOB_STALE_SECONDS,
+                    block_size=self.config.INGESTION_BLOCK_SIZE
+                )
+                await self.ingestion_jobs.start()
 
             logging.info("AgentManager initialized successfully")
         except Exception as e:
@@ -52,13 +72,17 @@ class AgentManager:
             raise
 
     async def cleanup(self):
+        if self.local_index_trainer:
+            self.local_index_trainer.cancel()
+            self.local_index_trainer = None
         cleanup_tasks = [
             self.search_agent.cleanup() if self.search_agent else None,
             self.indexing_agent.cleanup() if self.indexing_agent else None,
             self.ingestion_agent.cleanup() if self.ingestion_agent else None,
             self.embedding_agent.cleanup() if self.embedding_agent else None,
             self.llm.cleanup() if self.llm else None,
-            self.langchain_agent.cleanup() if self.langchain_agent else None
+            self.langchain_agent.cleanup() if self.langchain_agent else None,
+            self.ingestion_jobs.stop() if self.ingestion_jobs else None
         ]
         await asyncio.gather(*[task for task in cleanup_tasks if task is not None])
 
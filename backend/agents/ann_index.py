@@ -0,0 +1,493 @@
+# ann_index.py
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+    fcntl_available = True
+except ImportError:
+    fcntl_available = False
+
+logger = logging.getLogger(__name__)
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+class IVFIndex:
+    """
+    In-process approximate nearest-neighbour index (inverted file, cosine distance) over
+    chunk embeddings, for serving vector lookups without a round trip to Azure AI Search.
+
+    Vectors live in `vectors.npy` and their list assignments in `assignments.npy`, both
+    opened memory-mapped, so every worker process shares one copy of the pages. Chunk ids
+    and their stored fields are kept in `index.db` (SQLite, WAL). Writers from any
+    process serialize on a lock file; readers pick up changes within `refresh_interval`
+    seconds.
+
+    Until the index holds `nlist * train_factor` vectors, searches are exact. From then
+    on vectors are grouped into `nlist` clusters (spherical k-means) and a search scans
+    only the `nprobe` clusters closest to the query: raise `nprobe` for recall, lower it
+    for latency. Adding only appends; training is a separate step (`maybe_train`, run
+    by `train_periodically` or `python -m agents.ann_index train`), needed first once the
+    index reaches that size and again once it has grown fourfold. Until then new vectors
+    join the nearest existing list. Deleted rows are skipped at search time and their
+    space is reclaimed on retraining.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        dimensions: int,
+        nlist: int = 1024,
+        nprobe: int = 16,
+        train_factor: int = 8,
+        refresh_interval: float = 1.0
+    ):
+        self.directory = directory
+        self.dimensions = dimensions
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_factor = train_factor
+        self.refresh_interval = refresh_interval
+        self.db_path = os.path.join(directory, "index.db")
+        self.vectors_path = os.path.join(directory, "vectors.npy")
+        self.assignments_path = os.path.join(directory, "assignments.npy")
+        self.centroids_path = os.path.join(directory, "centroids.npy")
+        self.lock_path = os.path.join(directory, "index.lock")
+        self._lock = threading.RLock()
+        self._version = None
+        # Changes whenever rows are renumbered (training, clearing), unlike `_version`
+        self._layout = None
+        self._checked_at = 0.0
+        self.vectors = None
+        self.assignments = None
+        self.centroids = None
+        self.count = 0
+        # Rows sorted by list number, and where each list starts in that order
+        self._order = np.empty(0, dtype=np.int64)
+        self._bounds = np.zeros(2, dtype=np.int64)
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows ("
+                "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, parent_id TEXT, document TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS rows_parent_id ON rows(parent_id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._refresh(force=True)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl_available:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh(force=True)
+                yield
+            finally:
+                if fcntl_available:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Reading state
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection) -> Dict[str, str]:
+        return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            with self._connect() as conn:
+                meta = self._meta(conn)
+            if meta.get("version") == self._version and self.vectors is not None:
+                return
+            self._version = meta.get("version")
+            self._layout = meta.get("layout")
+            self.count = int(meta.get("count", 0))
+            if os.path.exists(self.vectors_path):
+                self.vectors = np.load(self.vectors_path, mmap_mode="r")
+                self.assignments = np.load(self.assignments_path, mmap_mode="r")
+            else:
+                self.vectors = np.empty((0, self.dimensions), dtype=np.float32)
+                self.assignments = np.empty(0, dtype=np.int32)
+            self.centroids = np.load(self.centroids_path) if meta.get("trained") == "1" else None
+            lists = 1 if self.centroids is None else len(self.centroids)
+            assignments = np.asarray(self.assignments[:self.count])
+            self._order = np.argsort(assignments, kind="stable")
+            # Deleted rows (-1) sort first and fall outside every list's range
+            self._bounds = np.searchsorted(assignments[self._order], np.arange(lists + 1))
+
+    def _list_rows(self, list_no: int) -> np.ndarray:
+        return self._order[self._bounds[list_no]:self._bounds[list_no + 1]]
+
+    def _live_rows(self) -> np.ndarray:
+        return self._order[self._bounds[0]:self._bounds[-1]]
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._live_rows())
+
+    # Writing
+
+    def _bump_version(self, conn: sqlite3.Connection, renumbered: bool = False, **values):
+        values["version"] = f"{time.time_ns()}-{os.getpid()}"
+        if renumbered:
+            values["layout"] = values["version"]
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()]
+        )
+
+    def _grow(self, needed: int):
+        capacity = len(self.vectors)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        # Write the larger copies next to the live files and swap them in atomically;
+        # readers keep their mapping of the old files until they refresh
+        for path, shape, dtype, fill, current in (
+            (self.vectors_path, (capacity, self.dimensions), np.float32, 0.0, self.vectors),
+            (self.assignments_path, (capacity,), np.int32, -1, self.assignments),
+        ):
+            tmp_path = f"{path}.tmp.npy"
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            grown[:] = fill
+            grown[:len(current)] = current
+            grown.flush()
+            del grown
+            os.replace(tmp_path, path)
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+        self.assignments = np.load(self.assignments_path, mmap_mode="r+")
+
+    def _writable(self):
+        # Readers map the files read-only; a writer remaps them for update
+        if os.path.exists(self.vectors_path) and getattr(self.vectors, "mode", None) != "r+":
+            self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+            self.assignments = np.load(self.assignments_path, mmap_mode="r+")
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(np.asarray(vectors) @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _remove_rows(self, conn: sqlite3.Connection, rows: List[int]):
+        if rows:
+            self._writable()
+            self.assignments[np.array(rows, dtype=np.int64)] = -1
+            conn.executemany("DELETE FROM rows WHERE row = ?", [(row,) for row in rows])
+
+    def _rows_for(self, conn: sqlite3.Connection, column: str, values: Sequence[str]) -> List[int]:
+        rows = []
+        for i in range(0, len(values), 500):
+            batch = list(values[i:i + 500])
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(row for (row,) in conn.execute(f"SELECT row FROM rows WHERE {column} IN ({placeholders})", batch))
+        return rows
+
+    def _add(self, ids: List[str], vectors, documents: Optional[List[Dict[str, Any]]] = None):
+        if not ids:
+            return
+        vectors = _unit_rows(vectors)
+        documents = documents or [{"id": chunk_id} for chunk_id in ids]
+        with self._write_lock(), self._connect() as conn:
+            # Re-adding an id replaces its vector
+            self._remove_rows(conn, self._rows_for(conn, "id", ids))
+            first = self.count
+            self._grow(first + len(ids))
+            self._writable()
+            self.vectors[first:first + len(ids)] = vectors
+            self.assignments[first:first + len(ids)] = self._assign(vectors)
+            self.vectors.flush()
+            self.assignments.flush()
+            conn.executemany(
+                "INSERT INTO rows (row, id, parent_id, document) VALUES (?, ?, ?, ?)",
+                [
+                    (first + i, chunk_id, document.get("parent_id"), json.dumps(document, ensure_ascii=False, default=str))
+                    for i, (chunk_id, document) in enumerate(zip(ids, documents))
+                ]
+            )
+            self.count = first + len(ids)
+            self._bump_version(conn, count=self.count)
+        self._refresh(force=True)
+
+    def _delete(self, ids: Sequence[str] = (), parent_ids: Sequence[str] = ()):
+        with self._write_lock(), self._connect() as conn:
+            rows = self._rows_for(conn, "id", list(ids)) + self._rows_for(conn, "parent_id", list(parent_ids))
+            if not rows:
+                return
+            self._remove_rows(conn, sorted(set(rows)))
+            self.assignments.flush()
+            self._bump_version(conn)
+        self._refresh(force=True)
+
+    def _update_documents(self, documents: List[Dict[str, Any]]):
+        # Merge changed fields into the stored documents; vectors are unaffected
+        with self._connect() as conn:
+            found = {}
+            ids = [document["id"] for document in documents]
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(conn.execute(f"SELECT id, document FROM rows WHERE id IN ({placeholders})", batch).fetchall())
+            updates = []
+            for document in documents:
+                if document["id"] in found:
+                    stored = json.loads(found[document["id"]])
+                    stored.update(document)
+                    updates.append((json.dumps(stored, ensure_ascii=False, default=str), document["id"]))
+            conn.executemany("UPDATE rows SET document = ? WHERE id = ?", updates)
+
+    def _clear(self):
+        with self._write_lock(), self._connect() as conn:
+            conn.execute("DELETE FROM rows")
+            conn.execute("DELETE FROM meta")
+            for path in (self.vectors_path, self.assignments_path, self.centroids_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.vectors = None
+            self._bump_version(conn, renumbered=True, count=0)
+        self._refresh(force=True)
+
+    # Training
+
+    def _needs_training(self) -> bool:
+        live = len(self._live_rows())
+        if live < self.nlist * self.train_factor:
+            return False
+        with self._connect() as conn:
+            trained_size = int(self._meta(conn).get("trained_size", 0))
+        return self.centroids is None or live >= 4 * trained_size
+
+    def _maybe_train(self) -> bool:
+        self._refresh(force=True)
+        return self._needs_training() and self._train(only_if_needed=True)
+
+    def _kmeans(self, sample: np.ndarray, iterations: int = 10) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=self.nlist) == 0
+            # Reseed empty clusters with random points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            centroids = _unit_rows(sums)
+        return centroids
+
+    def _train(self, only_if_needed: bool = False) -> bool:
+        """Cluster the live vectors and rewrite the store in cluster order, dropping deleted rows."""
+        with self._write_lock(), self._connect() as conn:
+            # Another process may have trained while this one waited for the lock
+            if only_if_needed and not self._needs_training():
+                return False
+            live = np.sort(self._live_rows())
+            if len(live) < self.nlist:
+                return False
+            rng = np.random.default_rng(0)
+            sample_rows = np.sort(rng.choice(live, min(len(live), self.nlist * 64), replace=False))
+            self.centroids = self._kmeans(np.asarray(self.vectors[sample_rows]))
+            assignments = np.concatenate([
+                self._assign(self.vectors[live[start:start + 65536]]) for start in range(0, len(live), 65536)
+            ])
+            order = np.argsort(assignments, kind="stable")
+            new_rows = live[order]
+
+            # Cluster-ordered copy: each list is a contiguous range of the new file
+            capacity = max(len(live) * 2, 1024)
+            tmp_vectors = f"{self.vectors_path}.tmp.npy"
+            tmp_assignments = f"{self.assignments_path}.tmp.npy"
+            vectors = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=np.float32, shape=(capacity, self.dimensions))
+            for start in range(0, len(new_rows), 65536):
+                block = new_rows[start:start + 65536]
+                vectors[start:start + len(block)] = self.vectors[block]
+            vectors.flush()
+            new_assignments = np.lib.format.open_memmap(tmp_assignments, mode="w+", dtype=np.int32, shape=(capacity,))
+            new_assignments[:] = -1
+            new_assignments[:len(live)] = assignments[order]
+            new_assignments.flush()
+            del vectors, new_assignments
+
+            conn.execute("CREATE TEMP TABLE renumber (old INTEGER PRIMARY KEY, new INTEGER NOT NULL)")
+            conn.executemany("INSERT INTO renumber (old, new) VALUES (?, ?)", zip(new_rows.tolist(), range(len(new_rows))))
+            # Shift rows out of the way first so the new numbers never collide with old ones
+            offset = self.count + 1
+            conn.execute("UPDATE rows SET row = row + ?", (offset,))
+            conn.execute(
+                "UPDATE rows SET row = (SELECT new FROM renumber WHERE old = rows.row - ?)",
+                (offset,)
+            )
+            np.save(f"{self.centroids_path}.tmp.npy", self.centroids)
+            os.replace(f"{self.centroids_path}.tmp.npy", self.centroids_path)
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_assignments, self.assignments_path)
+            self.vectors = None
+            self.count = len(live)
+            self._bump_version(conn, renumbered=True, count=self.count, trained="1", trained_size=len(live))
+        self._refresh(force=True)
+        logger.info(f"Trained local vector index: {len(live)} vectors in {len(self.centroids)} lists")
+        return True
+
+    # Searching
+
+    def _search(self, queries, k: int, nprobe: Optional[int] = None, attempts: int = 5) -> List[List[Tuple[str, float]]]:
+        queries = _unit_rows(queries)
+        nprobe = nprobe or self.nprobe
+        self._refresh()
+        for _ in range(attempts):
+            with self._lock:
+                vectors, centroids, layout = self.vectors, self.centroids, self._layout
+                if centroids is None:
+                    probes = [[0]] * len(queries)
+                else:
+                    probe_count = min(nprobe, len(centroids))
+                    probes = np.argpartition(-(queries @ centroids.T), probe_count - 1, axis=1)[:, :probe_count]
+                candidates = [np.concatenate([self._list_rows(l) for l in query_probes]) for query_probes in probes]
+
+            hits = []
+            for query, rows in zip(queries, candidates):
+                if not len(rows):
+                    hits.append([])
+                    continue
+                rows = np.sort(rows)
+                scores = np.asarray(vectors[rows]) @ query
+                top = min(k, len(rows))
+                best = np.argpartition(-scores, top - 1)[:top]
+                best = best[np.argsort(-scores[best], kind="stable")]
+                hits.append([(int(rows[i]), 1.0 - float(scores[i])) for i in best])
+
+            ids, current_layout = self._ids_for_rows(sorted({row for query_hits in hits for row, _ in query_hits}))
+            if current_layout == layout:
+                # Rows deleted since the last refresh are dropped
+                return [[(ids[row], distance) for row, distance in query_hits if row in ids] for query_hits in hits]
+            # Another process renumbered the rows after the snapshot was taken
+            self._refresh(force=True)
+        raise RuntimeError("Local vector index was renumbered during every search attempt")
+
+    def _ids_for_rows(self, rows: List[int]) -> Tuple[Dict[int, str], Optional[str]]:
+        """Chunk ids of `rows` and the layout they belong to, read in one transaction."""
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            layout = self._meta(conn).get("layout")
+            ids = {}
+            for i in range(0, len(rows), 500):
+                batch = rows[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                ids.update(conn.execute(f"SELECT row, id FROM rows WHERE row IN ({placeholders})", batch).fetchall())
+        return ids, layout
+
+    def _get_documents(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(ids), 500):
+                batch = list(ids[i:i + 500])
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    (chunk_id, json.loads(document))
+                    for chunk_id, document in conn.execute(f"SELECT id, document FROM rows WHERE id IN ({placeholders})", batch)
+                )
+        return found
+
+    # Async interface
+
+    async def add(self, ids: List[str], vectors, documents: Optional[List[Dict[str, Any]]] = None):
+        """Add or replace vectors; `documents` are the chunk fields returned with search hits."""
+        await asyncio.to_thread(self._add, ids, vectors, documents)
+
+    async def add_chunks(self, chunks: List[Dict[str, Any]]):
+        """Add embedded chunk documents (with `contentVector`) under their ids."""
+        chunks = [chunk for chunk in chunks if chunk.get("contentVector") is not None]
+        if chunks:
+            await self.add(
+                [chunk["id"] for chunk in chunks],
+                [chunk["contentVector"] for chunk in chunks],
+                [{key: value for key, value in chunk.items() if key != "contentVector"} for chunk in chunks]
+            )
+
+    async def delete(self, ids: Sequence[str] = (), parent_ids: Sequence[str] = ()):
+        """Remove chunks by id and/or every chunk of the given parent documents."""
+        await asyncio.to_thread(self._delete, ids, parent_ids)
+
+    async def update_documents(self, documents: List[Dict[str, Any]]):
+        """Merge fields (keyed by `id`) into stored chunk documents, like SearchClient.merge_documents."""
+        if documents:
+            await asyncio.to_thread(self._update_documents, documents)
+
+    async def clear(self):
+        await asyncio.to_thread(self._clear)
+
+    async def train(self):
+        await asyncio.to_thread(self._train)
+
+    async def maybe_train(self) -> bool:
+        """Train if the index has reached its training size or grown fourfold since; True if it did."""
+        return await asyncio.to_thread(self._maybe_train)
+
+    async def search(self, queries, k: int = 5, nprobe: Optional[int] = None) -> List[List[Tuple[str, float]]]:
+        """(id, cosine distance) of the `k` nearest chunks for each query vector, closest first."""
+        return await asyncio.to_thread(self._search, queries, k, nprobe)
+
+    async def get_documents(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        return await asyncio.to_thread(self._get_documents, list(ids))
+
+
+async def train_periodically(index: IVFIndex, interval: float):
+    """Background task: check every `interval` seconds whether `index` needs training."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await index.maybe_train()
+        except Exception as e:
+            logger.error(f"Error training local vector index: {str(e)}")
+
+
+def local_index_from_config(config) -> Optional[IVFIndex]:
+    """The shared local vector index when LOCAL_INDEX_ENABLED is set, else None."""
+    if not config.LOCAL_INDEX_ENABLED:
+        return None
+    return IVFIndex(
+        config.LOCAL_INDEX_DIR,
+        config.AZURE_OPENAI_EMBEDDING_DIMENSIONS,
+        nlist=config.LOCAL_INDEX_NLIST,
+        nprobe=config.LOCAL_INDEX_NPROBE
+    )
+
+
+if __name__ == "__main__":
+    # Train the local index now instead of waiting for the background check:
+    #   python -m agents.ann_index train
+    from config.config import Config
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 2 or sys.argv[1] != "train":
+        sys.exit("usage: python -m agents.ann_index train")
+    local_index = local_index_from_config(Config)
+    if local_index is None:
+        sys.exit("LOCAL_INDEX_ENABLED is not set")
+    asyncio.run(local_index.train())
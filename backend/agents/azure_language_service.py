@@ -3,10 +3,11 @@ import asyncio
 import json
 import sys
 import logging
+from typing import List
 
 try:
     from azure.core.credentials import AzureKeyCredential
-    from azure.ai.textanalytics import TextAnalyticsClient
+    from azure.ai.textanalytics.aio import TextAnalyticsClient
     azure_sdk_available = True
 except ImportError:
     azure_sdk_available = False
@@ -16,8 +17,23 @@ from config.config import Config
 logger = logging.getLogger(__name__)
 
 class AzureLanguageService:
-    def __init__(self):
+    """
+    Text Analytics enrichment on the async client. Every operation takes a list of
+    texts, splits it into requests of at most the service's per-request document limit
+    and sends them concurrently, bounded by ENRICHMENT_CONCURRENCY requests in flight
+    across all operations.
+    """
+
+    # Maximum documents per request for each operation
+    BATCH_LIMITS = {"summary": 25, "language": 1000, "entities": 5, "key_phrases": 10}
+
+    def __init__(self, concurrency: int = None):
         self.client = None
+        self.api_version = Config.AZURE_LANGUAGE_API_VERSION
+        # Cached results are only reused for the same service API version
+        self.cache_namespace = f"azure-language:{self.api_version}"
+        self.concurrency = concurrency or Config.ENRICHMENT_CONCURRENCY
+        self.semaphore = asyncio.Semaphore(self.concurrency)
 
     async def initialize(self):
         if not azure_sdk_available:
@@ -30,66 +46,95 @@ class AzureLanguageService:
         try:
             self.client = TextAnalyticsClient(
                 endpoint=config.AZURE_LANGUAGE_SERVICE_ENDPOINT,
-                credential=AzureKeyCredential(str(config.AZURE_LANGUAGE_SERVICE_API_KEY))
+                credential=AzureKeyCredential(str(config.AZURE_LANGUAGE_SERVICE_API_KEY)),
+                api_version=self.api_version
             )
             logger.info("AzureLanguageService initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing AzureLanguageService: {str(e)}")
             raise
 
+    async def _run_batched(self, operation, texts, call, default):
+        # Split `texts` into per-request batches, run them concurrently and return one
+        # result per text in input order; failed requests or documents get `default`
+        limit = self.BATCH_LIMITS[operation]
+
+        async def run_batch(batch):
+            try:
+                async with self.semaphore:
+                    return await call(batch)
+            except Exception as e:
+                logger.error(f"Error running {operation} on a batch of {len(batch)} texts: {str(e)}")
+                return [default] * len(batch)
+
+        batches = [texts[i:i + limit] for i in range(0, len(texts), limit)]
+        results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        return [result for batch_results in results for result in batch_results]
+
+    async def generate_summaries(self, texts: List[str]) -> List[str]:
+        async def call(batch):
+            poller = await self.client.begin_extract_summary(batch)
+            summaries = []
+            async for result in await poller.result():
+                if not result.is_error and result.kind == "ExtractiveSummarization":
+                    summaries.append(" ".join([sentence.text for sentence in result.sentences]))
+                else:
+                    summaries.append("")
+            return summaries
+        return await self._run_batched("summary", texts, call, "")
+
+    async def detect_languages(self, texts: List[str]) -> List[str]:
+        async def call(batch):
+            results = await self.client.detect_language(batch)
+            return ["Unknown" if result.is_error else result.primary_language.name for result in results]
+        return await self._run_batched("language", texts, call, "Unknown")
+
+    async def recognize_entities_batch(self, texts: List[str]) -> List[list]:
+        async def call(batch):
+            results = await self.client.recognize_entities(batch)
+            return [[] if result.is_error else
+                    [{"text": entity.text, "category": entity.category, "confidence_score": entity.confidence_score}
+                     for entity in result.entities]
+                    for result in results]
+        return await self._run_batched("entities", texts, call, [])
+
+    async def extract_key_phrases_batch(self, texts: List[str]) -> List[list]:
+        async def call(batch):
+            results = await self.client.extract_key_phrases(batch)
+            return [[] if result.is_error else result.key_phrases for result in results]
+        return await self._run_batched("key_phrases", texts, call, [])
+
     async def generate_summary(self, text: str) -> str:
-        try:
-            poller = self.client.begin_extract_summary([text])
-            extract_summary_results = poller.result()
-            for result in extract_summary_results:
-                if result.kind == "ExtractiveSummarization":
-                    return " ".join([sentence.text for sentence in result.sentences])
-            return ""
-        except Exception as e:
-            logger.error(f"Error generating summary: {str(e)}")
-            return ""
+        return (await self.generate_summaries([text]))[0]
 
     async def detect_language(self, text: str) -> str:
-        try:
-            result = self.client.detect_language([text])[0]
-            return result.primary_language.name
-        except Exception as e:
-            logger.error(f"Error detecting language: {str(e)}")
-            return "Unknown"
+        return (await self.detect_languages([text]))[0]
 
     async def recognize_entities(self, text: str) -> list:
-        try:
-            result = self.client.recognize_entities([text])[0]
-            return [{"text": entity.text, "category": entity.category, "confidence_score": entity.confidence_score}
-                    for entity in result.entities]
-        except Exception as e:
-            logger.error(f"Error recognizing entities: {str(e)}")
-            return []
+        return (await self.recognize_entities_batch([text]))[0]
 
     async def extract_key_phrases(self, text: str) -> list:
-        try:
-            result = self.client.extract_key_phrases([text])[0]
-            return result.key_phrases
-        except Exception as e:
-            logger.error(f"Error extracting key phrases: {str(e)}")
-            return []
+        return (await self.extract_key_phrases_batch([text]))[0]
 
     async def cleanup(self):
         if self.client:
+            await self.client.close()
             self.client = None
         logger.info("AzureLanguageService cleanup completed.")
 
 async def main(text):
     service = AzureLanguageService()
     await service.initialize()
-    
-    summary = await service.generate_summary(text)
-    language = await service.detect_language(text)
-    entities = await service.recognize_entities(text)
-    key_phrases = await service.extract_key_phrases(text)
-    
+
+    summary, language, entities, key_phrases = await asyncio.gather(
+        service.generate_summary(text),
+        service.detect_language(text),
+        service.recognize_entities(text),
+        service.extract_key_phrases(text)
+    )
+
     await service.cleanup()
-    
+
     return json.dumps({
         "summary": summary,
         "language": language,
@@ -100,4 +145,4 @@ async def main(text):
 if __name__ == "__main__":
     input_text = sys.argv[1]
     result = asyncio.run(main(input_text))
-    print(result)
\ No newline at end of file
+    print(result)
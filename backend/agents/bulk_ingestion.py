@@ -0,0 +1,316 @@
+# bulk_ingestion.py
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def collect_sources(path: str) -> List[Tuple[str, str]]:
+    """
+    Resolve a bulk ingestion target into (blob name, file path) pairs. `path` is either a
+    directory, which is walked recursively, a JSON manifest holding a list of paths or
+    {"name": ..., "path": ...} objects, or a text manifest with one path per line.
+    """
+    if os.path.isdir(path):
+        sources = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for file_name in sorted(files):
+                if file_name.startswith('.'):
+                    continue
+                file_path = os.path.join(root, file_name)
+                sources.append((os.path.relpath(file_path, path).replace(os.sep, '/'), file_path))
+        return sources
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as manifest:
+        if path.endswith('.json'):
+            entries = json.load(manifest)
+        else:
+            entries = [line.strip() for line in manifest if line.strip() and not line.startswith('#')]
+
+    sources = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            file_path, name = entry["path"], entry.get("name")
+        else:
+            file_path, name = entry, None
+        file_path = os.path.join(base_dir, file_path)
+        sources.append((name or os.path.basename(file_path), file_path))
+    return sources
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, items: int, started: float, error: bool = False):
+        ended = time.perf_counter()
+        self.items += items
+        self.errors += int(error)
+        self.busy_seconds += ended - started
+        self.first_start = started if self.first_start is None else min(self.first_start, started)
+        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+
+    def as_dict(self) -> Dict[str, Any]:
+        active = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        return {
+            "items": self.items,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "active_seconds": round(active, 3),
+            "items_per_second": round(self.items / active, 2) if active > 0 else 0.0,
+        }
+
+
+class _DocumentState:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.parent = None
+        self.known_chunks = {}
+        self.chunk_numbers = {}
+        self.unchanged = False
+        self.expected_chunks = None
+        self.indexed_chunks = 0
+        self.failed = False
+        self.finished = False
+
+
+class BulkIngestionPipeline:
+    """
+    Concurrent blob → parse → enrich → embed → index pipeline over many documents.
+    Stages run as independent worker groups connected by bounded queues, so network
+    waits in one stage overlap with work in the others while memory stays bounded by
+    `queue_size`. Per-stage item counts and throughput are reported at the end.
+    """
+
+    def __init__(
+        self,
+        agent,
+        queue_size: int = 8,
+        upload_workers: int = 4,
+        parse_workers: int = 2,
+        enrich_workers: int = 2,
+        index_workers: int = 2,
+        enrichment: Optional[str] = None
+    ):
+        self.agent = agent
+        self.queue_size = queue_size
+        self.upload_workers = upload_workers
+        self.parse_workers = parse_workers
+        self.enrich_workers = enrich_workers
+        self.enrichment = enrichment
+        self.index_workers = index_workers
+        self.stats = {name: StageStats(name) for name in ("upload", "parse", "enrich", "embed", "index")}
+        self.documents: Dict[str, _DocumentState] = {}
+        self.failed: Dict[str, str] = {}
+        self.duplicates: List[Dict[str, str]] = []
+
+    def _fail(self, parent_ids: Iterable[str], error: Exception):
+        for parent_id in set(parent_ids):
+            state = self.documents.get(parent_id)
+            if state and not state.failed:
+                state.failed = True
+                self.failed[state.filename] = str(error)
+                logger.error(f"Bulk ingestion failed for {state.filename}: {str(error)}")
+
+    async def _maybe_finish(self, parent_id: str):
+        state = self.documents[parent_id]
+        if state.failed or state.finished or state.expected_chunks is None:
+            return
+        if state.indexed_chunks < state.expected_chunks:
+            return
+        state.finished = True
+        try:
+            await self.agent.finalize_document(state.parent, state.known_chunks, state.chunk_numbers)
+            logger.info(f"Document {state.filename} indexed successfully: {state.expected_chunks} of {len(state.chunk_numbers)} chunks changed")
+        except Exception as e:
+            state.finished = False
+            self._fail([parent_id], e)
+
+    @staticmethod
+    async def _drain(queue: asyncio.Queue):
+        # Each worker consumes items until it receives its own sentinel
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            yield item
+
+    async def _feed(self, sources, upload_q: asyncio.Queue):
+        try:
+            for filename, source in sources:
+                # Two sources mapping to one document id would overwrite each other's chunks
+                parent_id = self.agent.sanitize_filename(filename)
+                if parent_id in self.documents:
+                    first = self.documents[parent_id].filename
+                    logger.warning(f"Skipping {filename}: document id {parent_id} is already used by {first}")
+                    self.duplicates.append({"filename": filename, "document_id": parent_id, "duplicate_of": first})
+                    continue
+                self.documents[parent_id] = _DocumentState(filename)
+                await upload_q.put((parent_id, filename, source))
+        finally:
+            for _ in range(self.upload_workers):
+                await upload_q.put(_DONE)
+
+    async def _upload_worker(self, upload_q: asyncio.Queue, parse_q: asyncio.Queue):
+        async for parent_id, filename, source in self._drain(upload_q):
+            started = time.perf_counter()
+            try:
+                path, is_temporary = await self.agent.upload_blob(filename, source)
+                self.stats["upload"].record(1, started)
+            except Exception as e:
+                self.stats["upload"].record(0, started, error=True)
+                self._fail([parent_id], e)
+                continue
+            await parse_q.put((parent_id, path, is_temporary))
+
+    async def _parse_worker(self, parse_q: asyncio.Queue, enrich_q: asyncio.Queue):
+        batch_size = self.agent.config.INGESTION_ENRICH_BATCH_SIZE
+        async for parent_id, path, is_temporary in self._drain(parse_q):
+            state = self.documents[parent_id]
+            started = time.perf_counter()
+            try:
+                parsed = await self.agent.parse_document(state.filename, path)
+            except Exception as e:
+                self.stats["parse"].record(0, started, error=True)
+                self._fail([parent_id], e)
+                continue
+            finally:
+                if is_temporary:
+                    os.remove(path)
+            parent = parsed.parent
+            state.parent = parent
+            count = 0
+            with parsed:
+                try:
+                    state.known_chunks = await self.agent.plan_reindex(parent)
+                    if state.known_chunks is None:
+                        state.unchanged = state.finished = True
+                        logger.info(f"Document {state.filename} is unchanged, skipping indexing")
+                        continue
+                    batches = self.agent.iter_changed_batches(parsed, state.known_chunks, state.chunk_numbers, batch_size)
+                    async for batch in batches:
+                        count += len(batch)
+                        self.stats["parse"].record(len(batch), started)
+                        await enrich_q.put(batch)
+                        started = time.perf_counter()
+                except Exception as e:
+                    self.stats["parse"].record(0, started, error=True)
+                    self._fail([parent_id], e)
+                    continue
+            state.expected_chunks = count
+            await self._maybe_finish(parent_id)
+
+    async def _enrich_worker(self, enrich_q: asyncio.Queue, embed_q: asyncio.Queue):
+        async for batch in self._drain(enrich_q):
+            started = time.perf_counter()
+            try:
+                batch = await self.agent.enrich_chunks(batch, self.enrichment)
+                self.stats["enrich"].record(len(batch), started)
+            except Exception as e:
+                self.stats["enrich"].record(0, started, error=True)
+                self._fail([chunk["parent_id"] for chunk in batch], e)
+                continue
+            await embed_q.put(batch)
+
+    async def _embed_stage(self, embed_q: asyncio.Queue, index_q: asyncio.Queue):
+        async def chunks():
+            async for batch in self._drain(embed_q):
+                for chunk in batch:
+                    yield chunk
+
+        def on_error(batch, error):
+            self.stats["embed"].record(0, time.perf_counter(), error=True)
+            self._fail([chunk["parent_id"] for chunk in batch], error)
+
+        index_batch_size = self.agent.config.INDEX_BATCH_SIZE
+        started = time.perf_counter()
+        async for embedded in self.agent.embedding_stage.embed(chunks(), on_error=on_error):
+            self.stats["embed"].record(len(embedded), started)
+            for i in range(0, len(embedded), index_batch_size):
+                await index_q.put(embedded[i:i + index_batch_size])
+            started = time.perf_counter()
+
+    async def _index_worker(self, index_q: asyncio.Queue):
+        async for batch in self._drain(index_q):
+            batch = [chunk for chunk in batch if not self.documents[chunk["parent_id"]].failed]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                await self.agent.index_batch(batch)
+                self.stats["index"].record(len(batch), started)
+            except Exception as e:
+                self.stats["index"].record(0, started, error=True)
+                self._fail([chunk["parent_id"] for chunk in batch], e)
+                continue
+            parent_ids = set()
+            for chunk in batch:
+                self.documents[chunk["parent_id"]].indexed_chunks += 1
+                parent_ids.add(chunk["parent_id"])
+            for parent_id in parent_ids:
+                await self._maybe_finish(parent_id)
+
+    async def _group(self, workers: List, queue: Optional[asyncio.Queue], downstream: int):
+        # Run one stage's workers and signal the next stage once all of them are done
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            if queue is not None:
+                for _ in range(downstream):
+                    await queue.put(_DONE)
+
+    async def run(self, sources: Iterable[Tuple[str, Any]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        upload_q = asyncio.Queue(self.queue_size)
+        parse_q = asyncio.Queue(self.queue_size)
+        enrich_q = asyncio.Queue(self.queue_size)
+        embed_q = asyncio.Queue(self.queue_size)
+        index_q = asyncio.Queue(self.queue_size)
+
+        stages = [
+            self._feed(sources, upload_q),
+            self._group([self._upload_worker(upload_q, parse_q) for _ in range(self.upload_workers)], parse_q, self.parse_workers),
+            self._group([self._parse_worker(parse_q, enrich_q) for _ in range(self.parse_workers)], enrich_q, self.enrich_workers),
+            self._group([self._enrich_worker(enrich_q, embed_q) for _ in range(self.enrich_workers)], embed_q, 1),
+            self._group([self._embed_stage(embed_q, index_q)], index_q, self.index_workers),
+            self._group([self._index_worker(index_q) for _ in range(self.index_workers)], None, 0),
+        ]
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        for parent_id, state in self.documents.items():
+            if not state.finished and not state.failed:
+                self._fail([parent_id], RuntimeError("Document did not complete the pipeline"))
+
+        elapsed = time.perf_counter() - started
+        succeeded = [state.filename for state in self.documents.values() if state.finished and not state.failed]
+        report = {
+            "files": len(self.documents),
+            "succeeded": succeeded,
+            "unchanged": [state.filename for state in self.documents.values() if state.unchanged],
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_second": round(len(succeeded) / elapsed, 2) if elapsed > 0 else 0.0,
+            "stages": {name: stats.as_dict() for name, stats in self.stats.items()},
+        }
+        logger.info(f"Bulk ingestion finished: {len(succeeded)}/{len(self.documents)} documents in {elapsed:.2f}s")
+        return report
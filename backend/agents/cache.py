@@ -1,17 +1,267 @@
 # cache.py
-from functools import wraps
-from cachetools import TTLCache
 import asyncio
+import hashlib
+import inspect
+import logging
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+from cachetools import LRUCache, TTLCache
+
+from .tiered_cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+CACHE_POLICIES = ("lru", "ttl")
+
+# Every AsyncCache by namespace, for stats and invalidation from outside the decorated function
+_caches: Dict[str, "AsyncCache"] = {}
+
+
+def _freeze(value: Any) -> Any:
+    """A hashable, repr-stable stand-in for `value`; raises TypeError for objects without one."""
+    if value is None or isinstance(value, (str, bytes, bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return ("set", tuple(sorted(repr(_freeze(item)) for item in value)))
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((repr(_freeze(k)), _freeze(v)) for k, v in value.items())))
+    if isinstance(value, np.ndarray):
+        return ("ndarray", str(value.dtype), value.shape, hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest())
+    # Default reprs embed the object's address, and distinct objects must not share a key
+    if type(value).__repr__ is object.__repr__:
+        raise TypeError(f"Cannot build a cache key from a {type(value).__qualname__}; pass key= or ignore= to async_cache")
+    return repr(value)
+
+
+def make_key(*args, **kwargs) -> str:
+    """Stable hash of call arguments; equal arguments give the same key in every process."""
+    frozen = (_freeze(args), _freeze(kwargs))
+    return hashlib.sha256(repr(frozen).encode("utf-8")).hexdigest()
+
+
+class _CountingLRU(LRUCache):
+    def __init__(self, maxsize: int, owner: "AsyncCache"):
+        super().__init__(maxsize)
+        self.owner = owner
+
+    def popitem(self):
+        item = super().popitem()
+        self.owner.evictions += 1
+        return item
+
+
+class _CountingTTL(TTLCache):
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float], owner: "AsyncCache"):
+        super().__init__(maxsize, ttl, timer)
+        self.owner = owner
+
+    def popitem(self):
+        item = super().popitem()
+        self.owner.evictions += 1
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.owner.expirations += len(expired)
+        return expired
+
+
+class AsyncCache:
+    """
+    Cache of coroutine results for one namespace, with an LRU or TTL policy. Concurrent
+    misses on the same key are single-flight: the first caller starts one computation task
+    and every caller awaits it, so cancelling any of them (the first included) leaves the
+    others waiting. Errors are passed to every waiter and not cached.
+
+    With a `store` (see `tiered_cache.SharedCacheStore`) the in-process entries are the
+    first tier: misses are looked up in the store, which every worker process on the node
+    shares, before computing, and computed values are written to both tiers.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 100, ttl: Optional[float] = 300, policy: str = "ttl",
+                 timer: Callable[[], float] = time.monotonic, store: Any = None):
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.namespace = namespace
+        self.policy = policy
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._pending_deletes = set()
+        # Bumped by every invalidation, so a value computed before it is not stored after it
+        self._generation = 0
+        self._entries = _CountingTTL(maxsize, ttl, timer, self) if policy == "ttl" else _CountingLRU(maxsize, self)
+        _caches[namespace] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        try:
+            value = self._entries[key]
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # Computed in a task of its own, so cancelling the caller that started it does not
+            # cancel the callers waiting on the same key
+            task = asyncio.ensure_future(self._compute(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._settle(key, done))
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        generation = self._generation
+        value = await self._load_shared(key)
+        if value is MISSING:
+            self.misses += 1
+            value = await compute()
+            if generation == self._generation:
+                await self._store_shared(key, value)
+        else:
+            self.shared_hits += 1
+        if generation == self._generation:
+            self._entries[key] = value
+        return value
+
+    def _settle(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve it so a computation nobody awaits does not log "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def _load_shared(self, key: str) -> Any:
+        if self.store is None:
+            return MISSING
+        try:
+            return await self.store.get(self.namespace, key)
+        except Exception as e:
+            logger.error(f"Error reading shared cache {self.namespace}: {str(e)}")
+            return MISSING
+
+    async def _store_shared(self, key: str, value: Any):
+        if self.store is None:
+            return
+        try:
+            await self.store.put(self.namespace, key, value, self.ttl if self.policy == "ttl" else None)
+        except Exception as e:
+            logger.error(f"Error writing shared cache {self.namespace}: {str(e)}")
+
+    def _delete_shared(self, key: Optional[str]):
+        if self.store is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.store._delete(self.namespace, key)
+            return
+        task = loop.create_task(self.store.delete(self.namespace, key))
+        self._pending_deletes.add(task)
+        task.add_done_callback(self._pending_deletes.discard)
+
+    def invalidate(self, key: str) -> bool:
+        self.invalidations += 1
+        self._generation += 1
+        self._delete_shared(key)
+        return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        self.invalidations += 1
+        self._generation += 1
+        self._delete_shared(None)
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses + self.coalesced
+        return {
+            "policy": self.policy,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl if self.policy == "ttl" else None,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.shared_hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def async_cache(func: Callable = None, *, namespace: str = None, maxsize: int = 100, ttl: Optional[float] = 300,
+                policy: str = "ttl", key: Callable[..., str] = None, ignore: Sequence[str] = (), store: Any = None):
+    """
+    Cache a coroutine function's results. Usable bare (`@async_cache`) or with options
+    (`@async_cache(namespace="search", maxsize=1000, policy="lru")`). Each decorated
+    function gets its own namespace, defaulting to its qualified name. Keys are hashes of
+    the arguments bound to the signature with defaults applied, so `f(1)` and `f(x=1)`
+    share an entry, leaving out `self`/`cls` so all instances share entries too. Arguments
+    without a stable repr (plain objects) raise TypeError: name them in `ignore` to leave
+    them out of the key, or pass `key` to build keys from the remaining arguments instead. Pass `store` (e.g.
+    `tiered_cache.get_shared_store()`) to share results across worker processes. The wrapper exposes `cache`, `invalidate(*args, **kwargs)`,
+    `cache_clear()` and `cache_stats()`.
+    """
+    def decorator(func):
+        cache = AsyncCache(namespace or f"{func.__module__}.{func.__qualname__}", maxsize, ttl, policy, store=store)
+        signature = inspect.signature(func)
+        skip = 1 if list(signature.parameters)[:1] in (["self"], ["cls"]) else 0
+
+        def key_for(args, kwargs):
+            if key:
+                return key(*args[skip:], **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return make_key(**{name: value for name, value in list(bound.arguments.items())[skip:] if name not in ignore})
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await cache.get_or_compute(key_for(args, kwargs), lambda: func(*args, **kwargs))
+
+        # Called with the arguments the function would be called with, including `self`
+        wrapper.invalidate = lambda *args, **kwargs: cache.invalidate(key_for(args, kwargs))
+        wrapper.cache = cache
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_stats = cache.stats
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+def get_cache(namespace: str) -> Optional[AsyncCache]:
+    return _caches.get(namespace)
+
+
+def invalidate_namespace(namespace: str) -> bool:
+    """Drop every entry in `namespace`; False if no such cache exists."""
+    cache = _caches.get(namespace)
+    if cache is None:
+        return False
+    cache.clear()
+    return True
+
 
-cache = TTLCache(maxsize=100, ttl=300)  # Cache up to 100 items for 5 minutes
-
-def async_cache(func):
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        key = str(args) + str(kwargs)
-        if key in cache:
-            return cache[key]
-        result = await func(*args, **kwargs)
-        cache[key] = result
-        return result
-    return wrapper
\ No newline at end of file
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of every cache in the process, by namespace."""
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
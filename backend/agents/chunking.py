@@ -0,0 +1,177 @@
+# chunking.py
+import hashlib
+import json
+import logging
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:
+    import tiktoken
+    tiktoken_available = True
+except ImportError:
+    tiktoken_available = False
+
+logger = logging.getLogger(__name__)
+
+# A "word" is a run of non-whitespace plus its trailing whitespace, so joining words
+# reproduces the original text exactly
+WORD_PATTERN = re.compile(r'\S+\s*|\s+')
+PARAGRAPH_END = re.compile(r'\n\s*\n')
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken when installed, otherwise estimates ~4 characters per token."""
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self.encoding = None
+        if tiktoken_available:
+            try:
+                self.encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {encoding_name}, estimating token counts: {str(e)}")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return max(1, (len(text) + 3) // 4)
+
+
+class TextChunker:
+    """
+    Streaming, token-aware chunker. Consumes text pieces of any size and yields chunks
+    of at most `chunk_size` tokens, each sharing roughly `chunk_overlap` tokens with the
+    previous one. Only the current window of words is held in memory.
+
+    Once a window holds `min_chunk_size` tokens (half the chunk size by default) it is
+    cut at the next paragraph end. Boundaries therefore follow the text rather than
+    token offsets, and an edit to one paragraph leaves the chunks after it unchanged.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 512,
+        chunk_overlap: int = 64,
+        token_counter: Optional[TokenCounter] = None,
+        min_chunk_size: Optional[int] = None
+    ):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap must be between 0 and chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.min_chunk_size = max(chunk_overlap + 1, chunk_size // 2) if min_chunk_size is None else min_chunk_size
+        self.token_counter = token_counter or TokenCounter()
+
+    def _words(self, pieces: Iterable[str]) -> Iterator[str]:
+        carry = ""
+        for piece in pieces:
+            text = carry + piece
+            if not text:
+                continue
+            words = WORD_PATTERN.findall(text)
+            # The last word may continue in the next piece
+            carry = words.pop() if words and not text[-1].isspace() else ""
+            yield from words
+        if carry:
+            yield carry
+
+    def _keep_overlap(self, window: deque, window_tokens: int, incoming_tokens: int) -> int:
+        # Keep the trailing words that make up the overlap, leaving room for the next word
+        while window and window_tokens > self.chunk_overlap:
+            _, dropped = window.popleft()
+            window_tokens -= dropped
+        while window and window_tokens + incoming_tokens > self.chunk_size:
+            _, dropped = window.popleft()
+            window_tokens -= dropped
+        return window_tokens
+
+    def _split_long_word(self, word: str) -> Iterator[str]:
+        # Hard-split words that on their own exceed the chunk size (e.g. base64 blobs)
+        step = max(1, len(word) * self.chunk_size // (self.token_counter.count(word) + 1))
+        for start in range(0, len(word), step):
+            yield word[start:start + step]
+
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        window = deque()
+        window_tokens = 0
+        for word in self._words(pieces):
+            tokens = self.token_counter.count(word)
+            parts = [(word, tokens)] if tokens <= self.chunk_size else [
+                (part, self.token_counter.count(part)) for part in self._split_long_word(word)
+            ]
+            for part, part_tokens in parts:
+                if window and window_tokens + part_tokens > self.chunk_size:
+                    chunk = "".join(w for w, _ in window).strip()
+                    if chunk:
+                        yield chunk
+                    window_tokens = self._keep_overlap(window, window_tokens, part_tokens)
+                window.append((part, part_tokens))
+                window_tokens += part_tokens
+            if window_tokens >= self.min_chunk_size and PARAGRAPH_END.search(word):
+                chunk = "".join(w for w, _ in window).strip()
+                if chunk:
+                    yield chunk
+                window_tokens = self._keep_overlap(window, window_tokens, 0)
+
+        chunk = "".join(w for w, _ in window).strip()
+        if chunk:
+            yield chunk
+
+
+# Document ids come from DocumentIngestionAgent.sanitize_filename, which never emits this
+# character, so a chunk id can never collide with another document's id
+CHUNK_ID_SEPARATOR = "="
+
+# Fields that do not describe the chunk itself and so are left out of its content hash.
+# chunk_number is excluded so a chunk that only moved within its document keeps its id.
+UNHASHED_FIELDS = ("id", "chunk_number", "contentVector", "document_hash")
+
+
+def compute_content_hash(document: Dict[str, Any]) -> str:
+    """Stable hash of a chunk's text and metadata, used to detect unchanged chunks on re-upload."""
+    fields = {key: value for key, value in document.items() if key not in UNHASHED_FIELDS}
+    canonical = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def chunk_id(parent_id: str, content_hash: str, occurrence: int = 0) -> str:
+    """Content-addressed chunk key; `occurrence` tells apart repeated identical chunks."""
+    key = f"{parent_id}{CHUNK_ID_SEPARATOR}{content_hash[:32]}"
+    return f"{key}-{occurrence}" if occurrence else key
+
+
+def build_chunk_document(
+    parent: Dict[str, Any],
+    chunk_number: int,
+    content: str,
+    seen: Optional[Dict[str, int]] = None
+) -> Dict[str, Any]:
+    """
+    Build an index record for one chunk in the schema queried by SearchAgent. The id is
+    derived from the chunk's content hash, so unchanged chunks keep their id (and their
+    indexed vector) when text is inserted or removed elsewhere in the document. Pass the
+    same `seen` dict for all chunks of a document to number duplicate chunks.
+    """
+    chunk = {key: value for key, value in parent.items() if key not in ("id", "content", "document_hash")}
+    chunk.update({
+        "parent_id": parent["id"],
+        "chunk_number": chunk_number,
+        "content": content,
+    })
+    content_hash = compute_content_hash(chunk)
+    occurrence = 0
+    if seen is not None:
+        occurrence = seen.get(content_hash, 0)
+        seen[content_hash] = occurrence + 1
+    chunk["id"] = chunk_id(parent["id"], content_hash, occurrence)
+    return chunk
+
+
+def iter_chunk_documents(parent: Dict[str, Any], pieces: Iterable[str], chunker: TextChunker) -> Iterator[Dict[str, Any]]:
+    seen = {}
+    for chunk_number, content in enumerate(chunker.iter_chunks(pieces)):
+        yield build_chunk_document(parent, chunk_number, content, seen)
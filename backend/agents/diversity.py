@@ -0,0 +1,77 @@
+# diversity.py
+import logging
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def mmr(query: Sequence[float], vectors, k: int, lambda_: float = 0.7) -> List[int]:
+    """
+    Maximal marginal relevance: greedily pick the row maximizing
+    lambda * sim(query, row) - (1 - lambda) * max sim(row, already picked), with cosine
+    similarity. The pairwise similarities come from one matrix product; each step
+    updates the running maxima in place. Returns row indices in pick order.
+    """
+    vectors = _unit_rows(np.asarray(vectors, dtype=np.float32))
+    if len(vectors) == 0 or k <= 0:
+        return []
+    relevance = vectors @ _unit_rows(np.asarray(query, dtype=np.float32))
+    pairwise = vectors @ vectors.T
+    redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    picked = []
+    for _ in range(min(k, len(vectors))):
+        # Before the first pick nothing is redundant
+        scores = lambda_ * relevance - (1 - lambda_) * (redundancy if picked else 0.0)
+        best = int(np.argmax(np.where(available, scores, -np.inf)))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return picked
+
+
+def collapse_neighbors(results: List[Dict[str, Any]], window: int = 1) -> List[Dict[str, Any]]:
+    """
+    Drop each result whose `chunk_number` is within `window` of a better-ranked result
+    from the same `parent_id`; adjacent chunks overlap and mostly repeat each other.
+    """
+    kept, seen = [], {}
+    for result in results:
+        parent = result.get("parent_id")
+        number = result.get("chunk_number")
+        if parent and number is not None:
+            if any(abs(number - other) <= window for other in seen.get(parent, ())):
+                continue
+            seen.setdefault(parent, []).append(number)
+        kept.append(result)
+    return kept
+
+
+class DiversitySelector:
+    """
+    Picks the prompt context from ranked candidates: optionally collapses neighbouring
+    chunks of one document, then runs MMR over the candidates' `contentVector`s.
+    Candidates without vectors (e.g. local search results) keep their ranked order.
+    """
+
+    def __init__(self, lambda_: float = 0.7, collapse: bool = True, window: int = 1):
+        self.lambda_ = lambda_
+        self.collapse = collapse
+        self.window = window
+
+    def select(self, embedding: Sequence[float], candidates: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        if self.collapse:
+            candidates = collapse_neighbors(candidates, self.window)
+        vectors = [candidate.get("contentVector") for candidate in candidates]
+        if not candidates or any(vector is None for vector in vectors):
+            return candidates[:k]
+        order = mmr(embedding, vectors, k, self.lambda_)
+        logger.debug(f"MMR picked {order} of {len(candidates)} candidates")
+        return [candidates[i] for i in order]
@@ -1,18 +1,71 @@
 # document_enhancer.py
 
+import asyncio
 from .azure_language_service import AzureLanguageService
+from .local_language_service import LocalLanguageService
+from .enrichment_cache import EnrichmentCache, text_key
 from config.config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Results equal to a service's failure default are not cached, so errors are retried
+UNCACHED_RESULTS = ("", "Unknown", [])
+
+# Enrichment backends a job can choose from; all share AzureLanguageService's interface
+ENRICHMENT_BACKENDS = {
+    "azure": AzureLanguageService,
+    "local": LocalLanguageService,
+}
+
 class DocumentEnhancer:
-    def __init__(self):
+    def __init__(self, cache: EnrichmentCache = None, backend: str = None):
+        self.backend = backend or Config.ENRICHMENT_BACKEND
+        if self.backend not in ENRICHMENT_BACKENDS:
+            raise ValueError(f"Unknown enrichment backend: {self.backend}")
         try:
-            self.language_service = AzureLanguageService()
+            self.language_service = ENRICHMENT_BACKENDS[self.backend]()
         except Exception as e:
-            logger.error(f"Error creating AzureLanguageService: {str(e)}")
+            logger.error(f"Error creating {ENRICHMENT_BACKENDS[self.backend].__name__}: {str(e)}")
             raise
+        # Other backends are created on first use by a job that asks for them
+        self.language_services = {self.backend: self.language_service}
+        self._service_lock = asyncio.Lock()
+        if cache is None and Config.ENRICHMENT_CACHE_ENABLED:
+            cache = EnrichmentCache(Config.ENRICHMENT_CACHE_PATH, max_bytes=Config.ENRICHMENT_CACHE_MAX_BYTES)
+        self.cache = cache
+
+    async def _service(self, backend: str = None):
+        backend = backend or self.backend
+        if backend == self.backend:
+            return self.language_service
+        if backend not in ENRICHMENT_BACKENDS:
+            raise ValueError(f"Unknown enrichment backend: {backend}")
+        async with self._service_lock:
+            if backend not in self.language_services:
+                service = ENRICHMENT_BACKENDS[backend]()
+                await service.initialize()
+                self.language_services[backend] = service
+        return self.language_services[backend]
+
+    async def _cached(self, service, operation: str, texts: list, compute) -> list:
+        # Serve known texts from the cache and send each distinct missing text once
+        if self.cache is None:
+            return await compute(texts)
+        namespace = service.cache_namespace
+        keys = [text_key(text) for text in texts]
+        found = await self.cache.get_many(namespace, operation, keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            computed = dict(zip(missing, await compute(list(missing.values()))))
+            await self.cache.put_many(namespace, operation, {
+                key: value for key, value in computed.items() if value not in UNCACHED_RESULTS
+            })
+            found.update(computed)
+        return [found[key] for key in keys]
 
     async def initialize(self):
         try:
@@ -23,49 +76,71 @@ class DocumentEnhancer:
             logger.error(f"Error initializing DocumentEnhancer: {str(e)}")
             raise
 
-    async def enhance_document(self, document: dict) -> dict:
+    async def enhance_documents(self, documents: list, backend: str = None) -> list:
+        """Add summary, language, entities and key phrases to many documents at once."""
         try:
-            enhanced_doc = document.copy()
-            text = document.get('content', '')
+            service = await self._service(backend)
+            texts = [document.get('content', '') for document in documents]
 
-            # Generate summary
-            enhanced_doc['summary'] = await self.language_service.generate_summary(text)
+            # The four operations run concurrently, each batched across all documents
+            summaries, languages, entities, key_phrases = await asyncio.gather(
+                self._cached(service, "summary", texts, service.generate_summaries),
+                self._cached(service, "language", texts, service.detect_languages),
+                self._cached(service, "entities", texts, service.recognize_entities_batch),
+                self._cached(service, "key_phrases", texts, service.extract_key_phrases_batch)
+            )
 
-            # Detect language
-            enhanced_doc['language'] = await self.language_service.detect_language(text)
+            enhanced_docs = []
+            for i, document in enumerate(documents):
+                enhanced_doc = document.copy()
+                enhanced_doc['summary'] = summaries[i]
+                enhanced_doc['language'] = languages[i]
+                enhanced_doc['entities'] = entities[i]
+                enhanced_doc['key_phrases'] = key_phrases[i]
+                enhanced_docs.append(enhanced_doc)
 
-            # Recognize entities
-            enhanced_doc['entities'] = await self.language_service.recognize_entities(text)
-
-            # Extract key phrases
-            enhanced_doc['key_phrases'] = await self.language_service.extract_key_phrases(text)
-
-            logger.info(f"Document {document.get('id', 'unknown')} enhanced successfully")
-            return enhanced_doc
+            logger.info(f"{len(documents)} documents enhanced successfully")
+            return enhanced_docs
         except Exception as e:
-            logger.error(f"Error enhancing document: {str(e)}")
+            logger.error(f"Error enhancing documents: {str(e)}")
             raise
 
-    async def process_chunk(self, chunk: dict) -> dict:
+    async def process_chunks(self, chunks: list, backend: str = None) -> list:
+        """Add summary and key phrases to many chunks at once."""
         try:
-            enhanced_chunk = chunk.copy()
-            text = chunk.get('content', '')
+            service = await self._service(backend)
+            texts = [chunk.get('content', '') for chunk in chunks]
 
-            # Generate summary for the chunk
-            enhanced_chunk['summary'] = await self.language_service.generate_summary(text)
+            summaries, key_phrases = await asyncio.gather(
+                self._cached(service, "summary", texts, service.generate_summaries),
+                self._cached(service, "key_phrases", texts, service.extract_key_phrases_batch)
+            )
 
-            # Extract key phrases for the chunk
-            enhanced_chunk['key_phrases'] = await self.language_service.extract_key_phrases(text)
+            enhanced_chunks = []
+            for i, chunk in enumerate(chunks):
+                enhanced_chunk = chunk.copy()
+                enhanced_chunk['summary'] = summaries[i]
+                enhanced_chunk['key_phrases'] = key_phrases[i]
+                enhanced_chunks.append(enhanced_chunk)
 
-            logger.info(f"Chunk {chunk.get('id', 'unknown')} processed successfully")
-            return enhanced_chunk
+            logger.info(f"{len(chunks)} chunks processed successfully")
+            return enhanced_chunks
         except Exception as e:
-            logger.error(f"Error processing chunk: {str(e)}")
+            logger.error(f"Error processing chunks: {str(e)}")
             raise
 
+    async def enhance_document(self, document: dict, backend: str = None) -> dict:
+        return (await self.enhance_documents([document], backend))[0]
+
+    async def process_chunk(self, chunk: dict, backend: str = None) -> dict:
+        return (await self.process_chunks([chunk], backend))[0]
+
     async def cleanup(self):
         try:
             await self.language_service.cleanup()
+            for backend, service in self.language_services.items():
+                if backend != self.backend:
+                    await service.cleanup()
             logger.info("DocumentEnhancer cleaned up successfully")
         except Exception as e:
             logger.error(f"Error during DocumentEnhancer cleanup: {str(e)}")
\ No newline at end of file
@@ -1,9 +1,17 @@
 # document_processing.py
 import asyncio
+import base64
+import inspect
+import io
+import itertools
 import json
 import sys
 import os
+import tempfile
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from azure.storage.blob import BlobBlock
 from azure.storage.blob.aio import BlobServiceClient
 from azure.core.exceptions import ResourceExistsError
 import logging
@@ -15,6 +23,15 @@ from openai import AsyncAzureOpenAI
 from config.config import Config
 from azure.ai.textanalytics import TextAnalyticsClient
 from .document_enhancer import DocumentEnhancer
+from .chunking import TextChunker
+from .parsing_engine import ParsingEngine
+from .embedding_agent import EmbeddingAgent
+from .embedding_stage import EmbeddingStage
+from .bulk_ingestion import BulkIngestionPipeline, collect_sources
+from .ingestion_manifest import IngestionManifest
+from .ann_index import local_index_from_config
+from .index_version import get_index_version
+from .indexing_agent import delete_all_chunks
 import re
 
 # Add the parent directory to sys.path
@@ -25,8 +42,29 @@ from config.config import Config
 
 logger = logging.getLogger(__name__)
 
+class IngestionProgress:
+    """Per-document stage timings and details, pushed to `on_update` after every stage."""
+
+    def __init__(self, on_update=None):
+        self.on_update = on_update
+        self.current_stage = None
+        self.stage_timings = {}
+        self.details = {}
+        self.error = None
+
+    @contextmanager
+    def stage(self, name):
+        self.current_stage = name
+        started = time.perf_counter()
+        try:
+            yield self.details
+        finally:
+            self.stage_timings[name] = round(self.stage_timings.get(name, 0.0) + time.perf_counter() - started, 3)
+            if self.on_update:
+                self.on_update(self)
+
 class DocumentIngestionAgent:
-    def __init__(self):
+    def __init__(self, embedding_agent: EmbeddingAgent = None, parsing_workers: int = None):
         self.config = Config()
         self.text_analytics_client = None
         if not self.config.AZURE_LANGUAGE_SERVICE_ENDPOINT or not self.config.AZURE_LANGUAGE_SERVICE_API_KEY:
@@ -46,12 +84,39 @@ class DocumentIngestionAgent:
         self.container_name = self.config.AZURE_STORAGE_CONTAINER_NAME
         self.client = None
         self.search_client = None
+        self.container_ready = False
         self.openai_client = AsyncAzureOpenAI(
             api_key=self.config.AZURE_OPENAI_API_KEY,
             api_version=self.config.AZURE_OPENAI_API_VERSION,
             azure_endpoint=self.config.AZURE_OPENAI_ENDPOINT
         )
         self.document_enhancer = DocumentEnhancer()
+        self.manifest = IngestionManifest(self.config.INGESTION_MANIFEST_PATH)
+        self.local_index = local_index_from_config(self.config)
+        self.chunker = TextChunker(
+            chunk_size=self.config.INGESTION_CHUNK_SIZE,
+            chunk_overlap=self.config.INGESTION_CHUNK_OVERLAP
+        )
+        self.parsing_engine = ParsingEngine(
+            options={
+                "chunk_size": self.config.INGESTION_CHUNK_SIZE,
+                "chunk_overlap": self.config.INGESTION_CHUNK_OVERLAP,
+                "front_matter_max_bytes": self.config.INGESTION_FRONT_MATTER_MAX_BYTES,
+                "read_size": self.config.INGESTION_READ_SIZE,
+                "spool_dir": self.config.INGESTION_SPOOL_DIR,
+            },
+            max_workers=self.config.PARSING_WORKERS if parsing_workers is None else parsing_workers
+        )
+        # Share the application's EmbeddingAgent when one is provided, otherwise own one
+        self.owns_embedding_agent = embedding_agent is None
+        self.embedding_agent = embedding_agent or EmbeddingAgent()
+        self.embedding_stage = EmbeddingStage(
+            self.embedding_agent,
+            batch_size=self.config.EMBEDDING_BATCH_SIZE,
+            max_batch_tokens=self.config.EMBEDDING_BATCH_MAX_TOKENS,
+            concurrency=self.config.EMBEDDING_CONCURRENCY,
+            token_counter=self.chunker.token_counter
+        )
 
     async def initialize(self):
         try:
@@ -66,80 +131,303 @@ class DocumentIngestionAgent:
             logger.debug(f"SearchClient initialized with endpoint: {self.config.AZURE_SEARCH_SERVICE_ENDPOINT}")
             logger.debug(f"SearchClient index name: {self.config.AZURE_SEARCH_INDEX_NAME}")
             await self.document_enhancer.initialize()
+            if self.owns_embedding_agent:
+                await self.embedding_agent.initialize()
             logger.info("DocumentIngestionAgent initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing DocumentIngestionAgent: {str(e)}")
             raise
 
     def sanitize_filename(self, filename):
-        # Replace spaces and other invalid characters with underscores
-        return re.sub(r'[^\w\-=]', '_', filename)
+        # Replace spaces and other invalid characters with underscores. '=' is valid in
+        # a document key but reserved as the chunk id separator (CHUNK_ID_SEPARATOR)
+        return re.sub(r'[^\w\-]', '_', filename)
 
     async def upload_document(self, filename, content):
-        print(f"DEBUG: Starting upload_document for {filename}")
+        return await self.upload_document_stream(filename, io.BytesIO(content))
+
+    async def _read_blocks(self, source, block_size):
+        # Works with both async readers (UploadFile) and regular binary file objects
+        while True:
+            block = source.read(block_size)
+            if inspect.isawaitable(block):
+                block = await block
+            if not block:
+                break
+            yield block
+
+    async def _stage_blob(self, blob_client, source, tee=None):
+        block_ids = []
+        async for block in self._read_blocks(source, self.config.INGESTION_BLOCK_SIZE):
+            block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+            await blob_client.stage_block(block_id=block_id, data=block)
+            block_ids.append(BlobBlock(block_id=block_id))
+            if tee is not None:
+                await asyncio.to_thread(tee.write, block)
+        await blob_client.commit_block_list(block_ids)
+        return len(block_ids)
+
+    async def _get_container_client(self):
         if not self.client:
-            print("DEBUG: Initializing client")
+            logger.debug("Initializing client")
             await self.initialize()
 
         container_client = self.client.get_container_client(self.container_name)
 
-        try:
-            print("DEBUG: Creating container")
-            await container_client.create_container()
-        except ResourceExistsError:
-            print("DEBUG: Container already exists")
-            pass
+        if not self.container_ready:
+            try:
+                logger.debug("Creating container")
+                await container_client.create_container()
+            except ResourceExistsError:
+                logger.debug("Container already exists")
+            self.container_ready = True
+        return container_client
 
+    async def upload_blob(self, filename, source):
+        """
+        Blob upload stage. Streams `source` (a file path or a binary stream) to Blob
+        storage as staged blocks and returns `(path, is_temporary)` for the parse stage.
+        Streams are teed to a local temporary file that the caller must remove.
+        """
+        container_client = await self._get_container_client()
         blob_client = container_client.get_blob_client(filename)
 
+        logger.debug(f"Uploading blob for {filename}")
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as stream:
+                block_count = await self._stage_blob(blob_client, stream)
+            path, is_temporary = os.fspath(source), False
+        else:
+            with tempfile.NamedTemporaryFile(prefix="upload-", dir=self.config.INGESTION_SPOOL_DIR, delete=False) as tee:
+                try:
+                    block_count = await self._stage_blob(blob_client, source, tee)
+                except Exception:
+                    tee.close()
+                    os.remove(tee.name)
+                    raise
+            path, is_temporary = tee.name, True
+        logger.info(f"Uploaded {filename} to Azure Blob storage in {block_count} blocks")
+        logger.debug(f"Blob upload successful for {filename}")
+        return path, is_temporary
+
+    async def parse_document(self, filename, path):
+        """
+        Parse stage. Hashing, text extraction and chunking run in the parsing engine's
+        process pool; the returned ParsedDocument owns a chunk spool and must be closed.
+        """
+        return await self.parsing_engine.parse(path, filename, self.sanitize_filename(filename))
+
+    async def upload_and_parse(self, filename, source):
+        path, is_temporary = await self.upload_blob(filename, source)
+        try:
+            return await self.parse_document(filename, path)
+        finally:
+            if is_temporary:
+                os.remove(path)
+
+    def iter_chunks(self, parsed):
+        """Chunking stage: lazily read the chunk documents of a ParsedDocument."""
+        return parsed.iter_chunks()
+
+    async def plan_reindex(self, parent):
+        """
+        Return None when the document is byte-for-byte unchanged since it was last indexed,
+        otherwise the positions of its currently indexed chunks keyed by chunk id.
+        """
+        record = await self.manifest.get_document(parent["id"])
+        if record is not None:
+            if record["document_hash"] == parent["document_hash"]:
+                return None
+            return await self.manifest.get_chunks(parent["id"])
+        # Not in the local manifest (e.g. indexed from another node): ask the index
+        return await self._indexed_chunks(parent["id"])
+
+    async def _indexed_chunks(self, parent_id):
         try:
-            print(f"DEBUG: Uploading blob for {filename}")
-            await blob_client.upload_blob(content, overwrite=True)
-            logger.info(f"Uploaded {filename} to Azure Blob storage")
-            print(f"DEBUG: Blob upload successful for {filename}")
-
-            # Parse the content
-            content_str = content.decode('utf-8')
-            content_parts = content_str.split('---\n', 2)
-            metadata = {}
-            if len(content_parts) > 2:
-                metadata_yaml = content_parts[1]
-                metadata = yaml.safe_load(metadata_yaml)
-                main_content = content_parts[2]
-            else:
-                main_content = content_str
-
-            sanitized_filename = self.sanitize_filename(filename)
-            document = {
-                "id": sanitized_filename,
-                "filename": filename,
-                "content": main_content,
-                "language": "en",  # Or use language detection
-                "title": metadata.get("title", ""),
-                "published_date": metadata.get("published_date", None),
-                "author": metadata.get("author", ""),
-                "key_phrases": metadata.get("key_phrases", []),
-                "summary": metadata.get("summary", ""),
-            }
-
-            # After successful blob upload, index the document
+            results = await self.search_client.search(
+                search_text="",
+                filter=f"parent_id eq '{parent_id}'",
+                select="id,chunk_number"
+            )
+            return {result['id']: result.get('chunk_number') async for result in results}
+        except Exception as e:
+            logger.warning(f"Could not load indexed chunks for {parent_id}, re-indexing all chunks: {str(e)}")
+            return {}
+
+    def select_changed(self, chunks, known_chunks, chunk_numbers):
+        """
+        Yield only chunks whose content is not indexed yet, recording every chunk's
+        position into `chunk_numbers`. Chunk ids are content hashes, so a known id means
+        the chunk and its vector can be kept even if it moved within the document.
+        """
+        for chunk in chunks:
+            chunk_numbers[chunk["id"]] = chunk["chunk_number"]
+            if chunk["id"] not in known_chunks:
+                yield chunk
+
+    async def iter_changed_batches(self, parsed, known_chunks, chunk_numbers, batch_size):
+        """
+        Yield new chunks of a ParsedDocument in batches of `batch_size`. Reading the
+        spool, hashing and selecting run in a worker thread so large documents never
+        hold up the event loop.
+        """
+        changed = self.select_changed(self.iter_chunks(parsed), known_chunks, chunk_numbers)
+        while True:
+            batch = await asyncio.to_thread(list, itertools.islice(changed, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    async def finalize_document(self, parent, known_chunks, chunk_numbers):
+        """
+        Renumber kept chunks that moved, remove chunks that no longer exist and record
+        the indexed version in the manifest.
+        """
+        moved = [
+            {"id": chunk_id, "chunk_number": chunk_number}
+            for chunk_id, chunk_number in chunk_numbers.items()
+            if chunk_id in known_chunks and known_chunks[chunk_id] != chunk_number
+        ]
+        for i in range(0, len(moved), self.config.INDEX_BATCH_SIZE):
+            result = await self.search_client.merge_documents(documents=moved[i:i + self.config.INDEX_BATCH_SIZE])
+            failed = [r.key for r in result if not r.succeeded]
+            if failed:
+                raise RuntimeError(f"Failed to renumber {len(failed)} chunks: {failed[:5]}")
+        if self.local_index and moved:
+            await self.local_index.update_documents(moved)
+        if moved:
+            await get_index_version().bump()
+        await self.delete_stale_chunks(parent["id"], chunk_numbers)
+        await self.manifest.record_document(parent["id"], parent["filename"], parent["document_hash"], chunk_numbers)
+
+    async def enrich_chunks(self, chunks, enrichment=None):
+        """
+        Enrichment stage: add summary and key phrases. `enrichment` names the backend for
+        this job ("azure", "local" or "none"); by default chunks are enriched with
+        ENRICHMENT_BACKEND when INGESTION_ENABLE_ENRICHMENT is set.
+        """
+        if enrichment is None and self.config.INGESTION_ENABLE_ENRICHMENT:
+            enrichment = self.config.ENRICHMENT_BACKEND
+        if enrichment in (None, "none"):
+            return chunks
+        return await self.document_enhancer.process_chunks(chunks, backend=enrichment)
+
+    async def _enriched(self, batches, enrichment=None):
+        async for batch in batches:
+            for enriched in await self.enrich_chunks(batch, enrichment):
+                yield enriched
+
+    async def upload_document_stream(self, filename, source, progress=None, enrichment=None):
+        """
+        Upload a document from a file path or readable binary stream without loading it
+        into memory. The bytes are pushed to Blob storage as staged blocks, then parsed
+        and chunked in the parsing engine's process pool so the event loop stays free.
+        Stage timings and chunk counts are recorded on `progress` when given, and
+        `enrichment` picks the enrichment backend for this upload (see `enrich_chunks`).
+        """
+        logger.debug(f"Starting upload_document for {filename}")
+        progress = progress or IngestionProgress()
+        try:
+            with progress.stage("upload"):
+                path, is_temporary = await self.upload_blob(filename, source)
             try:
-                result = await self.search_client.upload_documents(documents=[document])
-                if result[0].succeeded:
-                    logger.info(f"Document {filename} indexed successfully")
+                with progress.stage("parse") as details:
+                    parsed = await self.parse_document(filename, path)
+                    details["chunks"] = parsed.chunk_count
+            finally:
+                if is_temporary:
+                    os.remove(path)
+            parent = parsed.parent
+            with parsed:
+                # After successful blob upload, chunk and index the document
+                try:
+                    with progress.stage("plan") as details:
+                        known_chunks = await self.plan_reindex(parent)
+                        details["unchanged"] = known_chunks is None
+                    if known_chunks is None:
+                        logger.info(f"Document {filename} is unchanged, skipping indexing")
+                        return True
+                    chunk_numbers = {}
+                    with progress.stage("index") as details:
+                        changed = self.iter_changed_batches(
+                            parsed, known_chunks, chunk_numbers, self.config.INGESTION_ENRICH_BATCH_SIZE
+                        )
+                        details["indexed_chunks"] = await self._index_chunks(self._enriched(changed, enrichment))
+                        details["total_chunks"] = len(chunk_numbers)
+                    with progress.stage("finalize"):
+                        await self.finalize_document(parent, known_chunks, chunk_numbers)
+                    logger.info(f"Document {filename} indexed successfully: {details['indexed_chunks']} of {len(chunk_numbers)} chunks changed")
                     return True
-                else:
-                    logger.error(f"Failed to index document {filename}")
+                except Exception as e:
+                    progress.error = str(e)
+                    logger.error(f"Error indexing document {filename}: {str(e)}")
                     return False
-            except Exception as e:
-                logger.error(f"Error indexing document {filename}: {str(e)}")
-                return False
         except Exception as e:
+            progress.error = str(e)
             logger.error(f"Error uploading or indexing {filename}: {str(e)}")
             logger.exception("Full traceback:")
-            print(f"DEBUG: Exception occurred: {str(e)}")
             return False
 
+    async def upload_documents_batch(self, sources, enrichment=None):
+        """
+        Ingest many documents through the concurrent bulk pipeline.
+        `sources` is an iterable of (filename, path_or_stream) pairs; `enrichment`
+        picks the enrichment backend for the whole batch (see `enrich_chunks`).
+        """
+        if not self.client:
+            await self.initialize()
+        pipeline = BulkIngestionPipeline(
+            self,
+            queue_size=self.config.BULK_QUEUE_SIZE,
+            upload_workers=self.config.BULK_UPLOAD_WORKERS,
+            parse_workers=self.config.BULK_PARSE_WORKERS,
+            enrich_workers=self.config.BULK_ENRICH_WORKERS,
+            index_workers=self.config.BULK_INDEX_WORKERS,
+            enrichment=enrichment
+        )
+        return await pipeline.run(sources)
+
+    async def _index_chunks(self, chunks):
+        # Embedded batches are written to the index as soon as they come back
+        count = 0
+        batch = []
+        async for embedded in self.embedding_stage.embed(chunks):
+            batch.extend(embedded)
+            while len(batch) >= self.config.INDEX_BATCH_SIZE:
+                await self.index_batch(batch[:self.config.INDEX_BATCH_SIZE])
+                count += self.config.INDEX_BATCH_SIZE
+                batch = batch[self.config.INDEX_BATCH_SIZE:]
+        if batch:
+            await self.index_batch(batch)
+            count += len(batch)
+        return count
+
+    async def index_batch(self, documents):
+        """Index stage: upload one batch of embedded chunk documents."""
+        result = await self.search_client.upload_documents(documents=documents)
+        failed = [r.key for r in result if not r.succeeded]
+        if failed:
+            raise RuntimeError(f"Failed to index {len(failed)} chunks: {failed[:5]}")
+        if self.local_index:
+            await self.local_index.add_chunks(documents)
+        await get_index_version().bump()
+
+    async def delete_stale_chunks(self, parent_id, keep_ids):
+        # Chunks whose content no longer occurs in the document, plus the single record
+        # (without parent_id) that documents indexed before chunking existed are stored as
+        results = await self.search_client.search(
+            search_text="",
+            filter=f"parent_id eq '{parent_id}' or (id eq '{parent_id}' and parent_id eq null)",
+            select="id"
+        )
+        stale_ids = [result['id'] async for result in results if result['id'] not in keep_ids]
+        if stale_ids:
+            await self.search_client.delete_documents(documents=[{"id": chunk_id} for chunk_id in stale_ids])
+            if self.local_index:
+                await self.local_index.delete(ids=stale_ids)
+            await get_index_version().bump()
+            logger.debug(f"Deleted {len(stale_ids)} stale chunks for {parent_id}")
+
     async def search_existing_document(self, filename):
         results = await self.search_client.search(
             search_text="",
@@ -154,24 +442,22 @@ class DocumentIngestionAgent:
     async def delete_all_documents(self):
         try:
             logger.info("Starting deletion of all documents")
-            results = await self.search_client.search("*", select="id,filename", top=1000)
-            all_docs = {}
-            async for result in results:
-                if result['filename'] not in all_docs:
-                    all_docs[result['filename']] = []
-                all_docs[result['filename']].append(result['id'])
-
-            for filename, chunk_ids in all_docs.items():
-                logger.debug(f"Deleting chunks for file: {filename}")
-                await self.search_client.delete_documents(documents=[{"id": chunk_id} for chunk_id in chunk_ids])
+            for filename in await delete_all_chunks(self.search_client):
                 logger.debug(f"Deleting blob for file: {filename}")
                 await self.client.get_blob_client(self.container_name, filename).delete_blob()
 
+            # Only once every chunk is gone, or re-uploads would skip documents still half indexed
+            await self.manifest.clear()
+            if self.local_index:
+                await self.local_index.clear()
             logger.info("All documents and associated data deleted successfully")
             return True
         except Exception as e:
             logger.error(f"Error deleting all documents: {str(e)}")
             return False
+        finally:
+            # Also after a partial failure: some chunks may already be gone
+            await get_index_version().bump()
 
     async def delete_documents(self, file_names):
         if not self.client:
@@ -182,6 +468,7 @@ class DocumentIngestionAgent:
         try:
             for file_name in file_names:
                 await container_client.delete_blob(file_name)
+            await self.manifest.forget([self.sanitize_filename(file_name) for file_name in file_names])
             logger.info(f"Deleted selected documents from Blob storage")
             return True
         except Exception as e:
@@ -205,6 +492,9 @@ class DocumentIngestionAgent:
             if self.openai_client:
                 await self.openai_client.close()
             await self.document_enhancer.cleanup()
+            self.parsing_engine.shutdown()
+            if self.owns_embedding_agent:
+                await self.embedding_agent.cleanup()
             logger.info("DocumentIngestionAgent cleaned up successfully")
         except Exception as e:
             logger.error(f"Error during DocumentIngestionAgent cleanup: {str(e)}")
@@ -215,25 +505,28 @@ async def main(action, *args):
         await agent.initialize()
         result = False
         message = ""
-        print("DEBUG: Starting main function")
-        print(f"DEBUG: Action: {action}, Args: {args}")
+        logger.debug("Starting main function")
+        logger.debug(f"Action: {action}, Args: {args}")
         if action == "upload":
             file_name, file_path = args
-            print(f"DEBUG: Uploading file: {file_name}")
-            with open(file_path, 'rb') as file:
-                file_content = file.read()
-            result = await agent.upload_document(file_name, file_content)
+            logger.debug(f"Uploading file: {file_name}")
+            result = await agent.upload_document_stream(file_name, file_path)
             message = "File uploaded successfully" if result else "Failed to upload file"
+        elif action == "upload_batch":
+            logger.debug(f"Bulk uploading from: {args[0]}")
+            report = await agent.upload_documents_batch(collect_sources(args[0]))
+            result = not report["failed"]
+            message = json.dumps(report)
         elif action == "delete_all":
-            print("DEBUG: Deleting all documents")
+            logger.debug("Deleting all documents")
             result = await agent.delete_all_documents()
             message = "All documents deleted" if result else "Failed to delete all documents"
         elif action == "delete":
-            print("DEBUG: Deleting selected documents")
+            logger.debug("Deleting selected documents")
             result = await agent.delete_documents(json.loads(args[0]))
             message = "Selected documents deleted" if result else "Failed to delete selected documents"
         elif action == "list":
-            print("DEBUG: Listing documents")
+            logger.debug("Listing documents")
             documents = await agent.list_documents()
             result = True
             message = json.dumps(documents)
@@ -2,14 +2,21 @@
 import asyncio
 import json
 import sys
-from typing import List, Tuple
+from typing import Any, List, Tuple, Union
 import numpy as np
 from openai import AsyncAzureOpenAI
 from config.config import config
 import logging
 import httpx
-from .cache import async_cache
-from scipy import spatial
+import openai
+import random
+from .embedding_cache import EmbeddingCache
+from .embedding_matrix import EmbeddingMatrix, nearest
+from .ann_index import IVFIndex
+from .quantized_store import QuantizedStore
+from .enrichment_cache import text_key
+from .chunking import TokenCounter
+from .rate_limiter import PRIORITY_INTERACTIVE, RateLimiter, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +25,53 @@ print("Python path:", sys.path)
 print("Current directory:", os.getcwd())
 
 class EmbeddingAgent:
-    def __init__(self):
+    """
+    Azure OpenAI embeddings. Concurrent `generate_embedding` calls are coalesced: texts
+    arriving within `coalesce_window_ms` of the first one, or until `coalesce_max_batch`
+    are waiting, go out as one `generate_embeddings` request and each caller gets its
+    own vector back. Vectors are cached on disk by text, deployment and model, so
+    repeated queries and re-ingested chunks are only embedded once.
+
+    Requests of any size are split by input count and estimated tokens and sent
+    concurrently (at most `max_concurrent_requests` in flight per agent). Throttled
+    and transient failures are retried after the server's Retry-After, or with
+    exponential backoff, and a 429 halves the inputs per request until requests
+    succeed again. Every request first takes quota from the shared RateLimiter at the
+    caller's priority: queries are interactive, ingestion passes PRIORITY_BATCH.
+    """
+
+    def __init__(
+        self,
+        coalesce_window_ms: float = None,
+        coalesce_max_batch: int = None,
+        cache: EmbeddingCache = None,
+        rate_limiter: RateLimiter = None
+    ):
         self.client = None
         self.http_client = None
         self.deployment = config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
-        self.model = "text-embedding-ada-002"  # or whatever model you're using
+        self.model = config.AZURE_OPENAI_EMBEDDING_MODEL or "text-embedding-ada-002"
+        self.cache_namespace = f"{self.deployment}:{self.model}"
+        if cache is None and config.EMBEDDING_CACHE_ENABLED:
+            cache = EmbeddingCache(
+                config.EMBEDDING_CACHE_PATH,
+                max_bytes=config.EMBEDDING_CACHE_MAX_BYTES,
+                memory_items=config.EMBEDDING_CACHE_MEMORY_ITEMS
+            )
+        self.cache = cache
+        window_ms = config.EMBEDDING_COALESCE_WINDOW_MS if coalesce_window_ms is None else coalesce_window_ms
+        self.coalesce_window = window_ms / 1000
+        self.coalesce_max_batch = coalesce_max_batch or config.EMBEDDING_COALESCE_MAX_BATCH
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle = None
+        self._batches = set()
+        self.max_inputs = config.EMBEDDING_MAX_INPUTS
+        self.max_request_tokens = config.EMBEDDING_MAX_REQUEST_TOKENS
+        self.max_retries = config.EMBEDDING_MAX_RETRIES
+        self.batch_limit = self.max_inputs
+        self.request_semaphore = asyncio.Semaphore(config.EMBEDDING_MAX_CONCURRENT_REQUESTS)
+        self.token_counter = TokenCounter()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
 
     async def initialize(self):
         self.http_client = httpx.AsyncClient()
@@ -30,34 +79,137 @@ class EmbeddingAgent:
             api_key=config.AZURE_OPENAI_API_KEY,
             api_version=config.AZURE_OPENAI_API_VERSION,
             azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
-            http_client=self.http_client
+            http_client=self.http_client,
+            # Retries are handled by _embed_with_retry, which also adapts the batch size
+            max_retries=0
         )
 
-    @async_cache
     async def generate_embedding(self, text: str) -> List[float]:
         text = text.replace("\n", " ")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.coalesce_max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.coalesce_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            # Keep a reference so the batch task is not garbage collected mid-request
+            task = asyncio.ensure_future(self._send_batch(pending))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _send_batch(self, pending: List[Tuple[str, asyncio.Future]]):
+        # Identical texts in one window are embedded once
+        texts = list(dict.fromkeys(text for text, _ in pending))
         try:
-            response = await self.client.embeddings.create(
-                input=[text],
-                model=self.deployment
-            )
-            return response.data[0].embedding
+            embeddings = dict(zip(texts, await self.generate_embeddings(texts)))
         except Exception as e:
             logger.error(f"Error generating embedding: {str(e)}")
-            raise
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for text, future in pending:
+            # A caller that was cancelled while waiting has nothing to receive
+            if not future.done():
+                future.set_result(embeddings[text])
 
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        assert len(texts) <= 2048, "The batch size should not be larger than 2048."
+    async def generate_embeddings(self, texts: List[str], priority: str = PRIORITY_INTERACTIVE) -> List[List[float]]:
+        """Embed `texts` in order, serving cached vectors and requesting each missing text once."""
+        if self.cache is None:
+            return await self._request_embeddings(texts, priority)
+        keys = [text_key(text.replace("\n", " ")) for text in texts]
+        found = {key: vector.tolist() for key, vector in (await self.cache.get_many(self.cache_namespace, keys)).items()}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            computed = dict(zip(missing, await self._request_embeddings(list(missing.values()), priority)))
+            await self.cache.put_many(self.cache_namespace, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def _split(self, texts: List[str]) -> List[List[int]]:
+        # Group input positions into requests within the input and token limits
+        batches, batch, batch_tokens = [], [], 0
+        for i, text in enumerate(texts):
+            tokens = self.token_counter.count(text)
+            if batch and (len(batch) >= self.batch_limit or batch_tokens + tokens > self.max_request_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _request_embeddings(self, texts: List[str], priority: str = PRIORITY_INTERACTIVE) -> List[List[float]]:
         texts = [text.replace("\n", " ") for text in texts]
-        try:
-            response = await self.client.embeddings.create(
-                input=texts,
-                model=self.deployment
-            )
-            return [d.embedding for d in response.data]
-        except Exception as e:
-            logger.error(f"Error generating embeddings: {str(e)}")
-            raise
+        embeddings = [None] * len(texts)
+
+        async def run(positions):
+            for i, embedding in zip(positions, await self._embed_with_retry([texts[i] for i in positions], priority)):
+                embeddings[i] = embedding
+
+        await asyncio.gather(*(run(positions) for positions in self._split(texts)))
+        return embeddings
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float:
+        response = getattr(error, "response", None)
+        headers = response.headers if response is not None else {}
+        for header, unit in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+            try:
+                return float(headers[header]) * unit
+            except (KeyError, TypeError, ValueError):
+                continue
+        return None
+
+    async def _embed_with_retry(self, texts: List[str], priority: str = PRIORITY_INTERACTIVE) -> List[List[float]]:
+        attempt = 0
+        while True:
+            if len(texts) > self.batch_limit:
+                # The limit shrank while this request was waiting
+                halves = [texts[i:i + self.batch_limit] for i in range(0, len(texts), self.batch_limit)]
+                results = await asyncio.gather(*(self._embed_with_retry(half, priority) for half in halves))
+                return [embedding for result in results for embedding in result]
+            try:
+                tokens = sum(self.token_counter.count(text) for text in texts)
+                await self.rate_limiter.acquire(self.deployment, tokens, priority)
+                async with self.request_semaphore:
+                    response = await self.client.embeddings.create(input=texts, model=self.deployment)
+                if self.batch_limit < self.max_inputs:
+                    self.batch_limit = min(self.max_inputs, self.batch_limit + max(1, self.batch_limit // 4))
+                return [d.embedding for d in response.data]
+            except openai.RateLimitError as e:
+                self.batch_limit = max(1, min(self.batch_limit, len(texts)) // 2)
+                error = e
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                error = e
+            except Exception as e:
+                logger.error(f"Error generating embeddings: {str(e)}")
+                raise
+            attempt += 1
+            if attempt > self.max_retries:
+                logger.error(f"Error generating embeddings after {attempt} attempts: {str(error)}")
+                raise error
+            delay = self._retry_after(error)
+            if isinstance(error, openai.RateLimitError):
+                # Hold back every caller sharing this deployment's quota, not just this one
+                await self.rate_limiter.throttled(self.deployment, delay)
+            if delay is None:
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+            logger.warning(f"Embedding request for {len(texts)} texts failed ({type(error).__name__}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
 
     @staticmethod
     def cosine_similarity(a: List[float], b: List[float]) -> float:
@@ -65,43 +217,74 @@ class EmbeddingAgent:
 
     def distances_from_embeddings(
         self,
-        query_embedding: List[float],
-        embeddings: List[List[float]],
+        query_embedding: Union[List[float], List[List[float]]],
+        embeddings: Union[EmbeddingMatrix, List[List[float]]],
         distance_metric: str = "cosine"
-    ) -> List[float]:
-        distance_metrics = {
-            "cosine": spatial.distance.cosine,
-            "L1": spatial.distance.cityblock,
-            "L2": spatial.distance.euclidean,
-            "Linf": spatial.distance.chebyshev,
-        }
-        distances = [
-            distance_metrics[distance_metric](query_embedding, embedding)
-            for embedding in embeddings
-        ]
-        return distances
+    ) -> np.ndarray:
+        """
+        Distances from one query (1-D result) or a batch of queries (2-D result) to every
+        embedding. Pass an EmbeddingMatrix to reuse its float32 copy and norms across calls.
+        """
+        if not isinstance(embeddings, EmbeddingMatrix):
+            embeddings = EmbeddingMatrix(embeddings)
+        return embeddings.distances(query_embedding, distance_metric)
 
     def indices_of_nearest_neighbors_from_distances(
         self,
-        distances: List[float],
+        distances: np.ndarray,
         n: int = 5
     ) -> List[int]:
-        return sorted(range(len(distances)), key=lambda i: distances[i])[:n]
+        return nearest(distances, n).tolist()
 
     async def search_similar_chunks(
         self,
         query: str,
-        all_embeddings: List[List[float]],
-        all_chunks: List[str],
-        n: int = 5
-    ) -> List[Tuple[str, float]]:
+        all_embeddings: Union[IVFIndex, QuantizedStore, EmbeddingMatrix, List[List[float]]],
+        all_chunks: List[str] = None,
+        n: int = 5,
+        nprobe: int = None
+    ) -> List[Tuple[Any, float]]:
+        """
+        The `n` chunks closest to `query` with their cosine distances. Given an IVFIndex
+        the lookup is approximate and the chunks are the documents stored in the index,
+        so `all_chunks` is not needed. Given a QuantizedStore, candidates from the code
+        scan are re-ranked exactly; chunks are `all_chunks` in store order, or the ids.
+        """
         query_embedding = await self.generate_embedding(query)
+        if isinstance(all_embeddings, QuantizedStore):
+            hits = (await asyncio.to_thread(all_embeddings.search_rows, [query_embedding], n))[0]
+            chunks = all_chunks if all_chunks is not None else all_embeddings.ids
+            return [(chunks[row], distance) for row, distance in hits]
+        if isinstance(all_embeddings, IVFIndex):
+            hits = (await all_embeddings.search([query_embedding], n, nprobe))[0]
+            documents = await all_embeddings.get_documents([chunk_id for chunk_id, _ in hits])
+            return [(documents[chunk_id], distance) for chunk_id, distance in hits if chunk_id in documents]
         distances = self.distances_from_embeddings(query_embedding, all_embeddings)
         nearest_indices = self.indices_of_nearest_neighbors_from_distances(distances, n)
-        
-        return [(all_chunks[i], distances[i]) for i in nearest_indices]
+
+        return [(all_chunks[i], float(distances[i])) for i in nearest_indices]
+
+    async def search_similar_chunks_batch(
+        self,
+        queries: List[str],
+        all_embeddings: Union[EmbeddingMatrix, List[List[float]]],
+        all_chunks: List[str],
+        n: int = 5
+    ) -> List[List[Tuple[str, float]]]:
+        """`search_similar_chunks` for many queries, embedded in one request and scored in one pass."""
+        if not isinstance(all_embeddings, EmbeddingMatrix):
+            all_embeddings = EmbeddingMatrix(all_embeddings)
+        distances = self.distances_from_embeddings(await self.generate_embeddings(queries), all_embeddings)
+        return [
+            [(all_chunks[i], float(row[i])) for i in indices]
+            for row, indices in zip(distances, self.indices_of_nearest_neighbors_from_distances(distances, n))
+        ]
 
     async def cleanup(self):
+        # Let callers already waiting on a coalesced request get their vectors
+        self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
         if self.http_client:
             await self.http_client.aclose()
 
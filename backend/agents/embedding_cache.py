@@ -0,0 +1,78 @@
+# embedding_cache.py
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+from cachetools import LRUCache
+
+from .tiered_cache import SharedCacheStore
+
+logger = logging.getLogger(__name__)
+
+# Store namespaces of embedding entries, followed by the deployment and model
+NAMESPACE_PREFIX = "embedding:"
+
+
+class EmbeddingCache:
+    """
+    Disk-backed cache of embedding vectors keyed by the hash of the normalized text (see
+    `enrichment_cache.text_key`) and a namespace naming the deployment and model. Vectors
+    are kept as float32 arrays in a `SharedCacheStore`, so every worker process shares one
+    copy and the least recently used vectors are evicted once they exceed `max_bytes`.
+    The `memory_items` most recently used vectors are also kept in process, in front of it.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024, evict_every: int = 1000,
+                 mmap_bytes: int = 256 * 1024 * 1024, memory_items: int = 4096):
+        self.store = SharedCacheStore(path, max_bytes=max_bytes, evict_every=evict_every, mmap_bytes=mmap_bytes)
+        self.memory = LRUCache(memory_items) if memory_items > 0 else None
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _namespace(namespace: str) -> str:
+        return f"{NAMESPACE_PREFIX}{namespace}"
+
+    async def get_many(self, namespace: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Return cached float32 vectors keyed by text hash; updates the hit/miss counters."""
+        found = {}
+        if self.memory is not None:
+            for text_hash in set(hashes):
+                vector = self.memory.get((namespace, text_hash))
+                if vector is not None:
+                    found[text_hash] = vector
+        remaining = [text_hash for text_hash in set(hashes) if text_hash not in found]
+        stored = await self.store.get_many(self._namespace(namespace), remaining)
+        self._remember(namespace, stored)
+        self.memory_hits += sum(1 for text_hash in hashes if text_hash in found)
+        found.update(stored)
+        hits = sum(1 for text_hash in hashes if text_hash in found)
+        self.hits += hits
+        self.misses += len(hashes) - hits
+        return found
+
+    def _remember(self, namespace: str, vectors: Dict[str, np.ndarray]):
+        if self.memory is not None:
+            for text_hash, vector in vectors.items():
+                self.memory[(namespace, text_hash)] = vector
+
+    async def put_many(self, namespace: str, vectors: Dict[str, Any]):
+        if vectors:
+            vectors = {text_hash: np.asarray(vector, dtype=np.float32) for text_hash, vector in vectors.items()}
+            self._remember(namespace, vectors)
+            await self.store.put_many(self._namespace(namespace), vectors)
+
+    async def clear(self):
+        if self.memory is not None:
+            self.memory.clear()
+        await self.store.delete_prefix(NAMESPACE_PREFIX)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,68 @@
+# embedding_matrix.py
+from typing import Sequence, Union
+
+import numpy as np
+
+DISTANCE_METRICS = ("cosine", "L1", "L2", "Linf")
+
+# Upper bound on the elements of the (queries, rows, dimensions) temporary built for the
+# L1 and L∞ metrics, which have no matrix-product form
+BLOCK_ELEMENTS = 1 << 24
+
+
+class EmbeddingMatrix:
+    """Stored embeddings as one contiguous float32 matrix with precomputed L2 norms."""
+
+    def __init__(self, embeddings: Union[np.ndarray, Sequence[Sequence[float]]]):
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(vectors), -1)
+        self.vectors = vectors
+        self.norms = np.linalg.norm(vectors, axis=1)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def distances(self, queries: Union[np.ndarray, Sequence], metric: str = "cosine") -> np.ndarray:
+        """
+        Distances from each query to every stored row, computed for the whole batch at
+        once. A single query gives a 1-D array, a batch of queries a (queries, rows) array.
+        """
+        if metric not in DISTANCE_METRICS:
+            raise ValueError(f"Unknown distance metric: {metric}")
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+
+        if metric in ("cosine", "L2"):
+            dots = queries @ self.vectors.T
+            query_norms = np.linalg.norm(queries, axis=1)
+            if metric == "cosine":
+                scale = np.outer(query_norms, self.norms)
+                # Zero vectors have no direction; treat them as unrelated
+                distances = 1.0 - np.divide(dots, scale, out=np.zeros_like(dots), where=scale > 0)
+            else:
+                squared = query_norms[:, None] ** 2 + self.norms[None, :] ** 2 - 2.0 * dots
+                distances = np.sqrt(np.maximum(squared, 0.0))
+        else:
+            distances = np.empty((len(queries), len(self.vectors)), dtype=np.float32)
+            reduce = np.sum if metric == "L1" else np.max
+            step = max(1, BLOCK_ELEMENTS // max(1, len(queries) * self.vectors.shape[1]))
+            for start in range(0, len(self.vectors), step):
+                block = self.vectors[start:start + step]
+                distances[:, start:start + step] = reduce(np.abs(queries[:, None, :] - block[None, :, :]), axis=2)
+        return distances[0] if single else distances
+
+
+def nearest(distances: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the `n` smallest distances along the last axis, closest first."""
+    distances = np.asarray(distances)
+    n = min(n, distances.shape[-1])
+    if n <= 0:
+        return np.empty(distances.shape[:-1] + (0,), dtype=np.intp)
+    if n < distances.shape[-1]:
+        candidates = np.argpartition(distances, n - 1, axis=-1)[..., :n]
+    else:
+        candidates = np.broadcast_to(np.arange(n), distances.shape[:-1] + (n,))
+    order = np.argsort(np.take_along_axis(distances, candidates, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
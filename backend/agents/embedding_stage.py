@@ -0,0 +1,106 @@
+# embedding_stage.py
+import asyncio
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Union
+
+from .chunking import TokenCounter
+from .embedding_agent import EmbeddingAgent
+from .rate_limiter import PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+Chunk = Dict[str, Any]
+
+
+async def _aiter(items: Union[Iterable[Chunk], AsyncIterable[Chunk]]) -> AsyncIterator[Chunk]:
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class EmbeddingStage:
+    """
+    Ingestion stage that fills `contentVector` on chunk documents. Chunks are packed into
+    `generate_embeddings` calls of at most `batch_size` inputs and `max_batch_tokens`
+    tokens, up to `concurrency` batches are in flight at once, and embedded batches are
+    yielded as soon as they complete so they can be streamed into the index writer.
+    """
+
+    def __init__(
+        self,
+        embedding_agent: EmbeddingAgent,
+        batch_size: int = 256,
+        max_batch_tokens: int = 64000,
+        concurrency: int = 4,
+        token_counter: Optional[TokenCounter] = None
+    ):
+        self.embedding_agent = embedding_agent
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.concurrency = concurrency
+        self.token_counter = token_counter or TokenCounter()
+
+    async def _batches(self, chunks) -> AsyncIterator[List[Chunk]]:
+        batch = []
+        batch_tokens = 0
+        async for chunk in _aiter(chunks):
+            tokens = self.token_counter.count(chunk.get('content', ''))
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.max_batch_tokens):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    async def _embed_batch(self, batch: List[Chunk]) -> List[Chunk]:
+        # Ingestion yields model quota to interactive queries
+        embeddings = await self.embedding_agent.generate_embeddings(
+            [chunk.get('content', '') for chunk in batch], priority=PRIORITY_BATCH
+        )
+        for chunk, embedding in zip(batch, embeddings):
+            chunk['contentVector'] = embedding
+        return batch
+
+    async def embed(
+        self,
+        chunks: Union[Iterable[Chunk], AsyncIterable[Chunk]],
+        on_error: Optional[Callable[[List[Chunk], Exception], None]] = None
+    ) -> AsyncIterator[List[Chunk]]:
+        """
+        Yield embedded batches in completion order. A failed batch raises, unless
+        `on_error` is given, in which case it is reported there and skipped.
+        """
+        pending = {}
+        try:
+            async for batch in self._batches(chunks):
+                while len(pending) >= self.concurrency:
+                    for result in await self._completed(pending, on_error):
+                        yield result
+                pending[asyncio.create_task(self._embed_batch(batch))] = batch
+            while pending:
+                for result in await self._completed(pending, on_error):
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def _completed(pending, on_error) -> List[List[Chunk]]:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        results = []
+        for task in done:
+            batch = pending.pop(task)
+            error = task.exception()
+            if error is None:
+                results.append(task.result())
+            elif on_error is None:
+                raise error
+            else:
+                logger.error(f"Error embedding batch of {len(batch)} chunks: {str(error)}")
+                on_error(batch, error)
+        return results
@@ -0,0 +1,61 @@
+# enrichment_cache.py
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List
+
+from .tiered_cache import SharedCacheStore
+
+logger = logging.getLogger(__name__)
+
+# Store namespaces of enrichment entries, followed by the backend namespace and operation
+NAMESPACE_PREFIX = "enrichment:"
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EnrichmentCache:
+    """
+    Disk-backed cache of enrichment results (summaries, key phrases, entities, language)
+    keyed by the hash of the normalized text, the operation and a namespace naming the
+    backend and its API version, so results from one service version are never served
+    for another. Kept in a `SharedCacheStore` so all ingestion processes share it; the
+    least recently used entries are evicted once the stored values exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, evict_every: int = 1000):
+        self.store = SharedCacheStore(path, max_bytes=max_bytes, evict_every=evict_every)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _namespace(namespace: str, operation: str) -> str:
+        return f"{NAMESPACE_PREFIX}{namespace}:{operation}"
+
+    async def get_many(self, namespace: str, operation: str, hashes: List[str]) -> Dict[str, Any]:
+        """Return cached values keyed by text hash (see `text_key`); updates the hit/miss counters."""
+        found = await self.store.get_many(self._namespace(namespace, operation), list(set(hashes)))
+        hits = sum(1 for text_hash in hashes if text_hash in found)
+        self.hits += hits
+        self.misses += len(hashes) - hits
+        return found
+
+    async def put_many(self, namespace: str, operation: str, values: Dict[str, Any]):
+        await self.store.put_many(self._namespace(namespace, operation), values)
+
+    async def clear(self):
+        await self.store.delete_prefix(NAMESPACE_PREFIX)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,74 @@
+# front_matter.py
+import codecs
+import logging
+from typing import Dict, List, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+FRONT_MATTER_DELIMITER = '---\n'
+
+
+class FrontMatterParser:
+    """
+    Incremental parser for documents with an optional YAML front-matter block.
+    Bytes are fed in arbitrary-sized pieces; body text is handed back as soon as the
+    front-matter has been located so callers never hold the whole document.
+
+    Mirrors the original `content_str.split('---\\n', 2)` behaviour: the text before
+    the first delimiter is discarded, the text between the first two delimiters is
+    the YAML metadata and everything after the second delimiter is the body. The
+    search for the front-matter is bounded by `max_front_matter_bytes`; past that the
+    buffered text is treated as body.
+    """
+
+    def __init__(self, max_front_matter_bytes: int = 64 * 1024, encoding: str = 'utf-8'):
+        self.max_front_matter_bytes = max_front_matter_bytes
+        self.metadata: Dict = {}
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._buffer = ""
+        self._in_body = False
+
+    @property
+    def in_body(self) -> bool:
+        return self._in_body
+
+    def feed(self, data: bytes) -> List[str]:
+        """Feed raw bytes, returning the body text that became available."""
+        return self._process(self._decoder.decode(data))
+
+    def close(self) -> List[str]:
+        """Flush the decoder and return any remaining body text."""
+        pieces = self._process(self._decoder.decode(b"", final=True))
+        if not self._in_body:
+            # Fewer than two delimiters: the whole document is the body
+            self._in_body = True
+            if self._buffer:
+                pieces.append(self._buffer)
+            self._buffer = ""
+        return pieces
+
+    def _process(self, text: str) -> List[str]:
+        if self._in_body:
+            return [text] if text else []
+
+        self._buffer += text
+        parts = self._buffer.split(FRONT_MATTER_DELIMITER, 2)
+        if len(parts) > 2:
+            self.metadata = self._load_metadata(parts[1])
+            self._in_body = True
+            self._buffer = ""
+            return [parts[2]] if parts[2] else []
+
+        if len(self._buffer.encode('utf-8')) > self.max_front_matter_bytes:
+            logger.debug("No front-matter found within the first %d bytes", self.max_front_matter_bytes)
+            self._in_body = True
+            body, self._buffer = self._buffer, ""
+            return [body]
+        return []
+
+    @staticmethod
+    def _load_metadata(metadata_yaml: str) -> Dict:
+        metadata: Optional[Dict] = yaml.safe_load(metadata_yaml)
+        return metadata if isinstance(metadata, dict) else {}
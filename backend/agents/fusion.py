@@ -0,0 +1,51 @@
+# fusion.py
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Retrieval strategies SearchAgent can run for fused search
+STRATEGY_KINDS = ("vector", "keyword", "hybrid")
+
+# Rank offset in reciprocal-rank fusion; larger values flatten the gap between top ranks
+RRF_K = 60
+
+
+@dataclass
+class RetrievalStrategy:
+    name: str
+    kind: str
+    weight: float = 1.0
+    # Applied on top of any filter the caller passes, e.g. "published_date ge 2024-01-01T00:00:00Z"
+    filter: Optional[str] = None
+
+    def __post_init__(self):
+        if self.kind not in STRATEGY_KINDS:
+            raise ValueError(f"Unknown retrieval strategy: {self.kind}")
+
+
+def parse_strategies(spec: str) -> List[RetrievalStrategy]:
+    """Strategies from a "kind:weight,kind:weight" list such as "vector:1.0,keyword:0.5"."""
+    strategies = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, weight = item.partition(":")
+        strategies.append(RetrievalStrategy(kind, kind, float(weight) if weight else 1.0))
+    return strategies
+
+
+def reciprocal_rank_fusion(ranked: Dict[str, List[Dict[str, Any]]], weights: Dict[str, float], k: int = RRF_K, top: int = None) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists by weighted reciprocal rank: a result scores
+    sum(weight / (k + rank)) over the lists it appears in. Each merged result is the
+    first copy seen, with `score` replaced by the fused score and the per-list ranks in
+    `ranks`.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for name, results in ranked.items():
+        weight = weights.get(name, 1.0)
+        for rank, result in enumerate(results, start=1):
+            entry = fused.get(result["id"])
+            if entry is None:
+                entry = fused[result["id"]] = {**result, "score": 0.0, "ranks": {}}
+            entry["score"] += weight / (k + rank)
+            entry["ranks"][name] = rank
+    merged = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+    return merged[:top] if top is not None else merged
@@ -0,0 +1,65 @@
+# index_version.py
+import asyncio
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class IndexVersion:
+    """
+    Node-wide counter advanced whenever the search index changes (chunks uploaded,
+    renumbered or deleted). Caches of query results include the current version in their
+    keys or entries, so nothing computed against an older index is served after a change.
+    Kept in SQLite so ingestion workers and API workers see the same value.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS index_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO index_version (id, version) VALUES (0, 0)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _current(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT version FROM index_version WHERE id = 0").fetchone()[0]
+
+    def _bump(self) -> int:
+        with self._connect() as conn:
+            conn.execute("UPDATE index_version SET version = version + 1 WHERE id = 0")
+            return conn.execute("SELECT version FROM index_version WHERE id = 0").fetchone()[0]
+
+    async def current(self) -> int:
+        return await asyncio.to_thread(self._current)
+
+    async def bump(self) -> int:
+        version = await asyncio.to_thread(self._bump)
+        logger.debug(f"Search index version advanced to {version}")
+        return version
+
+
+_index_version = None
+
+
+def get_index_version() -> IndexVersion:
+    """The process-wide handle on the node's index version, configured from Config."""
+    global _index_version
+    if _index_version is None:
+        _index_version = IndexVersion(Config.INDEX_VERSION_PATH)
+    return _index_version
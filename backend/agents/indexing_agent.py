@@ -9,14 +9,54 @@ import logging
 from config.config import Config
 import aiohttp
 from azure.storage.blob import BlobServiceClient
+from .ingestion_manifest import IngestionManifest
+from .ann_index import local_index_from_config
+from .index_version import get_index_version
 
 logger = logging.getLogger(__name__)
 
+# Largest page Azure Search returns for one query
+INDEX_PAGE_SIZE = 1000
+
+
+async def delete_all_chunks(search_client, page_size: int = INDEX_PAGE_SIZE, settle_delay: float = 1.0, max_stale_pages: int = 10):
+    """
+    Delete every record in the index a page at a time, searching again until the index
+    comes back empty, and return the filenames the deleted chunks belonged to. Deletes
+    become visible to search after a short delay, so a page of only already-deleted ids
+    waits `settle_delay` and retries, giving up after `max_stale_pages` in a row.
+    Raises if any delete fails.
+    """
+    filenames, deleted, stale_pages = set(), set(), 0
+    while True:
+        results = await search_client.search("*", select="id,filename", top=page_size)
+        page = [result async for result in results]
+        if not page:
+            return filenames
+        ids = [result['id'] for result in page]
+        if deleted.issuperset(ids):
+            stale_pages += 1
+            if stale_pages > max_stale_pages:
+                raise RuntimeError(f"{len(ids)} deleted chunks are still returned by the index")
+            await asyncio.sleep(settle_delay)
+            continue
+        stale_pages = 0
+        outcomes = await search_client.delete_documents(documents=[{"id": chunk_id} for chunk_id in ids])
+        failed = [outcome.key for outcome in outcomes or [] if not outcome.succeeded]
+        if failed:
+            raise RuntimeError(f"Failed to delete {len(failed)} chunks, e.g. {failed[0]}")
+        deleted.update(ids)
+        filenames.update(result['filename'] for result in page)
+        logger.debug(f"Deleted {len(deleted)} chunks so far")
+
+
 class IndexingAgent:
     def __init__(self):
         self.config = Config()
         self.search_client = None
         self.blob_service_client = None
+        self.manifest = IngestionManifest(self.config.INGESTION_MANIFEST_PATH)
+        self.local_index = local_index_from_config(self.config)
 
     async def initialize(self):
         try:
@@ -39,24 +79,22 @@ class IndexingAgent:
     async def delete_all_documents(self):
         try:
             logger.info("Starting deletion of all documents")
-            results = await self.search_client.search("*", select="id,filename", top=1000)
-            all_docs = {}
-            async for result in results:
-                if result['filename'] not in all_docs:
-                    all_docs[result['filename']] = []
-                all_docs[result['filename']].append(result['id'])
-
-            for filename, chunk_ids in all_docs.items():
-                logger.debug(f"Deleting chunks for file: {filename}")
-                await self.search_client.delete_documents(documents=[{"id": chunk_id} for chunk_id in chunk_ids])
+            for filename in await delete_all_chunks(self.search_client):
                 logger.debug(f"Deleting blob for file: {filename}")
                 await self.blob_service_client.get_blob_client(self.config.AZURE_STORAGE_CONTAINER_NAME, filename).delete_blob()
 
+            # Only once every chunk is gone, or re-uploads would skip documents still half indexed
+            await self.manifest.clear()
+            if self.local_index:
+                await self.local_index.clear()
             logger.info("All documents and associated data deleted successfully")
             return True
         except Exception as e:
             logger.error(f"Error deleting all documents: {str(e)}")
             return False
+        finally:
+            # Also after a partial failure: some chunks may already be gone
+            await get_index_version().bump()
 
     async def delete_documents(self, file_names: list):
         try:
@@ -79,12 +117,18 @@ class IndexingAgent:
                     logger.error(f"Failed to delete parent document {file_name}")
                     return False
 
+            await self.manifest.forget(file_names)
+            if self.local_index:
+                await self.local_index.delete(parent_ids=file_names)
             logger.info(f"Selected documents and their chunks deleted successfully")
             await self.update_document_count()
             return True
         except Exception as e:
             logger.error(f"Error deleting selected documents: {str(e)}")
             return False
+        finally:
+            # Also after a partial failure: some chunks may already be gone
+            await get_index_version().bump()
 
     async def update_document_count(self):
         try:
@@ -0,0 +1,105 @@
+# ingestion_manifest.py
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionManifest:
+    """
+    Local SQLite record of what has been indexed: the content hash and chunk count of
+    every document and the id and position of every chunk. Chunk ids are content
+    addressed, so they double as chunk hashes. Used to skip unchanged documents and
+    chunks on re-upload; the index holds the same ids and positions, so a missing or
+    deleted manifest only costs one extra lookup per document.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(chunks)")]
+            if "content_hash" in columns:
+                # Manifest from the positional chunk id scheme: it only caches the index, so rebuild it
+                logger.info("Discarding ingestion manifest written with positional chunk ids")
+                conn.execute("DROP TABLE chunks")
+                conn.execute("DROP TABLE IF EXISTS documents")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "parent_id TEXT PRIMARY KEY, filename TEXT, document_hash TEXT, chunk_count INTEGER, updated_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "id TEXT PRIMARY KEY, parent_id TEXT NOT NULL, chunk_number INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_parent ON chunks(parent_id)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get_document(self, parent_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT filename, document_hash, chunk_count FROM documents WHERE parent_id = ?", (parent_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"filename": row[0], "document_hash": row[1], "chunk_count": row[2]}
+
+    def _get_chunks(self, parent_id: str) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, chunk_number FROM chunks WHERE parent_id = ?", (parent_id,)).fetchall()
+        return dict(rows)
+
+    def _record_document(self, parent_id: str, filename: str, document_hash: str, chunk_numbers: Dict[str, int]):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE parent_id = ?", (parent_id,))
+            conn.executemany(
+                "INSERT INTO chunks (id, parent_id, chunk_number) VALUES (?, ?, ?)",
+                [(chunk_id, parent_id, chunk_number) for chunk_id, chunk_number in chunk_numbers.items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (parent_id, filename, document_hash, chunk_count, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (parent_id, filename, document_hash, len(chunk_numbers), time.time())
+            )
+
+    def _forget(self, parent_ids: Iterable[str]):
+        parent_ids = list(parent_ids)
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM chunks WHERE parent_id = ?", [(p,) for p in parent_ids])
+            conn.executemany("DELETE FROM documents WHERE parent_id = ?", [(p,) for p in parent_ids])
+
+    def _clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM documents")
+
+    async def get_document(self, parent_id: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._get_document, parent_id)
+
+    async def get_chunks(self, parent_id: str) -> Dict[str, int]:
+        return await asyncio.to_thread(self._get_chunks, parent_id)
+
+    async def record_document(self, parent_id: str, filename: str, document_hash: str, chunk_numbers: Dict[str, int]):
+        await asyncio.to_thread(self._record_document, parent_id, filename, document_hash, chunk_numbers)
+
+    async def forget(self, parent_ids: Iterable[str]):
+        await asyncio.to_thread(self._forget, parent_ids)
+
+    async def clear(self):
+        await asyncio.to_thread(self._clear)
+        logger.info("Ingestion manifest cleared")
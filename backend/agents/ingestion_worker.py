@@ -0,0 +1,237 @@
+# ingestion_worker.py
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import os
+import re
+import socket
+import uuid
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+    fcntl_available = True
+except ImportError:
+    fcntl_available = False
+
+from .document_processing import DocumentIngestionAgent, IngestionProgress
+from .job_queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+
+async def _heartbeat(queue: JobQueue, job_id: str, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(queue.heartbeat, job_id)
+
+
+async def _process_job(agent: DocumentIngestionAgent, queue: JobQueue, job: Dict[str, Any], heartbeat_interval: float):
+    job_id = job["id"]
+    logger.info(f"Processing ingestion job {job_id} for {job['filename']}")
+
+    def on_update(progress: IngestionProgress):
+        queue.update_progress(job_id, progress.current_stage, progress.details, progress.stage_timings)
+
+    progress = IngestionProgress(on_update)
+    heartbeat = asyncio.create_task(_heartbeat(queue, job_id, heartbeat_interval))
+    try:
+        options = job["options"] or {}
+        succeeded = await agent.upload_document_stream(
+            job["filename"], job["source_path"], progress, enrichment=options.get("enrichment")
+        )
+    except Exception as e:
+        logger.error(f"Error processing ingestion job {job_id}: {str(e)}")
+        progress.error = str(e)
+        succeeded = False
+    finally:
+        heartbeat.cancel()
+
+    if succeeded:
+        await asyncio.to_thread(queue.complete, job_id, {"details": progress.details, "stage_timings": progress.stage_timings})
+    else:
+        await asyncio.to_thread(queue.fail, job_id, progress.error or "Failed to upload or index file")
+
+
+async def _worker_loop(worker_id: str, queue: JobQueue, stop_event, poll_interval: float, heartbeat_interval: float):
+    # The worker process is itself one of the pool's cores, so it parses in-process
+    agent = DocumentIngestionAgent(parsing_workers=0)
+    await agent.initialize()
+    logger.info(f"Ingestion worker {worker_id} started")
+    try:
+        while not stop_event.is_set():
+            job = await asyncio.to_thread(queue.claim, worker_id)
+            if job is None:
+                await asyncio.sleep(poll_interval)
+                continue
+            await _process_job(agent, queue, job, heartbeat_interval)
+    finally:
+        await agent.cleanup()
+        logger.info(f"Ingestion worker {worker_id} stopped")
+
+
+def _run_worker(worker_id: str, db_path: str, stop_event, poll_interval: float, heartbeat_interval: float, stale_after: float):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    queue = JobQueue(db_path, stale_after=stale_after)
+    try:
+        asyncio.run(_worker_loop(worker_id, queue, stop_event, poll_interval, heartbeat_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+class IngestionWorkerPool:
+    """
+    Pool of worker processes that drain the durable ingestion JobQueue. Each process
+    runs its own event loop and DocumentIngestionAgent, so parsing and chunking of
+    concurrent uploads spread across all cores and never block the API process.
+
+    Only one pool per job database runs workers: `start()` takes an exclusive lock
+    next to the database, and pools that lose the race (e.g. the other workers of a
+    multi-worker uvicorn, or any API process while `python -m agents.ingestion_worker`
+    is running) only submit and read jobs. Workers that die are restarted.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        staging_dir: str,
+        processes: int = None,
+        poll_interval: float = 0.5,
+        heartbeat_interval: float = 10.0,
+        stale_after: float = 300.0,
+        block_size: int = 4 * 1024 * 1024
+    ):
+        self.db_path = db_path
+        self.staging_dir = staging_dir
+        self.processes = processes or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.block_size = block_size
+        self.queue = JobQueue(db_path, stale_after=stale_after)
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = None
+        self._workers = []
+        self._supervisor = None
+        self._lock_file = None
+        self._spawned = 0
+        os.makedirs(staging_dir, exist_ok=True)
+
+    @property
+    def owns_workers(self) -> bool:
+        return self._lock_file is not None
+
+    def _acquire_owner_lock(self) -> bool:
+        if not fcntl_available:
+            logger.warning("File locking is unavailable, every process will start its own ingestion workers")
+            self._lock_file = open(f"{self.db_path}.lock", 'a')
+            return True
+        lock_file = open(f"{self.db_path}.lock", 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release_owner_lock(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _spawn(self, slot: int):
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-{slot}-{self._spawned}"
+        self._spawned += 1
+        worker = self._context.Process(
+            target=_run_worker,
+            args=(worker_id, self.db_path, self._stop_event, self.poll_interval, self.heartbeat_interval, self.stale_after),
+            name=f"ingestion-worker-{slot}"
+        )
+        worker.start()
+        return worker
+
+    async def start(self, supervise_interval: float = 5.0) -> bool:
+        """Start the worker processes unless another pool already owns this job database."""
+        if not self._acquire_owner_lock():
+            logger.info(f"Ingestion workers for {self.db_path} run in another process, this process only queues jobs")
+            return False
+        self._stop_event = self._context.Event()
+        self._workers = [self._spawn(slot) for slot in range(self.processes)]
+        self._supervisor = asyncio.create_task(self._supervise(supervise_interval))
+        logger.info(f"Started {self.processes} ingestion worker processes")
+        return True
+
+    async def _supervise(self, interval: float):
+        while not self._stop_event.is_set():
+            await asyncio.sleep(interval)
+            for slot, worker in enumerate(self._workers):
+                if not worker.is_alive() and not self._stop_event.is_set():
+                    # Its running job is requeued by JobQueue.claim once the heartbeat goes stale
+                    logger.warning(f"Ingestion worker {worker.name} exited with code {worker.exitcode}, restarting")
+                    self._workers[slot] = self._spawn(slot)
+
+    async def stop(self, timeout: float = 30.0):
+        if self._stop_event is None:
+            return
+        self._stop_event.set()
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            self._supervisor = None
+        for worker in self._workers:
+            await asyncio.to_thread(worker.join, timeout)
+            if worker.is_alive():
+                logger.warning(f"Ingestion worker {worker.name} did not stop in time, terminating")
+                worker.terminate()
+        self._workers = []
+        self._release_owner_lock()
+        logger.info("Ingestion worker pool stopped")
+
+    async def run_forever(self):
+        if not await self.start():
+            raise RuntimeError(f"Ingestion workers for {self.db_path} are already running")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    async def submit_upload(self, filename: str, source, options: Dict[str, Any] = None) -> str:
+        """Spool `source` (an async or sync binary reader) to the staging directory and queue a job."""
+        safe_name = re.sub(r'[^\w\-.=]', '_', os.path.basename(filename))
+        staged_path = os.path.join(self.staging_dir, f"{uuid.uuid4().hex}-{safe_name}")
+        try:
+            with open(staged_path, 'wb') as staged:
+                while True:
+                    block = source.read(self.block_size)
+                    if inspect.isawaitable(block):
+                        block = await block
+                    if not block:
+                        break
+                    await asyncio.to_thread(staged.write, block)
+            return await asyncio.to_thread(self.queue.submit, filename, staged_path, options)
+        except Exception:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+            raise
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.queue.get, job_id)
+
+
+if __name__ == "__main__":
+    # Run the worker pool on its own, e.g. next to a multi-process API deployment:
+    #   python -m agents.ingestion_worker
+    from config.config import Config
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    pool = IngestionWorkerPool(
+        db_path=Config.INGESTION_JOB_DB_PATH,
+        staging_dir=Config.INGESTION_STAGING_DIR,
+        processes=Config.INGESTION_WORKERS,
+        stale_after=Config.INGESTION_JOB_STALE_SECONDS,
+        block_size=Config.INGESTION_BLOCK_SIZE
+    )
+    try:
+        asyncio.run(pool.run_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,155 @@
+# job_queue.py
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Durable ingestion job queue stored in SQLite so submitted jobs survive restarts.
+    Several worker processes (and several API processes) can share one database file:
+    jobs are claimed atomically and a running job whose heartbeat goes stale is put
+    back on the queue. The staged upload of a job is deleted once the job succeeds or
+    finally fails.
+    """
+
+    def __init__(self, path: str, stale_after: float = 300.0, max_attempts: int = 3):
+        self.path = path
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, filename TEXT NOT NULL, source_path TEXT NOT NULL, "
+                "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, "
+                "stage TEXT, progress TEXT, stage_timings TEXT, result TEXT, error TEXT, "
+                "created_at REAL NOT NULL, started_at REAL, heartbeat_at REAL, finished_at REAL, options TEXT)"
+            )
+            if "options" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                conn.execute("ALTER TABLE jobs ADD COLUMN options TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, filename: str, source_path: str, options: Dict[str, Any] = None) -> str:
+        """Queue a job; `options` are keyword arguments for the ingestion of this upload."""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, filename, source_path, status, progress, stage_timings, created_at, options) "
+                "VALUES (?, ?, ?, ?, '{}', '{}', ?, ?)",
+                (job_id, filename, source_path, JOB_QUEUED, time.time(), json.dumps(options or {}))
+            )
+        logger.info(f"Queued ingestion job {job_id} for {filename}")
+        return job_id
+
+    @staticmethod
+    def _remove_staged(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove staged file {path}: {str(e)}")
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Recover jobs from workers that died mid-job
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ? AND attempts < ?",
+                    (JOB_QUEUED, JOB_RUNNING, now - self.stale_after, self.max_attempts)
+                )
+                abandoned = [r["source_path"] for r in conn.execute(
+                    "SELECT source_path FROM jobs WHERE status = ? AND heartbeat_at < ?",
+                    (JOB_RUNNING, now - self.stale_after)
+                )]
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = 'Worker stopped responding', finished_at = ? "
+                    "WHERE status = ? AND heartbeat_at < ?",
+                    (JOB_FAILED, now, JOB_RUNNING, now - self.stale_after)
+                )
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ? "
+                        "WHERE id = ?",
+                        (JOB_RUNNING, worker, now, now, row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self._remove_staged(abandoned)
+        if row is None:
+            return None
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def update_progress(self, job_id: str, stage: str, progress: Dict[str, Any], stage_timings: Dict[str, float]):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, stage_timings = ?, heartbeat_at = ? WHERE id = ?",
+                (stage, json.dumps(progress, default=str), json.dumps(stage_timings), time.time(), job_id)
+            )
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        self._finish(job_id, JOB_SUCCEEDED, result=json.dumps(result, default=str))
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, JOB_FAILED, error=error)
+
+    def _finish(self, job_id: str, status: str, result: str = None, error: str = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+            row = conn.execute("SELECT source_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is not None:
+            self._remove_staged([row["source_path"]])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("progress", "stage_timings", "result", "options"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
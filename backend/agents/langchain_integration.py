@@ -4,21 +4,66 @@ import json
 import sys
 from langchain_community.retrievers import AzureAISearchRetriever
 from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import BaseMessage
 from config.config import Config
 from .search_agent import SearchAgent
 from .embedding_agent import EmbeddingAgent
 from .llama3_llm import Llama3LLM
+from .ann_index import IVFIndex
+from .index_version import get_index_version
+from .semantic_cache import SemanticAnswerCache, history_digest
+from .reranker import Reranker
+from .diversity import DiversitySelector
 from typing import List, Dict
 import logging
 import aiohttp
 
 logger = logging.getLogger(__name__)
 
+SEARCH_TYPES = ("Vector", "Hybrid", "Local", "Fused")
+
+
+class SearchTypeUnavailableError(ValueError):
+    """A known search type that this deployment is not configured for."""
+
+
 class LangchainAgent:
-    def __init__(self, search_agent: SearchAgent, embedding_agent: EmbeddingAgent, llm: Llama3LLM):
+    def __init__(self, search_agent: SearchAgent, embedding_agent: EmbeddingAgent, llm: Llama3LLM, local_index: IVFIndex = None,
+                 answer_cache: SemanticAnswerCache = None, reranker: Reranker = None, diversity: DiversitySelector = None):
         self.search_agent = search_agent
         self.embedding_agent = embedding_agent
         self.llm = llm
+        self.local_index = local_index
+        config = Config()
+        if answer_cache is None and config.SEMANTIC_CACHE_ENABLED:
+            answer_cache = SemanticAnswerCache(
+                threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+                ttl=config.SEMANTIC_CACHE_TTL
+            )
+        # Answers for paraphrased queries; None unless SEMANTIC_CACHE_ENABLED
+        self.answer_cache = answer_cache
+        if reranker is None and config.RERANK_ENABLED:
+            reranker = Reranker(
+                cosine_weight=config.RERANK_COSINE_WEIGHT,
+                bm25_weight=config.RERANK_BM25_WEIGHT,
+                freshness_weight=config.RERANK_FRESHNESS_WEIGHT,
+                half_life_days=config.RERANK_HALF_LIFE_DAYS
+            )
+        # Re-ranks RERANK_FETCH service results down to the top few; None unless RERANK_ENABLED
+        self.reranker = reranker
+        self.rerank_fetch = config.RERANK_FETCH
+        if diversity is None and config.MMR_ENABLED:
+            diversity = DiversitySelector(
+                lambda_=config.MMR_LAMBDA,
+                collapse=config.MMR_COLLAPSE_NEIGHBORS,
+                window=config.MMR_NEIGHBOR_WINDOW
+            )
+        # Removes redundant chunks before the prompt; None unless MMR_ENABLED
+        self.diversity = diversity
+        self.diversity_fetch = config.MMR_FETCH
+        # Search for ids and scores first and fetch bodies only for the chunks that are kept
+        self.lazy_hydration = config.LAZY_HYDRATION_ENABLED
         self.retriever = None
         self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
         self.session = None
@@ -48,28 +93,47 @@ class LangchainAgent:
         self.memory.clear()
         logger.info("LangchainAgent cleanup completed.")
 
+    def available_search_types(self) -> List[str]:
+        return [search_type for search_type in SEARCH_TYPES if search_type != "Local" or self.local_index is not None]
+
     async def process_query(self, query: str, search_type: str):
+        if search_type == "Local" and self.local_index is None:
+            raise SearchTypeUnavailableError("Local search is disabled; set LOCAL_INDEX_ENABLED to use it")
         try:
-            embedding = await self.embedding_agent.generate_embedding(query)
-            if search_type == "Vector":
-                search_results = await self.search_agent.vector_search(embedding)
-            elif search_type == "Hybrid":
-                search_results = await self.search_agent.hybrid_search(query, embedding)
-            else:
-                raise ValueError(f"Invalid search type: {search_type}")
+            embedding = None
+            if search_type != "Local" or self.answer_cache is not None:
+                embedding = await self.embedding_agent.generate_embedding(query)
+            chat_history = self.memory.chat_memory.messages
+            if self.answer_cache is not None:
+                # Follow-ups like "and the second one?" mean different things in different conversations
+                history_key = history_digest(chat_history)
+                index_version = await get_index_version().current()
+                cached = self.answer_cache.lookup(embedding, search_type, index_version, history_key)
+                if cached is not None:
+                    search_results, llm_response = cached
+                    self.memory.chat_memory.add_user_message(query)
+                    self.memory.chat_memory.add_ai_message(llm_response)
+                    return search_results, llm_response
+
+            # Vectors were only needed for re-ranking; copies keep cached results intact
+            search_results = [
+                {field: value for field, value in result.items() if field != "contentVector"}
+                for result in await self.retrieve(query, embedding, search_type)
+            ]
 
             context = "\n".join([result['content'] for result in search_results])
             has_relevant_context = len(context.strip()) > 0
             if not has_relevant_context:
                 context = "There is no specific context provided from the uploaded documents for the following question."
 
-            chat_history = self.memory.chat_memory.messages
             prompt = self._create_prompt(context, query, chat_history)
             llm_response = await self.llm.generate_response(prompt)
 
             # Update memory
             self.memory.chat_memory.add_user_message(query)
             self.memory.chat_memory.add_ai_message(llm_response)
+            if self.answer_cache is not None:
+                self.answer_cache.store(embedding, search_type, index_version, search_results, llm_response, history_key)
 
             logger.info(f"Context being passed to LLM: {context[:500]}...")
             logger.info(f"LLM response: {llm_response}")
@@ -79,8 +143,64 @@ class LangchainAgent:
             logger.error(f"Error processing query: {str(e)}")
             raise
 
-    def _create_prompt(self, context: str, query: str, chat_history: List[Dict[str, str]]) -> str:
-        history_str = "\n".join([f"Human: {msg['content']}" if msg['type'] == 'human' else f"AI: {msg['content']}" for msg in chat_history])
+    async def retrieve(self, query: str, embedding: List[float], search_type: str, top: int = 5) -> List[Dict]:
+        """
+        Search results for the prompt. With a reranker, service searches over-fetch
+        `rerank_fetch` candidates with their vectors and are re-ranked locally. With a
+        diversity selector, `diversity_fetch` candidates (after re-ranking, if any) go
+        through MMR and neighbour collapsing. Either way `top` results are returned.
+        With lazy hydration, searches return ids and scores only and the kept results are
+        hydrated last; re-ranking then works without the BM25 signal, which needs text.
+        """
+        rerank = self.reranker is not None and search_type != "Local"
+        diversify = self.diversity is not None
+        selected = self.diversity_fetch if diversify else top
+        fetch = max(selected, self.rerank_fetch if rerank else 0)
+        with_vectors = rerank or diversify
+        lazy = self.lazy_hydration and search_type != "Local"
+        if search_type == "Local":
+            candidates = await self.local_search(query, selected)
+        elif search_type == "Vector":
+            candidates = await self.search_agent.vector_search(embedding, fetch, with_vectors=with_vectors, lazy=lazy)
+        elif search_type == "Hybrid":
+            candidates = await self.search_agent.hybrid_search(query, embedding, fetch, with_vectors=with_vectors, lazy=lazy)
+        elif search_type == "Fused":
+            candidates, _ = await self.search_agent.fused_search(query, embedding, top=fetch, with_vectors=with_vectors, lazy=lazy)
+        else:
+            raise ValueError(f"Invalid search type: {search_type}")
+        if rerank:
+            candidates = self.reranker.rerank(query, embedding, candidates, selected)
+        if diversify:
+            candidates = self.diversity.select(embedding, candidates, top)
+        if lazy:
+            return await self.search_agent.hydrate(candidates[:top])
+        return candidates[:top]
+
+    async def local_search(self, query: str, top: int = 5) -> List[Dict]:
+        """Vector search on the in-process index, in SearchAgent's result format."""
+        if self.local_index is None:
+            raise SearchTypeUnavailableError("Local search is disabled; set LOCAL_INDEX_ENABLED to use it")
+        hits = await self.embedding_agent.search_similar_chunks(query, self.local_index, n=top)
+        return [
+            {
+                "id": document["id"],
+                "parent_id": document.get("parent_id", ""),
+                "filename": document.get("filename", ""),
+                "title": document.get("title", ""),
+                "content": document.get("content", ""),
+                "published_date": document.get("published_date", ""),
+                "author": document.get("author", ""),
+                "key_phrases": document.get("key_phrases", []),
+                "summary": document.get("summary", ""),
+                "chunk_number": document.get("chunk_number", 0),
+                "score": 1.0 - distance,
+                "captions": [],
+            }
+            for document, distance in hits
+        ]
+
+    def _create_prompt(self, context: str, query: str, chat_history: List[BaseMessage]) -> str:
+        history_str = "\n".join([f"Human: {msg.content}" if msg.type == 'human' else f"AI: {msg.content}" for msg in chat_history])
         return f"""Previous conversation:
 {history_str}
 
@@ -4,16 +4,21 @@ import json
 import sys
 import aiohttp
 from config.config import Config
+from .chunking import TokenCounter
+from .rate_limiter import PRIORITY_INTERACTIVE, RateLimiter, get_rate_limiter
 import logging
 
 logger = logging.getLogger(__name__)
 
 class Llama3LLM:
-    def __init__(self):
+    def __init__(self, rate_limiter: RateLimiter = None):
         self.config = Config()
         self.endpoint = self.config.META_LLAMA_CHAT_ENDPOINT
         self.api_key = self.config.META_LLAMA_API_KEY
         self.session = None
+        self.deployment = self.config.LLM_DEPLOYMENT
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.token_counter = TokenCounter()
 
     async def initialize(self):
         self.session = aiohttp.ClientSession()
@@ -23,7 +28,7 @@ class Llama3LLM:
             await self.session.close()
         logger.info("Llama3LLM cleanup completed.")
 
-    async def generate_response(self, prompt: str, max_tokens: int = 2000):
+    async def generate_response(self, prompt: str, max_tokens: int = 2000, priority: str = PRIORITY_INTERACTIVE):
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
@@ -37,7 +42,14 @@ class Llama3LLM:
             "stop": ["\n", "\n"]  # Stop generation at these tokens
         }
         try:
+            # Quota covers the prompt plus the completion it may generate
+            await self.rate_limiter.acquire(self.deployment, self.token_counter.count(prompt) + max_tokens, priority)
             async with self.session.post(self.endpoint, json=data, headers=headers) as response:
+                if response.status == 429:
+                    retry_after = response.headers.get("Retry-After")
+                    await self.rate_limiter.throttled(
+                        self.deployment, float(retry_after) if retry_after and retry_after.isdigit() else None
+                    )
                 if response.status != 200:
                     error_text = await response.text()
                     raise ValueError(f"API call failed: {response.status} - {error_text}")
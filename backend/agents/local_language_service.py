@@ -0,0 +1,230 @@
+# local_language_service.py
+import asyncio
+import logging
+import re
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+# Words plus the punctuation that ends a key phrase candidate
+PHRASE_TOKEN_PATTERN = re.compile(WORD_PATTERN.pattern + r"|[.,;:!?()\[\]\"]")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+herself him himself his how i if in into is it its itself just let me more most my myself no nor not now of off on
+once only or other our ours ourselves out over own same she should so some such than that the their theirs them
+themselves then there these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves may might must shall one two new use used using
+""".split())
+
+# Seed text per language for the character n-gram language identifier: Article 1 of the
+# Universal Declaration of Human Rights followed by frequent function words
+LANGUAGE_SEEDS = {
+    "English": "All human beings are born free and equal in dignity and rights. They are endowed with reason and "
+               "conscience and should act towards one another in a spirit of brotherhood. the of and to in is that "
+               "it for was on are with as this be at by from have not but or which you they we his her there what",
+    "French": "Tous les êtres humains naissent libres et égaux en dignité et en droits. Ils sont doués de raison et "
+              "de conscience et doivent agir les uns envers les autres dans un esprit de fraternité. le la les de des "
+              "du et est une dans que qui pour pas sur avec plus par ce cette nous vous leur sont été aussi",
+    "German": "Alle Menschen sind frei und gleich an Würde und Rechten geboren. Sie sind mit Vernunft und Gewissen "
+              "begabt und sollen einander im Geist der Brüderlichkeit begegnen. der die das und ist nicht ein eine "
+              "zu mit sich auf für von auch werden wird dem den des sind wie oder nach bei",
+    "Spanish": "Todos los seres humanos nacen libres e iguales en dignidad y derechos y, dotados como están de razón "
+               "y conciencia, deben comportarse fraternalmente los unos con los otros. el la los las de del que y en "
+               "un una es por con para como pero sus más este esta fue son también",
+    "Italian": "Tutti gli esseri umani nascono liberi ed eguali in dignità e diritti. Essi sono dotati di ragione e "
+               "di coscienza e devono agire gli uni verso gli altri in spirito di fratellanza. il lo la gli le di che "
+               "e è un una per non con del della sono anche come questo questa nel alla",
+    "Portuguese": "Todos os seres humanos nascem livres e iguais em dignidade e em direitos. Dotados de razão e de "
+                  "consciência, devem agir uns para com os outros em espírito de fraternidade. o a os as de do da que "
+                  "e em um uma não para com por mais como mas foi são também seu sua isso",
+    "Dutch": "Alle mensen worden vrij en gelijk in waardigheid en rechten geboren. Zij zijn begiftigd met verstand en "
+             "geweten, en behoren zich jegens elkander in een geest van broederschap te gedragen. de het een en van "
+             "in is dat op te zijn met voor niet aan er ook als bij door maar nog wordt",
+}
+
+
+def _char_ngrams(text: str, n: int = 3) -> List[str]:
+    padded = f" {' '.join(WORD_PATTERN.findall(text.lower()))} "
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+class LocalLanguageService:
+    """
+    Offline enrichment backend with the same batch interface as AzureLanguageService.
+    Each call works on a whole batch of texts with NumPy: TF-IDF key phrases scored
+    against the batch, TextRank extractive summaries with the power iteration run for
+    all texts at once, and a hashed character-trigram language identifier. There is no
+    local entity recognizer, so `recognize_entities_batch` returns empty lists.
+    """
+
+    NGRAM_BUCKETS = 4096
+    SUMMARY_GROUP_SIZE = 64
+
+    def __init__(self, max_key_phrases: int = 10, summary_sentences: int = 3, max_phrase_words: int = 3):
+        self.client = None
+        self.cache_namespace = "local-language:1"
+        self.max_key_phrases = max_key_phrases
+        self.summary_sentences = summary_sentences
+        self.max_phrase_words = max_phrase_words
+        self.language_names = list(LANGUAGE_SEEDS)
+        self.language_profiles = self._ngram_matrix(list(LANGUAGE_SEEDS.values()))
+
+    async def initialize(self):
+        logger.info("LocalLanguageService initialized successfully")
+
+    async def cleanup(self):
+        logger.info("LocalLanguageService cleanup completed.")
+
+    # Key phrases
+
+    def _candidate_phrases(self, text: str) -> List[str]:
+        # Maximal runs of non-stopwords within a clause, split into phrases of at most max_phrase_words
+        phrases = []
+        run = []
+        for word in PHRASE_TOKEN_PATTERN.findall(text.lower()) + [""]:
+            if len(word) > 1 and word not in STOPWORDS:
+                run.append(word)
+                continue
+            for start in range(0, len(run), self.max_phrase_words):
+                phrases.append(" ".join(run[start:start + self.max_phrase_words]))
+            run = []
+        return phrases
+
+    def _tfidf_pairs(self, documents: List[List[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+        # Sparse (document, term, tf-idf) triples for the whole batch
+        vocabulary: Dict[str, int] = {}
+        doc_index, term_index = [], []
+        for i, terms in enumerate(documents):
+            for term in terms:
+                doc_index.append(i)
+                term_index.append(vocabulary.setdefault(term, len(vocabulary)))
+        if not term_index:
+            return np.empty(0, int), np.empty(0, int), np.empty(0), []
+        vocab_size = len(vocabulary)
+        pairs, counts = np.unique(np.array(doc_index) * vocab_size + np.array(term_index), return_counts=True)
+        docs, terms = np.divmod(pairs, vocab_size)
+        document_frequency = np.bincount(terms, minlength=vocab_size)
+        idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1.0
+        lengths = np.bincount(np.array(doc_index), minlength=len(documents))
+        scores = counts / lengths[docs] * idf[terms]
+        return docs, terms, scores, list(vocabulary)
+
+    def _key_phrases(self, texts: List[str]) -> List[list]:
+        candidates = [self._candidate_phrases(text) for text in texts]
+        docs, terms, scores, vocabulary = self._tfidf_pairs(candidates)
+        results = [[] for _ in texts]
+        if not len(docs):
+            return results
+        # Longer phrases carry more information than their TF-IDF alone suggests
+        words = np.array([term.count(" ") + 1 for term in vocabulary])
+        scores = scores * np.sqrt(words[terms])
+        order = np.lexsort((-scores, docs))
+        for doc, term in zip(docs[order], terms[order]):
+            if len(results[doc]) < self.max_key_phrases:
+                results[doc].append(vocabulary[term])
+        return results
+
+    # Summaries
+
+    def _summaries(self, texts: List[str]) -> List[str]:
+        sentences = [[s.strip() for s in SENTENCE_PATTERN.split(text) if s.strip()] for text in texts]
+        words = [[[w for w in WORD_PATTERN.findall(s.lower()) if w not in STOPWORDS] for s in doc] for doc in sentences]
+        # IDF is computed over every sentence in the batch
+        docs, terms, scores, _ = self._tfidf_pairs([sentence for doc in words for sentence in doc])
+        summaries = [" ".join(doc) for doc in sentences]
+
+        offsets = np.cumsum([0] + [len(doc) for doc in sentences])
+        long_texts = [i for i, doc in enumerate(sentences) if len(doc) > self.summary_sentences]
+        # Texts of similar length share one padded tensor so padding stays small
+        long_texts.sort(key=lambda i: len(sentences[i]))
+        for start in range(0, len(long_texts), self.SUMMARY_GROUP_SIZE):
+            group = long_texts[start:start + self.SUMMARY_GROUP_SIZE]
+            ranks = self._textrank([self._sentence_vectors(docs, terms, scores, offsets[i], offsets[i + 1]) for i in group])
+            for i, rank in zip(group, ranks):
+                top = np.sort(np.argsort(-rank[:len(sentences[i])], kind="stable")[:self.summary_sentences])
+                summaries[i] = " ".join(sentences[i][j] for j in top)
+        return summaries
+
+    @staticmethod
+    def _sentence_vectors(docs, terms, scores, first: int, last: int) -> np.ndarray:
+        # Dense, L2-normalized TF-IDF rows for sentences [first, last) over their own terms only
+        lo, hi = np.searchsorted(docs, [first, last])
+        local_terms, columns = np.unique(terms[lo:hi], return_inverse=True)
+        vectors = np.zeros((last - first, max(len(local_terms), 1)), dtype=np.float32)
+        vectors[docs[lo:hi] - first, columns] = scores[lo:hi]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    @staticmethod
+    def _textrank(blocks: List[np.ndarray], damping: float = 0.85, iterations: int = 30) -> np.ndarray:
+        # Power iteration over a stack of padded sentence-similarity graphs at once
+        size = max(len(block) for block in blocks)
+        graphs = np.zeros((len(blocks), size, size), dtype=np.float32)
+        mask = np.zeros((len(blocks), size), dtype=np.float32)
+        for i, block in enumerate(blocks):
+            graphs[i, :len(block), :len(block)] = block @ block.T
+            mask[i, :len(block)] = 1.0
+        diagonal = np.arange(size)
+        graphs[:, diagonal, diagonal] = 0.0
+        out_degree = graphs.sum(axis=2, keepdims=True)
+        transitions = np.divide(graphs, out_degree, out=np.zeros_like(graphs), where=out_degree > 0)
+
+        counts = mask.sum(axis=1, keepdims=True)
+        ranks = mask / counts
+        for _ in range(iterations):
+            ranks = ((1 - damping) / counts + damping * np.einsum('bij,bi->bj', transitions, ranks)) * mask
+        return ranks
+
+    # Language identification
+
+    def _ngram_matrix(self, texts: List[str]) -> np.ndarray:
+        rows, columns = [], []
+        for i, text in enumerate(texts):
+            for gram in _char_ngrams(text):
+                rows.append(i)
+                # Python's str hash is salted per process; crc32 keeps profiles comparable
+                columns.append(zlib.crc32(gram.encode('utf-8')) % self.NGRAM_BUCKETS)
+        matrix = np.zeros((len(texts), self.NGRAM_BUCKETS), dtype=np.float32)
+        np.add.at(matrix, (np.array(rows, dtype=int), np.array(columns, dtype=int)), 1.0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1)
+
+    def _languages(self, texts: List[str]) -> List[str]:
+        similarity = self._ngram_matrix(texts) @ self.language_profiles.T
+        best = similarity.argmax(axis=1)
+        return [self.language_names[b] if similarity[i, b] > 0 else "Unknown" for i, b in enumerate(best)]
+
+    # AzureLanguageService interface
+
+    # NumPy releases the GIL for the heavy array work, so batches run in worker threads
+
+    async def generate_summaries(self, texts: List[str]) -> List[str]:
+        return await asyncio.to_thread(self._summaries, texts) if texts else []
+
+    async def detect_languages(self, texts: List[str]) -> List[str]:
+        return await asyncio.to_thread(self._languages, texts) if texts else []
+
+    async def recognize_entities_batch(self, texts: List[str]) -> List[list]:
+        return [[] for _ in texts]
+
+    async def extract_key_phrases_batch(self, texts: List[str]) -> List[list]:
+        return await asyncio.to_thread(self._key_phrases, texts) if texts else []
+
+    async def generate_summary(self, text: str) -> str:
+        return (await self.generate_summaries([text]))[0]
+
+    async def detect_language(self, text: str) -> str:
+        return (await self.detect_languages([text]))[0]
+
+    async def recognize_entities(self, text: str) -> list:
+        return []
+
+    async def extract_key_phrases(self, text: str) -> list:
+        return (await self.extract_key_phrases_batch([text]))[0]
@@ -0,0 +1,234 @@
+# parsing_engine.py
+import asyncio
+import codecs
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from .chunking import TextChunker, build_chunk_document
+from .front_matter import FrontMatterParser
+
+logger = logging.getLogger(__name__)
+
+# An extractor reads the file at `path` and yields its body text lazily, filling
+# `metadata` in as it goes; the metadata is complete once the body is exhausted.
+Extractor = Callable[[str, Dict[str, Any], Dict[str, Any]], Iterator[str]]
+
+EXTRACTORS: Dict[str, Extractor] = {}
+EXTENSIONS: Dict[str, str] = {}
+DEFAULT_EXTRACTOR = "markdown"
+
+
+def register_extractor(name: str, extensions: Tuple[str, ...] = ()):
+    def decorator(func: Extractor) -> Extractor:
+        EXTRACTORS[name] = func
+        for extension in extensions:
+            EXTENSIONS[extension.lower()] = name
+        return func
+    return decorator
+
+
+def extractor_for(filename: str) -> str:
+    return EXTENSIONS.get(os.path.splitext(filename)[1].lower(), DEFAULT_EXTRACTOR)
+
+
+def _read_blocks(path: str, read_size: int) -> Iterator[bytes]:
+    with open(path, 'rb') as source:
+        while True:
+            block = source.read(read_size)
+            if not block:
+                break
+            yield block
+
+
+@register_extractor("markdown", (".md", ".markdown", ".txt"))
+def extract_markdown(path: str, options: Dict[str, Any], metadata: Dict[str, Any]) -> Iterator[str]:
+    """Markdown or text with an optional YAML front-matter block."""
+    parser = FrontMatterParser(max_front_matter_bytes=options["front_matter_max_bytes"])
+    for block in _read_blocks(path, options["read_size"]):
+        yield from parser.feed(block)
+    yield from parser.close()
+    metadata.update(parser.metadata)
+
+
+@register_extractor("text", (".text", ".log", ".csv"))
+def extract_text(path: str, options: Dict[str, Any], metadata: Dict[str, Any]) -> Iterator[str]:
+    """Plain text without front-matter."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for block in _read_blocks(path, options["read_size"]):
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+class _HTMLTextExtractor(HTMLParser):
+    SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre", "blockquote"}
+    META_FIELDS = {"author": "author", "date": "published_date", "article:published_time": "published_date",
+                   "description": "summary", "keywords": "key_phrases"}
+
+    def __init__(self, metadata: Dict[str, Any]):
+        super().__init__(convert_charrefs=True)
+        self.metadata = metadata
+        self.pieces = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            field = self.META_FIELDS.get((attrs.get("name") or attrs.get("property") or "").lower())
+            if field and attrs.get("content"):
+                value = attrs["content"]
+                self.metadata[field] = [k.strip() for k in value.split(",") if k.strip()] if field == "key_phrases" else value
+        elif tag in self.BLOCK_TAGS and not self._skip_depth:
+            self.pieces.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self.BLOCK_TAGS and not self._skip_depth:
+            self.pieces.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.metadata["title"] = (self.metadata.get("title", "") + " " + data.strip()).strip()
+        elif not self._skip_depth:
+            self.pieces.append(data)
+
+    def drain(self) -> str:
+        text = re.sub(r'\n\s*\n+', '\n\n', "".join(self.pieces))
+        self.pieces.clear()
+        return text
+
+
+@register_extractor("html", (".html", ".htm"))
+def extract_html(path: str, options: Dict[str, Any], metadata: Dict[str, Any]) -> Iterator[str]:
+    """Visible text of an HTML page; <title> and author/date/description/keywords meta tags become metadata."""
+    parser = _HTMLTextExtractor(metadata)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for block in _read_blocks(path, options["read_size"]):
+        parser.feed(decoder.decode(block))
+        yield parser.drain()
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    yield parser.drain()
+
+
+def build_parent(parent_id: str, filename: str, metadata: Dict[str, Any], document_hash: str) -> Dict[str, Any]:
+    return {
+        "id": parent_id,
+        "filename": filename,
+        "document_hash": document_hash,
+        "language": "en",  # Or use language detection
+        "title": metadata.get("title", ""),
+        "published_date": metadata.get("published_date", None),
+        "author": metadata.get("author", ""),
+        "key_phrases": metadata.get("key_phrases", []),
+        "summary": metadata.get("summary", ""),
+    }
+
+
+def parse_document(path: str, filename: str, parent_id: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Hash, extract and chunk one document. Runs inside a pool process: chunk texts are
+    written to a JSON-lines spool file and only the parent fields, the chunk count
+    and the spool path travel back to the event loop.
+    """
+    digest = hashlib.sha256()
+    for block in _read_blocks(path, options["read_size"]):
+        digest.update(block)
+
+    metadata: Dict[str, Any] = {}
+    extractor = EXTRACTORS[options.get("extractor") or extractor_for(filename)]
+    chunker = TextChunker(chunk_size=options["chunk_size"], chunk_overlap=options["chunk_overlap"])
+    chunk_count = 0
+    fd, chunks_path = tempfile.mkstemp(prefix="chunks-", suffix=".jsonl", dir=options.get("spool_dir"))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as spool:
+            for content in chunker.iter_chunks(extractor(path, options, metadata)):
+                spool.write(json.dumps(content, ensure_ascii=False))
+                spool.write("\n")
+                chunk_count += 1
+    except Exception:
+        os.remove(chunks_path)
+        raise
+
+    parent = build_parent(parent_id, filename, metadata, digest.hexdigest())
+    # Round-trip through JSON so YAML dates and other objects arrive as plain values
+    return {"parent": json.loads(json.dumps(parent, default=str)), "chunk_count": chunk_count, "chunks_path": chunks_path}
+
+
+class ParsedDocument:
+    """Result of `ParsingEngine.parse`: parent fields plus a spool of chunk documents."""
+
+    def __init__(self, parent: Dict[str, Any], chunk_count: int, chunks_path: str):
+        self.parent = parent
+        self.chunk_count = chunk_count
+        self.chunks_path = chunks_path
+
+    def iter_chunks(self) -> Iterator[Dict[str, Any]]:
+        seen = {}
+        with open(self.chunks_path, 'r', encoding='utf-8') as spool:
+            for chunk_number, line in enumerate(spool):
+                yield build_chunk_document(self.parent, chunk_number, json.loads(line), seen)
+
+    def close(self):
+        if self.chunks_path and os.path.exists(self.chunks_path):
+            os.remove(self.chunks_path)
+        self.chunks_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParsingEngine:
+    """
+    Runs document extraction and chunking off the event loop. With `max_workers > 0`
+    a ProcessPoolExecutor (sized to the core count by default) does the work so large
+    files never stall concurrent queries; with `max_workers == 0`, used inside
+    dedicated ingestion worker processes, parsing runs in a thread instead.
+    """
+
+    def __init__(self, options: Dict[str, Any], max_workers: Optional[int] = None):
+        self.options = options
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started parsing engine with {self.max_workers} processes")
+        return self._executor
+
+    async def parse(self, path: str, filename: str, parent_id: str, extractor: str = None) -> ParsedDocument:
+        options = dict(self.options, extractor=extractor)
+        if self.max_workers > 0:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), parse_document, path, filename, parent_id, options)
+        else:
+            result = await asyncio.to_thread(parse_document, path, filename, parent_id, options)
+        return ParsedDocument(result["parent"], result["chunk_count"], result["chunks_path"])
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,307 @@
+# quantized_store.py
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows per block when encoding or scanning, to bound temporary memory
+BLOCK_ROWS = 65536
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+class ScalarQuantizer:
+    """One byte per dimension: each dimension's trained [min, max] range is cut into 256 steps."""
+
+    name = "int8"
+
+    def __init__(self, low: np.ndarray = None, scale: np.ndarray = None):
+        self.low = low
+        self.scale = scale
+
+    def train(self, vectors: np.ndarray):
+        self.low = vectors.min(axis=0)
+        self.scale = np.maximum(vectors.max(axis=0) - self.low, 1e-12) / 255.0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint((vectors - self.low) / self.scale), 0, 255).astype(np.uint8)
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        # q·(low + scale * code) = q·low + (q * scale)·code
+        return codes.astype(np.float32) @ (queries * self.scale).T + (queries @ self.low)[None, :]
+
+    def params(self) -> Dict[str, np.ndarray]:
+        return {"low": self.low, "scale": self.scale}
+
+
+class ProductQuantizer:
+    """
+    Product quantization: vectors are split into `subspaces` slices and each slice is
+    replaced by the nearest of 256 trained centroids, so a vector costs one byte per
+    subspace. Scans score codes against per-query lookup tables.
+    """
+
+    name = "pq"
+
+    def __init__(self, subspaces: int = 96, centroids: np.ndarray = None, iterations: int = 15):
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.iterations = iterations
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(len(vectors), self.subspaces, -1)
+
+    def train(self, vectors: np.ndarray):
+        if vectors.shape[1] % self.subspaces:
+            raise ValueError(f"{vectors.shape[1]} dimensions cannot be split into {self.subspaces} subspaces")
+        rng = np.random.default_rng(0)
+        slices = self._split(vectors)
+        clusters = min(256, len(vectors))
+        centroids = np.zeros((self.subspaces, 256, slices.shape[2]), dtype=np.float32)
+        for j in range(self.subspaces):
+            points = slices[:, j, :]
+            current = points[rng.choice(len(points), clusters, replace=False)]
+            for _ in range(self.iterations):
+                labels = self._nearest(points, current)
+                sums = np.zeros_like(current)
+                np.add.at(sums, labels, points)
+                counts = np.bincount(labels, minlength=clusters)[:, None]
+                current = np.where(counts > 0, sums / np.maximum(counts, 1), current)
+            centroids[j, :clusters] = current
+            # Unused slots repeat the first centroid so they are never strictly nearer
+            centroids[j, clusters:] = current[0]
+        self.centroids = centroids
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2.0 * points @ centroids.T
+        return np.argmin(distances, axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        slices = self._split(vectors)
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for j in range(self.subspaces):
+            codes[:, j] = self._nearest(slices[:, j, :], self.centroids[j])
+        return codes
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        tables = np.einsum('qjd,jcd->qjc', self._split(queries), self.centroids)
+        scores = np.zeros((len(codes), len(queries)), dtype=np.float32)
+        for j in range(self.subspaces):
+            scores += tables[:, j, :].T[codes[:, j]]
+        return scores
+
+    def params(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids}
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+class QuantizedStore:
+    """
+    Compact embedding store for keeping large corpora resident. Searches scan only the
+    quantized codes (1 byte per dimension for int8, 1 byte per subspace for pq, against
+    4 bytes per dimension for float32), so only they need to stay in memory; the
+    full-precision vectors are read from `vectors.npy` for the rows being re-ranked. A
+    search scans the codes for `k * rerank_factor` candidates and re-ranks them exactly
+    from the float32 vectors. `recall_report` measures what the approximate scan loses
+    against an exact scan.
+
+    Codes and vectors are memory-mapped files with spare capacity that doubles when it
+    runs out, and ids are appended to `ids.jsonl`, so `add` writes only the new rows.
+    `meta.json` records how many rows (and id bytes) are complete; it is replaced last.
+
+    The store is a library component: `EmbeddingAgent.search_similar_chunks` accepts one,
+    but no search type or setting builds it.
+    """
+
+    def __init__(self, directory: str, quantizer: str = "int8", subspaces: int = 96, rerank_factor: int = 10):
+        if quantizer not in QUANTIZERS:
+            raise ValueError(f"Unknown quantizer: {quantizer}")
+        self.directory = directory
+        self.rerank_factor = rerank_factor
+        self.vectors_path = os.path.join(directory, "vectors.npy")
+        self.codes_path = os.path.join(directory, "codes.npy")
+        self.quantizer_path = os.path.join(directory, "quantizer.npz")
+        self.ids_path = os.path.join(directory, "ids.jsonl")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.quantizer = ProductQuantizer(subspaces) if quantizer == "pq" else ScalarQuantizer()
+        # Whole files including spare capacity; `vectors` and `codes` are their used rows
+        self._vector_file = None
+        self._code_file = None
+        self.vectors = None
+        self.codes = None
+        self.ids: List[str] = []
+        self._ids_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            self._open()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _open(self):
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self._ids_bytes = meta["ids_bytes"]
+        with open(self.ids_path, "rb") as f:
+            self.ids = [json.loads(line) for line in f.read(self._ids_bytes).splitlines()]
+        params = dict(np.load(self.quantizer_path))
+        kind = str(params.pop("kind"))
+        if kind != self.quantizer.name:
+            raise ValueError(f"Store in {self.directory} uses the {kind} quantizer, not {self.quantizer.name}")
+        for name, value in params.items():
+            setattr(self.quantizer, name, value)
+        if kind == "pq":
+            self.quantizer.subspaces = len(self.quantizer.centroids)
+        self._map()
+
+    def _map(self):
+        self._vector_file = np.load(self.vectors_path, mmap_mode="r+")
+        self._code_file = np.load(self.codes_path, mmap_mode="r+")
+        self.vectors = self._vector_file[:len(self.ids)]
+        self.codes = self._code_file[:len(self.ids)]
+
+    def build(self, ids: Sequence[str], vectors, sample_size: int = 65536):
+        """Write the store for `vectors`, training the quantizer on a sample of them."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(0)
+        sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), sample_size), replace=False))]
+        self.quantizer.train(_unit_rows(sample))
+        for path in (self.meta_path, self.ids_path, self.vectors_path, self.codes_path):
+            if os.path.exists(path):
+                os.remove(path)
+        np.savez(self.quantizer_path, kind=self.quantizer.name, **self.quantizer.params())
+        self._vector_file = self._code_file = None
+        self.ids, self._ids_bytes = [], 0
+        self._append(list(ids), vectors)
+
+    def add(self, ids: Sequence[str], vectors):
+        """Append vectors, encoded with the already trained quantizer."""
+        if self.codes is None:
+            return self.build(ids, vectors)
+        self._append(list(ids), np.asarray(vectors, dtype=np.float32))
+
+    def _grow(self, needed: int, dimensions: int, code_width: int):
+        capacity = len(self._vector_file) if self._vector_file is not None else 0
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        count = len(self.ids)
+        for path, shape, dtype, current in (
+            (self.vectors_path, (capacity, dimensions), np.float32, self._vector_file),
+            (self.codes_path, (capacity, code_width), np.uint8, self._code_file),
+        ):
+            tmp_path = f"{path}.tmp.npy"
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            for start in range(0, count, BLOCK_ROWS):
+                grown[start:min(count, start + BLOCK_ROWS)] = current[start:min(count, start + BLOCK_ROWS)]
+            grown.flush()
+            del grown
+            os.replace(tmp_path, path)
+        self._map()
+
+    def _append(self, ids: List[str], new_vectors: np.ndarray):
+        if not ids:
+            return
+        first = len(self.ids)
+        code_width = self.quantizer.encode(_unit_rows(new_vectors[:1])).shape[1]
+        self._grow(first + len(ids), new_vectors.shape[1], code_width)
+        for start in range(0, len(new_vectors), BLOCK_ROWS):
+            block = _unit_rows(new_vectors[start:start + BLOCK_ROWS])
+            rows = slice(first + start, first + start + len(block))
+            self._vector_file[rows] = block
+            self._code_file[rows] = self.quantizer.encode(block)
+        self._vector_file.flush()
+        self._code_file.flush()
+        with open(self.ids_path, "ab") as f:
+            # Drop ids left behind by an append that never reached meta.json
+            f.truncate(self._ids_bytes)
+            f.write("".join(json.dumps(chunk_id) + "\n" for chunk_id in ids).encode("utf-8"))
+            ids_bytes = f.tell()
+        with open(f"{self.meta_path}.tmp", "w") as f:
+            json.dump({"count": first + len(ids), "ids_bytes": ids_bytes}, f)
+        os.replace(f"{self.meta_path}.tmp", self.meta_path)
+        self.ids.extend(ids)
+        self._ids_bytes = ids_bytes
+        self.vectors = self._vector_file[:len(self.ids)]
+        self.codes = self._code_file[:len(self.ids)]
+
+    def memory_bytes(self) -> int:
+        return int(self.codes.nbytes) if self.codes is not None else 0
+
+    def _approximate(self, queries: np.ndarray, candidates: int) -> np.ndarray:
+        # Best `candidates` rows per query by approximate score, scanning the codes in blocks
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self.codes), BLOCK_ROWS):
+            scores = self.quantizer.scores(self.codes[start:start + BLOCK_ROWS], queries).T
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            if best_scores.shape[1] > candidates:
+                keep = np.argpartition(-best_scores, candidates - 1, axis=1)[:, :candidates]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_rows
+
+    def _rerank(self, query: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        rows = np.sort(rows)
+        scores = np.asarray(self.vectors[rows]) @ query
+        top = min(k, len(rows))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(rows[i]), 1.0 - float(scores[i])) for i in best]
+
+    def search_rows(self, queries, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """(row, cosine distance) of the `k` nearest vectors per query, closest first."""
+        if not self.ids:
+            return [[] for _ in np.atleast_2d(queries)]
+        queries = _unit_rows(queries)
+        candidates = self._approximate(queries, min(len(self.ids), k * self.rerank_factor))
+        return [self._rerank(query, rows, k) for query, rows in zip(queries, candidates)]
+
+    def search(self, queries, k: int = 5) -> List[List[Tuple[str, float]]]:
+        return [[(self.ids[row], distance) for row, distance in hits] for hits in self.search_rows(queries, k)]
+
+    def exact_search_rows(self, queries, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Full float32 scan of the memory-mapped vectors, the reference for `recall_report`."""
+        queries = _unit_rows(queries)
+        scores = np.concatenate([
+            np.asarray(self.vectors[start:start + BLOCK_ROWS]) @ queries.T for start in range(0, len(self.ids), BLOCK_ROWS)
+        ])
+        return [self._rerank(query, np.argpartition(-column, min(k, len(column)) - 1)[:k], k) for query, column in zip(queries, scores.T)]
+
+    def recall_report(self, queries, k: int = 10) -> Dict[str, Any]:
+        """Recall@k of the quantized path against the exact path, with timings and memory use."""
+        started = time.perf_counter()
+        approximate = self.search_rows(queries, k)
+        approximate_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        exact = self.exact_search_rows(queries, k)
+        exact_seconds = time.perf_counter() - started
+        found = sum(len({row for row, _ in a} & {row for row, _ in e}) for a, e in zip(approximate, exact))
+        expected = sum(len(e) for e in exact)
+        report = {
+            "quantizer": self.quantizer.name,
+            "vectors": len(self.ids),
+            "queries": len(approximate),
+            "k": k,
+            "recall": round(found / expected, 4) if expected else 1.0,
+            "approximate_ms_per_query": round(approximate_seconds * 1000 / max(1, len(approximate)), 3),
+            "exact_ms_per_query": round(exact_seconds * 1000 / max(1, len(exact)), 3),
+            "resident_bytes_per_vector": round(self.memory_bytes() / max(1, len(self.ids)), 1),
+            "float32_bytes_per_vector": int(self.vectors.shape[1] * 4) if self.vectors is not None else 0,
+        }
+        logger.info(f"Quantized store recall report: {report}")
+        return report
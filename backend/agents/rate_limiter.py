@@ -0,0 +1,207 @@
+# rate_limiter.py
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+# Waiters seen more recently than this count towards the reported queue depth
+WAITER_TTL_SECONDS = 30.0
+
+
+class RateLimiter:
+    """
+    Token-bucket scheduler for model calls, with one requests-per-minute and one
+    tokens-per-minute bucket per deployment. Bucket levels live in SQLite so every
+    process on the node (API workers and ingestion workers) draws from the same quota.
+
+    Interactive calls may drain a bucket; batch calls must leave `interactive_reserve`
+    of its capacity untouched, so queries still find quota while ingestion runs at the
+    ceiling. A 429 from the service empties the deployment's buckets until its
+    Retry-After has passed. Deployments without configured limits are not throttled.
+    """
+
+    def __init__(self, path: str, limits: Dict[str, Tuple[float, float]], interactive_reserve: float = 0.2,
+                 poll_interval: float = 0.05, batch_poll_interval: float = 1.0):
+        self.path = path
+        # deployment -> (requests per minute, tokens per minute); 0 means unlimited
+        self.limits = {deployment: limit for deployment, limit in limits.items() if deployment}
+        self.interactive_reserve = interactive_reserve
+        # Longest sleep between checks for each priority; batch callers can wait longer
+        self.poll_intervals = {PRIORITY_INTERACTIVE: poll_interval, PRIORITY_BATCH: batch_poll_interval}
+        self.granted = defaultdict(int)
+        self.wait_seconds = defaultdict(float)
+        self.waiting = defaultdict(int)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "deployment TEXT NOT NULL, kind TEXT NOT NULL, level REAL NOT NULL, updated REAL NOT NULL, "
+                "blocked_until REAL NOT NULL DEFAULT 0, PRIMARY KEY (deployment, kind))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS waiters ("
+                "deployment TEXT NOT NULL, priority TEXT NOT NULL, pid INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "updated REAL NOT NULL, PRIMARY KEY (deployment, priority, pid))"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _buckets(self, deployment: str) -> Dict[str, float]:
+        requests_per_minute, tokens_per_minute = self.limits[deployment]
+        return {kind: capacity for kind, capacity in (("requests", requests_per_minute), ("tokens", tokens_per_minute)) if capacity > 0}
+
+    def _try_acquire(self, deployment: str, tokens: int, priority: str) -> float:
+        """Take quota if available; otherwise return the seconds to wait before trying again."""
+        capacities = self._buckets(deployment)
+        wanted = {"requests": 1.0, "tokens": float(tokens)}
+        reserve = self.interactive_reserve if priority == PRIORITY_BATCH else 0.0
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = {
+                    kind: (level, updated, blocked_until)
+                    for kind, level, updated, blocked_until in conn.execute(
+                        "SELECT kind, level, updated, blocked_until FROM buckets WHERE deployment = ?", (deployment,)
+                    )
+                }
+                levels, wait = {}, 0.0
+                for kind, capacity in capacities.items():
+                    level, updated, blocked_until = rows.get(kind, (capacity, now, 0.0))
+                    if blocked_until > now:
+                        wait = max(wait, blocked_until - now)
+                    rate = capacity / 60.0
+                    levels[kind] = min(capacity, level + (now - updated) * rate)
+                    # A call that cannot fit beside the reserve (or at all) goes once the bucket is full
+                    needed = min(wanted[kind] + reserve * capacity, capacity)
+                    if levels[kind] < needed:
+                        wait = max(wait, (needed - levels[kind]) / rate)
+                if wait == 0.0:
+                    for kind in levels:
+                        levels[kind] -= wanted[kind]
+                conn.executemany(
+                    "INSERT INTO buckets (deployment, kind, level, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (deployment, kind) DO UPDATE SET level = excluded.level, updated = excluded.updated",
+                    [(deployment, kind, level, now) for kind, level in levels.items()]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def _set_waiting(self, deployment: str, priority: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO waiters (deployment, priority, pid, count, updated) VALUES (?, ?, ?, ?, ?)",
+                (deployment, priority, os.getpid(), self.waiting[(deployment, priority)], time.time())
+            )
+
+    async def acquire(self, deployment: str, tokens: int = 0, priority: str = PRIORITY_INTERACTIVE):
+        """Wait until `deployment` has quota for one request of `tokens` tokens."""
+        if deployment not in self.limits or not self._buckets(deployment):
+            return
+        started = time.monotonic()
+        key = (deployment, priority)
+        queued = False
+        try:
+            while True:
+                wait = await asyncio.to_thread(self._try_acquire, deployment, tokens, priority)
+                if wait == 0.0:
+                    break
+                if not queued:
+                    queued = True
+                    self.waiting[key] += 1
+                await asyncio.to_thread(self._set_waiting, deployment, priority)
+                # Poll rather than sleep the whole wait: quota may come back sooner (a block
+                # lifted, interactive demand dropping), and other callers may take it first
+                await asyncio.sleep(min(wait, self.poll_intervals[priority]))
+        finally:
+            if queued:
+                self.waiting[key] -= 1
+                await asyncio.to_thread(self._set_waiting, deployment, priority)
+        self.granted[key] += 1
+        self.wait_seconds[key] += time.monotonic() - started
+
+    def _block(self, deployment: str, seconds: float):
+        until = time.time() + seconds
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE buckets SET level = 0, updated = ?, blocked_until = MAX(blocked_until, ?) WHERE deployment = ?",
+                (time.time(), until, deployment)
+            )
+
+    async def throttled(self, deployment: str, retry_after: Optional[float] = None):
+        """Report a 429: the deployment's buckets are emptied and blocked for `retry_after` seconds."""
+        if deployment in self.limits:
+            await asyncio.to_thread(self._block, deployment, retry_after or 1.0)
+
+    def _metrics(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._connect() as conn:
+            buckets = conn.execute("SELECT deployment, kind, level, updated, blocked_until FROM buckets").fetchall()
+            waiters = conn.execute(
+                "SELECT deployment, priority, SUM(count) FROM waiters WHERE updated > ? GROUP BY deployment, priority",
+                (now - WAITER_TTL_SECONDS,)
+            ).fetchall()
+        metrics = {}
+        for deployment in self.limits:
+            capacities = self._buckets(deployment)
+            metrics[deployment] = {
+                "limits": {"requests_per_minute": self.limits[deployment][0], "tokens_per_minute": self.limits[deployment][1]},
+                "available": {},
+                "blocked_for": 0.0,
+                "queue_depth": {priority: 0 for priority in PRIORITIES},
+                "granted": {priority: self.granted[(deployment, priority)] for priority in PRIORITIES},
+                "wait_seconds": {priority: round(self.wait_seconds[(deployment, priority)], 3) for priority in PRIORITIES},
+            }
+        for deployment, kind, level, updated, blocked_until in buckets:
+            if deployment in metrics and kind in self._buckets(deployment):
+                capacity = self._buckets(deployment)[kind]
+                metrics[deployment]["available"][kind] = round(min(capacity, level + (now - updated) * capacity / 60.0), 1)
+                metrics[deployment]["blocked_for"] = round(max(metrics[deployment]["blocked_for"], blocked_until - now, 0.0), 3)
+        for deployment, priority, count in waiters:
+            if deployment in metrics:
+                metrics[deployment]["queue_depth"][priority] = count
+        return metrics
+
+    async def metrics(self) -> Dict[str, Any]:
+        """Per deployment: limits, available quota, node-wide queue depth per priority, and this process's counters."""
+        return await asyncio.to_thread(self._metrics)
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """The process-wide limiter configured from Config, shared by all model clients."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            Config.RATE_LIMIT_DB_PATH,
+            {
+                Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT: (Config.EMBEDDING_RPM, Config.EMBEDDING_TPM),
+                Config.LLM_DEPLOYMENT: (Config.LLM_RPM, Config.LLM_TPM),
+            },
+            interactive_reserve=Config.RATE_LIMIT_INTERACTIVE_RESERVE
+        )
+    return _rate_limiter
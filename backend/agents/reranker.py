@@ -0,0 +1,97 @@
+# reranker.py
+import logging
+import math
+import re
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .local_language_service import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class Reranker:
+    """
+    Local re-ranking of an over-fetched candidate set. Every candidate is scored in one
+    vectorized pass as a weighted sum of three signals:
+
+    - cosine similarity between the query embedding and the candidate's `contentVector`
+    - BM25 of the query terms over the candidates' `content`, with document frequencies
+      taken from the candidate set and scaled to [0, 1] by the best candidate
+    - freshness, exp(-ln 2 * age / half-life) from `published_date` (0 when missing)
+
+    The best `k` are returned closest first with the combined score in `rerank_score`.
+    """
+
+    def __init__(self, cosine_weight: float = 0.6, bm25_weight: float = 0.3, freshness_weight: float = 0.1,
+                 half_life_days: float = 365.0, k1: float = 1.2, b: float = 0.75):
+        self.weights = np.array([cosine_weight, bm25_weight, freshness_weight], dtype=np.float32)
+        self.half_life_days = half_life_days
+        self.k1 = k1
+        self.b = b
+
+    def _cosine(self, embedding: Sequence[float], candidates: List[Dict[str, Any]]) -> np.ndarray:
+        query = np.asarray(embedding, dtype=np.float32)
+        vectors = [candidate.get("contentVector") for candidate in candidates]
+        present = np.array([vector is not None and len(vector) == len(query) for vector in vectors])
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        if present.any():
+            matrix = np.asarray([vector for vector, ok in zip(vectors, present) if ok], dtype=np.float32)
+            scale = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            scores[present] = np.divide(matrix @ query, scale, out=np.zeros(len(matrix), dtype=np.float32), where=scale > 0)
+        return scores
+
+    def _bm25(self, query: str, candidates: List[Dict[str, Any]]) -> np.ndarray:
+        terms = list(dict.fromkeys(t for t in TOKEN_PATTERN.findall(query.lower()) if t not in STOPWORDS))
+        if not terms:
+            return np.zeros(len(candidates), dtype=np.float32)
+        counts = [Counter(TOKEN_PATTERN.findall((candidate.get("content") or "").lower())) for candidate in candidates]
+        tf = np.array([[count[term] for term in terms] for count in counts], dtype=np.float32)
+        lengths = np.array([sum(count.values()) for count in counts], dtype=np.float32)
+        df = (tf > 0).sum(axis=0)
+        idf = np.log1p((len(candidates) - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(float(lengths.mean()), 1.0))
+        scores = (idf * tf * (self.k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+        best = scores.max()
+        return scores / best if best > 0 else scores
+
+    def _freshness(self, candidates: List[Dict[str, Any]], now: datetime) -> np.ndarray:
+        ages = np.array([
+            (now - parsed).total_seconds() / 86400 if (parsed := _parse_date(candidate.get("published_date"))) else np.nan
+            for candidate in candidates
+        ], dtype=np.float32)
+        fresh = np.exp(-math.log(2) * np.maximum(ages, 0) / self.half_life_days)
+        return np.nan_to_num(fresh, nan=0.0)
+
+    def rerank(self, query: str, embedding: Sequence[float], candidates: List[Dict[str, Any]], k: int = 5,
+               now: datetime = None) -> List[Dict[str, Any]]:
+        if not candidates:
+            return []
+        signals = np.stack([
+            self._cosine(embedding, candidates),
+            self._bm25(query, candidates),
+            self._freshness(candidates, now or datetime.now(timezone.utc)),
+        ], axis=1)
+        scores = signals @ self.weights
+        top = min(k, len(candidates))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [{**candidates[i], "rerank_score": float(scores[i])} for i in best]
@@ -1,26 +1,71 @@
 # search_agent.py
 
+import hashlib
 import tracemalloc
 from azure.search.documents.aio import SearchClient
 from azure.search.documents.models import VectorizedQuery
 from azure.core.credentials import AzureKeyCredential
 from config.config import Config
 import logging
-from typing import List, Dict, Any
+import numpy as np
+from typing import List, Dict, Any, Optional
 import json
 import asyncio
 import aiohttp
 import sys
 import ssl
+import time
+from collections import defaultdict
+from cachetools import LRUCache
+from .cache import AsyncCache, make_key
+from .fusion import RRF_K, RetrievalStrategy, parse_strategies, reciprocal_rank_fusion
+from .index_version import get_index_version
+from .tiered_cache import get_shared_store
 
 logger = logging.getLogger(__name__)
 
+
+def _vector_digest(embedding: Optional[List[float]]) -> Optional[str]:
+    if embedding is None:
+        return None
+    return hashlib.sha256(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+# Fields of a lazy (first-phase) search: enough to rank and select chunks, not to read them
+LIGHT_FIELDS = ["id", "parent_id", "chunk_number", "published_date"]
+# Fields `hydrate` fetches for the chunks that are actually used
+BODY_FIELDS = ["filename", "title", "content", "author", "key_phrases", "summary"]
+# Ids per hydration lookup, to keep the search.in filter short
+HYDRATE_BATCH_SIZE = 100
+
+
+def _select(fields: List[str], with_vectors: bool, lazy: bool = False) -> List[str]:
+    fields = LIGHT_FIELDS if lazy else fields
+    # contentVector is only fetched for local re-ranking; it dominates the payload
+    return fields + ["contentVector"] if with_vectors else fields
+
+
 class SearchAgent:
-    def __init__(self, session: aiohttp.ClientSession = None, ssl_context: ssl.SSLContext = None):
+    def __init__(self, session: aiohttp.ClientSession = None, ssl_context: ssl.SSLContext = None, results_cache: AsyncCache = None):
         self.config = Config()
         self.client = None
         self.session = session or aiohttp.ClientSession()
         self.ssl_context = ssl_context or ssl.create_default_context()
+        if results_cache is None and self.config.RETRIEVAL_CACHE_ENABLED:
+            results_cache = AsyncCache(
+                "search.results",
+                maxsize=self.config.RETRIEVAL_CACHE_MAX_ENTRIES,
+                ttl=self.config.RETRIEVAL_CACHE_TTL,
+                store=get_shared_store()
+            )
+        # Results of identical searches against the same index version; None disables caching
+        self.results_cache = results_cache
+        self.fusion_strategies = parse_strategies(self.config.FUSION_STRATEGIES)
+        # Per fused-search strategy: calls, failures and total milliseconds
+        self.strategy_stats = defaultdict(lambda: {"calls": 0, "failures": 0, "total_ms": 0.0})
+        # Chunk bodies by id for lazy hydration
+        self.body_cache = LRUCache(self.config.HYDRATION_CACHE_ITEMS)
+        self.hydration_stats = {"hits": 0, "misses": 0}
 
     async def initialize(self):
         try:
@@ -44,18 +89,41 @@ class SearchAgent:
         except Exception as e:
             logger.error(f"Error during SearchAgent cleanup: {str(e)}")
 
-    async def vector_search(self, query: str, top: int = 5):
-        embedding = await self.generate_embedding(query)
+    async def _cached(self, search_type: str, query: Optional[str], embedding: Optional[List[float]], top: int,
+                      filter: Optional[str], order_by: Optional[str], with_vectors: bool, lazy: bool, search) -> List[Dict[str, Any]]:
+        """
+        Serve `search()` from the results cache. The key includes the index version, which
+        every index change advances, so results from before a change are never served.
+        """
+        if self.results_cache is None:
+            return await search()
+        index_version = await get_index_version().current()
+        key = make_key(search_type, query, _vector_digest(embedding), top, filter, order_by, with_vectors, lazy, index_version)
+        return await self.results_cache.get_or_compute(key, search)
+
+    async def vector_search(self, embedding: List[float], top: int = 5, filter: str = None, order_by: str = None,
+                            with_vectors: bool = False, lazy: bool = False) -> List[Dict[str, Any]]:
+        return await self._cached("vector", None, embedding, top, filter, order_by, with_vectors, lazy,
+                                  lambda: self._vector_search(embedding, top, filter, order_by, with_vectors, lazy))
+
+    async def _vector_search(self, embedding: List[float], top: int, filter: str, order_by: str, with_vectors: bool, lazy: bool) -> List[Dict[str, Any]]:
         vector_query = VectorizedQuery(vector=embedding, k_nearest_neighbors=top, fields="contentVector")
         results = await self.client.search(
             search_text=None,
             vector_queries=[vector_query],
-            select=["id", "filename", "content", "key_phrases", "chunk_number", "title", "published_date", "author", "summary", "parent_id"],
+            filter=filter,
+            order_by=order_by,
+            select=_select(["id", "filename", "content", "key_phrases", "chunk_number", "title", "published_date", "author", "summary", "parent_id"], with_vectors, lazy),
             top=top
         )
-        return [await self._process_result(result) async for result in results]
+        return [await self._process_result(result, lazy) async for result in results]
 
-    async def hybrid_search(self, query: str, embedding: List[float], top: int = 5, filter: str = None, order_by: str = None) -> List[Dict[str, Any]]:
+    async def hybrid_search(self, query: str, embedding: List[float], top: int = 5, filter: str = None, order_by: str = None,
+                            with_vectors: bool = False, lazy: bool = False) -> List[Dict[str, Any]]:
+        return await self._cached("hybrid", query, embedding, top, filter, order_by, with_vectors, lazy,
+                                  lambda: self._hybrid_search(query, embedding, top, filter, order_by, with_vectors, lazy))
+
+    async def _hybrid_search(self, query: str, embedding: List[float], top: int, filter: str, order_by: str, with_vectors: bool, lazy: bool) -> List[Dict[str, Any]]:
         try:
             logger.info(f"Starting hybrid search with query: '{query}', embedding length: {len(embedding)}, top: {top}, filter: {filter}, order_by: {order_by}")
             vector_query = VectorizedQuery(vector=embedding, k_nearest_neighbors=top, fields="contentVector")
@@ -64,19 +132,102 @@ class SearchAgent:
                 vector_queries=[vector_query],
                 filter=filter,
                 order_by=order_by,
-                select=["id", "parent_id", "title", "content", "published_date", "author", "key_phrases", "summary", "chunk_number", "filename"],
+                select=_select(["id", "parent_id", "title", "content", "published_date", "author", "key_phrases", "summary", "chunk_number", "filename"], with_vectors, lazy),
                 top=top
             )
-            processed_results = [await self._process_result(result) async for result in results]
+            processed_results = [await self._process_result(result, lazy) async for result in results]
             logger.info(f"Hybrid search completed. Found {len(processed_results)} results.")
             return processed_results
         except Exception as e:
             logger.error(f"Error in hybrid search: {str(e)}", exc_info=True)
             raise
 
-    async def _process_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+    async def keyword_search(self, query: str, top: int = 5, filter: str = None, order_by: str = None,
+                             with_vectors: bool = False, lazy: bool = False) -> List[Dict[str, Any]]:
+        return await self._cached("keyword", query, None, top, filter, order_by, with_vectors, lazy,
+                                  lambda: self._keyword_search(query, top, filter, order_by, with_vectors, lazy))
+
+    async def _keyword_search(self, query: str, top: int, filter: str, order_by: str, with_vectors: bool, lazy: bool) -> List[Dict[str, Any]]:
+        results = await self.client.search(
+            search_text=query,
+            filter=filter,
+            order_by=order_by,
+            select=_select(["id", "parent_id", "title", "content", "published_date", "author", "key_phrases", "summary", "chunk_number", "filename"], with_vectors, lazy),
+            top=top
+        )
+        return [await self._process_result(result, lazy) async for result in results]
+
+    async def _run_strategy(self, strategy: RetrievalStrategy, query: str, embedding: List[float], top: int, filter: Optional[str],
+                            with_vectors: bool, lazy: bool):
+        filters = [f"({clause})" for clause in (filter, strategy.filter) if clause]
+        combined = " and ".join(filters) or None
+        if strategy.kind == "vector":
+            return await self.vector_search(embedding, top, combined, with_vectors=with_vectors, lazy=lazy)
+        if strategy.kind == "keyword":
+            return await self.keyword_search(query, top, combined, with_vectors=with_vectors, lazy=lazy)
+        return await self.hybrid_search(query, embedding, top, combined, with_vectors=with_vectors, lazy=lazy)
+
+    async def fused_search(self, query: str, embedding: List[float], top: int = 5, filter: str = None,
+                           strategies: List[RetrievalStrategy] = None, fetch: int = None, with_vectors: bool = False, lazy: bool = False):
+        """
+        Run every strategy concurrently, each fetching `fetch` candidates, and merge them
+        with weighted reciprocal-rank fusion. A failed strategy is logged and left out
+        unless all of them fail. Returns the top `top` fused results and the milliseconds
+        each strategy took.
+        """
+        strategies = strategies or self.fusion_strategies
+        fetch = max(top, fetch or self.config.FUSION_FETCH)
+        timings = {}
+
+        async def timed(strategy):
+            started = time.perf_counter()
+            try:
+                return await self._run_strategy(strategy, query, embedding, fetch, filter, with_vectors, lazy)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                timings[strategy.name] = round(elapsed, 1)
+                self.strategy_stats[strategy.name]["calls"] += 1
+                self.strategy_stats[strategy.name]["total_ms"] += elapsed
+
+        outcomes = await asyncio.gather(*(timed(strategy) for strategy in strategies), return_exceptions=True)
+        ranked = {}
+        for strategy, outcome in zip(strategies, outcomes):
+            if isinstance(outcome, Exception):
+                self.strategy_stats[strategy.name]["failures"] += 1
+                logger.error(f"Retrieval strategy {strategy.name} failed: {str(outcome)}")
+            else:
+                ranked[strategy.name] = outcome
+        if not ranked:
+            raise outcomes[0]
+        results = reciprocal_rank_fusion(ranked, {strategy.name: strategy.weight for strategy in strategies}, RRF_K, top)
+        logger.info(f"Fused search over {', '.join(ranked)} returned {len(results)} results; timings (ms): {timings}")
+        return results, timings
+
+    def retrieval_metrics(self) -> Dict[str, Any]:
+        return {
+            "strategies": {
+                name: {**stats, "mean_ms": round(stats["total_ms"] / stats["calls"], 1) if stats["calls"] else 0.0}
+                for name, stats in self.strategy_stats.items()
+            },
+            "hydration": {**self.hydration_stats, "cached_bodies": len(self.body_cache)},
+        }
+
+    async def _process_result(self, result: Dict[str, Any], lazy: bool = False) -> Dict[str, Any]:
+        if lazy:
+            processed_result = {
+                "id": result["id"],
+                "parent_id": result.get("parent_id", ""),
+                "chunk_number": result.get("chunk_number", 0),
+                "published_date": result.get("published_date", ""),
+                "score": result["@search.score"],
+                "captions": result.get("@search.captions", []),
+            }
+            if result.get("contentVector") is not None:
+                processed_result["contentVector"] = result["contentVector"]
+            return processed_result
         processed_result = {
             "id": result["id"],
+            "parent_id": result.get("parent_id", ""),
             "filename": result["filename"],
             "title": result.get("title", ""),
             "content": result["content"],
@@ -88,8 +239,61 @@ class SearchAgent:
             "score": result["@search.score"],
             "captions": result.get("@search.captions", []),
         }
+        if result.get("contentVector") is not None:
+            processed_result["contentVector"] = result["contentVector"]
         return processed_result
 
+    async def _fetch_bodies(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        # Ids are sanitized filenames plus a content hash, so they never contain quotes or
+        # the ',' delimiter
+        id_list = ",".join(ids)
+        results = await self.client.search(
+            search_text="*",
+            filter=f"search.in(id, '{id_list}', ',')",
+            select=["id"] + BODY_FIELDS,
+            top=len(ids)
+        )
+        return {
+            result["id"]: {
+                "filename": result.get("filename", ""),
+                "title": result.get("title", ""),
+                "content": result.get("content", ""),
+                "author": result.get("author", ""),
+                "key_phrases": result.get("key_phrases", []),
+                "summary": result.get("summary", ""),
+            }
+            async for result in results
+        }
+
+    async def hydrate(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Second phase of a lazy search: fill in the body fields of `results` that lack
+        them. Bodies come from a local LRU, or else from one batched id lookup. Chunk ids
+        are content hashes, so a cached body never goes stale; only chunk_number can
+        change, and that comes from the first phase. Results whose chunk has been
+        deleted since are dropped.
+        """
+        missing = list(dict.fromkeys(
+            result["id"] for result in results if "content" not in result and result["id"] not in self.body_cache
+        ))
+        self.hydration_stats["hits"] += sum(1 for result in results if "content" not in result) - len(missing)
+        self.hydration_stats["misses"] += len(missing)
+        if missing:
+            batches = await asyncio.gather(*(
+                self._fetch_bodies(missing[i:i + HYDRATE_BATCH_SIZE]) for i in range(0, len(missing), HYDRATE_BATCH_SIZE)
+            ))
+            for bodies in batches:
+                self.body_cache.update(bodies)
+        hydrated = []
+        for result in results:
+            if "content" in result:
+                hydrated.append(result)
+            elif result["id"] in self.body_cache:
+                hydrated.append({**result, **self.body_cache[result["id"]]})
+            else:
+                logger.warning(f"Chunk {result['id']} was deleted before it could be hydrated")
+        return hydrated
+
     async def get_document_count(self) -> int:
         try:
             logger.debug(f"Search client: {self.client}")
@@ -126,6 +330,8 @@ class SearchAgent:
         except Exception as e:
             logger.error(f"Error deleting selected documents from the index: {str(e)}")
             return False
+        finally:
+            await get_index_version().bump()
 
     async def cleanup(self):
         try:
@@ -0,0 +1,97 @@
+# semantic_cache.py
+import hashlib
+import logging
+import time
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def history_digest(messages: Sequence[Any]) -> str:
+    """Digest of chat messages (their types and contents); empty for no history."""
+    if not messages:
+        return ""
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(f"{message.type}\0{message.content}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Cache of answered queries matched by meaning rather than text. Each entry keeps the
+    unit-normalized query embedding with its search results and LLM response; a lookup
+    scores the new query against every live entry in one matrix product and returns the
+    best one at or above `threshold` cosine similarity. Entries are tied to the search
+    type, the conversation `context` (a digest of the chat history the query was asked
+    after, so follow-ups only match within the same history) and the index version they
+    were answered against; older versions are dropped on the next lookup, so answers
+    never outlive an index change.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl: float = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.vectors: Optional[np.ndarray] = None
+        self.entries: List[Tuple[str, str, int, float, Any, Any]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _keep(self, mask: np.ndarray):
+        self.vectors = self.vectors[mask] if mask.any() else None
+        self.entries = [entry for entry, keep in zip(self.entries, mask) if keep]
+
+    def lookup(self, embedding: Sequence[float], search_type: str, index_version: int, context: str = "") -> Optional[Tuple[Any, Any]]:
+        """(search_results, llm_response) of the closest cached query, or None."""
+        if self.entries:
+            now = time.time()
+            live = np.array([version == index_version and now - created < self.ttl for _, _, version, created, _, _ in self.entries])
+            if not live.all():
+                self._keep(live)
+        if self.entries:
+            similarities = self.vectors @ self._unit(embedding)
+            similarities[[entry[0] != search_type or entry[1] != context for entry in self.entries]] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                self.hits += 1
+                _, _, _, _, search_results, llm_response = self.entries[best]
+                logger.info(f"Semantic cache hit (similarity {similarities[best]:.4f})")
+                return search_results, llm_response
+        self.misses += 1
+        return None
+
+    def store(self, embedding: Sequence[float], search_type: str, index_version: int, search_results: Any, llm_response: Any,
+              context: str = ""):
+        vector = self._unit(embedding)[None, :]
+        if self.vectors is not None and len(self.entries) >= self.max_entries:
+            # Oldest first: drop the front to make room
+            drop = len(self.entries) - self.max_entries + 1
+            self.vectors = self.vectors[drop:]
+            self.entries = self.entries[drop:]
+        self.vectors = vector if self.vectors is None or not self.entries else np.vstack([self.vectors, vector])
+        self.entries.append((search_type, context, index_version, time.time(), search_results, llm_response))
+
+    def clear(self):
+        self.vectors = None
+        self.entries = []
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
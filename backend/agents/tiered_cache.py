@@ -0,0 +1,228 @@
+# tiered_cache.py
+import asyncio
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import numpy as np
+
+from config.config import Config
+
+try:
+    import msgpack
+    msgpack_available = True
+except ImportError:
+    msgpack_available = False
+
+logger = logging.getLogger(__name__)
+
+# First byte of every stored value names its encoding, so processes can read each other's entries
+FORMAT_NUMPY = b"n"
+FORMAT_MSGPACK = b"m"
+FORMAT_JSON = b"j"
+# msgpack extension type carrying an array nested inside another value
+NDARRAY_EXT = 1
+
+# Returned by `SharedCacheStore.get` when there is no entry, since None is a valid value
+MISSING = object()
+
+
+def _npy_bytes(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return msgpack.ExtType(NDARRAY_EXT, _npy_bytes(value))
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    if code == NDARRAY_EXT:
+        return np.load(io.BytesIO(data), allow_pickle=False)
+    return msgpack.ExtType(code, data)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return str(value)
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    Serialize a cache value: arrays as NumPy buffers, anything else with msgpack (arrays
+    nested inside it as extension types), or JSON when msgpack is not installed.
+    """
+    if isinstance(value, np.ndarray):
+        return FORMAT_NUMPY + _npy_bytes(value)
+    if msgpack_available:
+        return FORMAT_MSGPACK + msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+    return FORMAT_JSON + json.dumps(value, default=_json_default).encode("utf-8")
+
+
+def decode_value(blob: bytes) -> Any:
+    kind, payload = blob[:1], blob[1:]
+    if kind == FORMAT_NUMPY:
+        return np.load(io.BytesIO(payload), allow_pickle=False)
+    if kind == FORMAT_MSGPACK:
+        if not msgpack_available:
+            raise ValueError("Cached value is msgpack-encoded but msgpack is not installed")
+        return msgpack.unpackb(payload, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False)
+    if kind == FORMAT_JSON:
+        return json.loads(payload.decode("utf-8"))
+    raise ValueError(f"Unknown cached value format: {kind!r}")
+
+
+class SharedCacheStore:
+    """
+    Second cache tier shared by every process on the node: serialized values in SQLite
+    (WAL, memory-mapped reads) keyed by namespace and key, with an optional expiry. The
+    least recently used entries are evicted once the stored values exceed `max_bytes`.
+    Pass it as the `store` of an `AsyncCache` to put it behind the in-process LRU; the
+    embedding and enrichment caches are built on it too, each under its own namespaces.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, evict_every: int = 1000, mmap_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.mmap_bytes = mmap_bytes
+        self._writes_since_evict = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL, last_used REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, bytes]:
+        now = time.time()
+        found = {}
+        with self._connect() as conn:
+            # Stay under SQLite's bound parameter limit
+            for i in range(0, len(keys), 500):
+                batch = list(keys[i:i + 500])
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, value, expires_at FROM entries WHERE namespace = ? AND key IN ({placeholders})",
+                    [namespace] + batch
+                ).fetchall()
+                # Expired entries are left for the next eviction pass
+                live = [(key, value) for key, value, expires_at in rows if expires_at is None or expires_at > now]
+                found.update(live)
+                conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE namespace = ? AND key = ?",
+                    [(now, namespace, key) for key, _ in live]
+                )
+        return found
+
+    def _put_many(self, namespace: str, blobs: Dict[str, bytes], ttl: Optional[float]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                [(namespace, key, blob, len(blob), now + ttl if ttl else None, now) for key, blob in blobs.items()]
+            )
+        self._writes_since_evict += len(blobs)
+        if self._writes_since_evict >= self.evict_every:
+            self._writes_since_evict = 0
+            self._evict()
+
+    def _evict(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Evict down to 90% of the budget so eviction does not run on every write
+            excess = total - int(self.max_bytes * 0.9)
+            removed = 0
+            stale = []
+            for rowid, size in conn.execute("SELECT rowid, size FROM entries ORDER BY last_used"):
+                if removed >= excess:
+                    break
+                stale.append((rowid,))
+                removed += size
+            conn.executemany("DELETE FROM entries WHERE rowid = ?", stale)
+        logger.info(f"Evicted {len(stale)} shared cache entries ({removed} bytes)")
+
+    def _delete(self, namespace: str, key: Optional[str] = None):
+        with self._connect() as conn:
+            if key is None:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _delete_prefix(self, prefix: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE substr(namespace, 1, ?) = ?", (len(prefix), prefix))
+
+    def _load_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, Any]:
+        return {key: decode_value(blob) for key, blob in self._get_many(namespace, keys).items()}
+
+    async def get(self, namespace: str, key: str) -> Any:
+        """The stored value, or MISSING if there is none (or it has expired)."""
+        found = await asyncio.to_thread(self._load_many, namespace, [key])
+        return found.get(key, MISSING)
+
+    async def get_many(self, namespace: str, keys: Sequence[str]) -> Dict[str, Any]:
+        """The stored values of those `keys` that have one, by key."""
+        return await asyncio.to_thread(self._load_many, namespace, list(keys)) if keys else {}
+
+    async def put(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        await self.put_many(namespace, {key: value}, ttl)
+
+    async def put_many(self, namespace: str, values: Dict[str, Any], ttl: Optional[float] = None):
+        if values:
+            blobs = {key: encode_value(value) for key, value in values.items()}
+            await asyncio.to_thread(self._put_many, namespace, blobs, ttl)
+
+    async def delete(self, namespace: str, key: Optional[str] = None):
+        """Delete one entry, or the whole namespace when `key` is None."""
+        await asyncio.to_thread(self._delete, namespace, key)
+
+    async def delete_prefix(self, prefix: str):
+        """Delete every namespace starting with `prefix`."""
+        await asyncio.to_thread(self._delete_prefix, prefix)
+
+    def _stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace").fetchall()
+        return {namespace: {"entries": count, "bytes": size} for namespace, count, size in rows}
+
+    async def stats(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._stats)
+
+
+_shared_store = None
+
+
+def get_shared_store() -> Optional[SharedCacheStore]:
+    """The node-wide store configured from Config, or None when the shared tier is disabled."""
+    global _shared_store
+    if _shared_store is None and Config.CACHE_SHARED_ENABLED:
+        _shared_store = SharedCacheStore(Config.CACHE_SHARED_PATH, max_bytes=Config.CACHE_SHARED_MAX_BYTES)
+    return _shared_store
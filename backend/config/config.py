@@ -32,14 +32,134 @@ class Config:
     AZURE_OPENAI_EMBEDDING_MODEL: ClassVar[str] = os.getenv("AZURE_OPENAI_EMBEDDING_MODEL")
     AZURE_OPENAI_EMBEDDING_DIMENSIONS: ClassVar[int] = 1536
 
+    # Ingestion embedding stage
+    EMBEDDING_BATCH_SIZE: ClassVar[int] = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+    EMBEDDING_BATCH_MAX_TOKENS: ClassVar[int] = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "64000"))
+    EMBEDDING_CONCURRENCY: ClassVar[int] = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+    # Embedding API requests: per-request limits, requests in flight per agent, retries on 429/5xx
+    EMBEDDING_MAX_INPUTS: ClassVar[int] = int(os.getenv("EMBEDDING_MAX_INPUTS", "2048"))
+    EMBEDDING_MAX_REQUEST_TOKENS: ClassVar[int] = int(os.getenv("EMBEDDING_MAX_REQUEST_TOKENS", "64000"))
+    EMBEDDING_MAX_CONCURRENT_REQUESTS: ClassVar[int] = int(os.getenv("EMBEDDING_MAX_CONCURRENT_REQUESTS", "8"))
+    EMBEDDING_MAX_RETRIES: ClassVar[int] = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+
+    # Shared model quota per deployment (0 = unlimited). Batch work leaves the interactive
+    # reserve fraction of each bucket for queries
+    EMBEDDING_RPM: ClassVar[int] = int(os.getenv("EMBEDDING_RPM", "0"))
+    EMBEDDING_TPM: ClassVar[int] = int(os.getenv("EMBEDDING_TPM", "0"))
+    LLM_DEPLOYMENT: ClassVar[str] = os.getenv("LLM_DEPLOYMENT", "llama3")
+    LLM_RPM: ClassVar[int] = int(os.getenv("LLM_RPM", "0"))
+    LLM_TPM: ClassVar[int] = int(os.getenv("LLM_TPM", "0"))
+    RATE_LIMIT_INTERACTIVE_RESERVE: ClassVar[float] = float(os.getenv("RATE_LIMIT_INTERACTIVE_RESERVE", "0.2"))
+    RATE_LIMIT_DB_PATH: ClassVar[str] = os.getenv("RATE_LIMIT_DB_PATH", str(backend_dir / 'data' / 'rate_limits.db'))
+
+    # Query embeddings: concurrent single-text requests within the window share one API call
+    EMBEDDING_COALESCE_WINDOW_MS: ClassVar[float] = float(os.getenv("EMBEDDING_COALESCE_WINDOW_MS", "3"))
+    EMBEDDING_COALESCE_MAX_BATCH: ClassVar[int] = int(os.getenv("EMBEDDING_COALESCE_MAX_BATCH", "64"))
+    EMBEDDING_CACHE_ENABLED: ClassVar[bool] = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH: ClassVar[str] = os.getenv("EMBEDDING_CACHE_PATH", str(backend_dir / 'data' / 'embedding_cache.db'))
+    EMBEDDING_CACHE_MAX_BYTES: ClassVar[int] = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    EMBEDDING_CACHE_MEMORY_ITEMS: ClassVar[int] = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "4096"))
+
+    # Two-tier caching: in-process LRU in front of a SQLite store shared by the node's workers
+    CACHE_SHARED_ENABLED: ClassVar[bool] = os.getenv("CACHE_SHARED_ENABLED", "true").lower() == "true"
+    CACHE_SHARED_PATH: ClassVar[str] = os.getenv("CACHE_SHARED_PATH", str(backend_dir / 'data' / 'shared_cache.db'))
+    CACHE_SHARED_MAX_BYTES: ClassVar[int] = int(os.getenv("CACHE_SHARED_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    # Search index version shared by the node, advanced on every index change
+    INDEX_VERSION_PATH: ClassVar[str] = os.getenv("INDEX_VERSION_PATH", str(backend_dir / 'data' / 'index_version.db'))
+
+    # Retrieval results cache, keyed by query, search parameters and the index version
+    RETRIEVAL_CACHE_ENABLED: ClassVar[bool] = os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true"
+    RETRIEVAL_CACHE_MAX_ENTRIES: ClassVar[int] = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+    RETRIEVAL_CACHE_TTL: ClassVar[float] = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+
+    # Fused retrieval ("Fused" search type): strategies run concurrently and are merged by
+    # reciprocal-rank fusion; each fetches FUSION_FETCH candidates
+    FUSION_STRATEGIES: ClassVar[str] = os.getenv("FUSION_STRATEGIES", "vector:1.0,keyword:1.0,hybrid:1.0")
+    FUSION_FETCH: ClassVar[int] = int(os.getenv("FUSION_FETCH", "20"))
+
+    # Local re-ranking of RERANK_FETCH over-fetched candidates by cosine, BM25 and freshness
+    RERANK_ENABLED: ClassVar[bool] = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_FETCH: ClassVar[int] = int(os.getenv("RERANK_FETCH", "50"))
+    RERANK_COSINE_WEIGHT: ClassVar[float] = float(os.getenv("RERANK_COSINE_WEIGHT", "0.6"))
+    RERANK_BM25_WEIGHT: ClassVar[float] = float(os.getenv("RERANK_BM25_WEIGHT", "0.3"))
+    RERANK_FRESHNESS_WEIGHT: ClassVar[float] = float(os.getenv("RERANK_FRESHNESS_WEIGHT", "0.1"))
+    RERANK_HALF_LIFE_DAYS: ClassVar[float] = float(os.getenv("RERANK_HALF_LIFE_DAYS", "365"))
+
+    # Prompt context diversity: MMR over MMR_FETCH candidates (lambda 1 = relevance only), and
+    # optionally dropping chunks within MMR_NEIGHBOR_WINDOW of a better one from the same document
+    MMR_ENABLED: ClassVar[bool] = os.getenv("MMR_ENABLED", "false").lower() == "true"
+    MMR_LAMBDA: ClassVar[float] = float(os.getenv("MMR_LAMBDA", "0.7"))
+    MMR_FETCH: ClassVar[int] = int(os.getenv("MMR_FETCH", "20"))
+    MMR_COLLAPSE_NEIGHBORS: ClassVar[bool] = os.getenv("MMR_COLLAPSE_NEIGHBORS", "true").lower() == "true"
+    MMR_NEIGHBOR_WINDOW: ClassVar[int] = int(os.getenv("MMR_NEIGHBOR_WINDOW", "1"))
+
+    # Lazy hydration: searches return ids and scores only, and bodies are fetched for the chunks
+    # that reach the prompt, through a local LRU of HYDRATION_CACHE_ITEMS chunk bodies
+    LAZY_HYDRATION_ENABLED: ClassVar[bool] = os.getenv("LAZY_HYDRATION_ENABLED", "false").lower() == "true"
+    HYDRATION_CACHE_ITEMS: ClassVar[int] = int(os.getenv("HYDRATION_CACHE_ITEMS", "1024"))
+
+    # Semantic answer cache for /query: paraphrases at or above the cosine threshold reuse an answer
+    SEMANTIC_CACHE_ENABLED: ClassVar[bool] = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD: ClassVar[float] = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    SEMANTIC_CACHE_MAX_ENTRIES: ClassVar[int] = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    SEMANTIC_CACHE_TTL: ClassVar[float] = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+    # In-process approximate vector index kept next to Azure AI Search ("Local" search type)
+    LOCAL_INDEX_ENABLED: ClassVar[bool] = os.getenv("LOCAL_INDEX_ENABLED", "false").lower() == "true"
+    LOCAL_INDEX_DIR: ClassVar[str] = os.getenv("LOCAL_INDEX_DIR", str(backend_dir / 'data' / 'local_index'))
+    LOCAL_INDEX_NLIST: ClassVar[int] = int(os.getenv("LOCAL_INDEX_NLIST", "1024"))
+    LOCAL_INDEX_NPROBE: ClassVar[int] = int(os.getenv("LOCAL_INDEX_NPROBE", "16"))
+    # How often the API process checks whether the index needs (re)training
+    LOCAL_INDEX_TRAIN_INTERVAL: ClassVar[float] = float(os.getenv("LOCAL_INDEX_TRAIN_INTERVAL", "60"))
+
     # Azure Blob Storage
     AZURE_STORAGE_CONNECTION_STRING = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
     AZURE_STORAGE_CONTAINER_NAME = os.getenv('AZURE_STORAGE_CONTAINER_NAME')
     AZURE_STORAGE_API_KEY = os.getenv('AZURE_STORAGE_API_KEY')
 
+    # Streaming ingestion
+    INGESTION_BLOCK_SIZE: ClassVar[int] = int(os.getenv("INGESTION_BLOCK_SIZE", str(4 * 1024 * 1024)))
+    INGESTION_SPOOL_DIR: ClassVar[str] = os.getenv("INGESTION_SPOOL_DIR") or None
+    INGESTION_FRONT_MATTER_MAX_BYTES: ClassVar[int] = int(os.getenv("INGESTION_FRONT_MATTER_MAX_BYTES", str(64 * 1024)))
+    INGESTION_READ_SIZE: ClassVar[int] = int(os.getenv("INGESTION_READ_SIZE", str(64 * 1024)))
+    PARSING_WORKERS: ClassVar[int] = int(os.getenv("PARSING_WORKERS", str(os.cpu_count() or 1)))
+
+    # Chunking
+    INGESTION_CHUNK_SIZE: ClassVar[int] = int(os.getenv("INGESTION_CHUNK_SIZE", "512"))
+    INGESTION_CHUNK_OVERLAP: ClassVar[int] = int(os.getenv("INGESTION_CHUNK_OVERLAP", "64"))
+    INDEX_BATCH_SIZE: ClassVar[int] = int(os.getenv("INDEX_BATCH_SIZE", "100"))
+    INGESTION_MANIFEST_PATH: ClassVar[str] = os.getenv("INGESTION_MANIFEST_PATH", str(backend_dir / 'data' / 'ingestion_manifest.db'))
+
+    # Chunk enrichment during ingestion
+    INGESTION_ENABLE_ENRICHMENT: ClassVar[bool] = os.getenv("INGESTION_ENABLE_ENRICHMENT", "false").lower() == "true"
+    INGESTION_ENRICH_BATCH_SIZE: ClassVar[int] = int(os.getenv("INGESTION_ENRICH_BATCH_SIZE", "25"))
+    # Enrichment backend used unless a job picks one: "azure" (Language service) or "local" (offline)
+    ENRICHMENT_BACKEND: ClassVar[str] = os.getenv("ENRICHMENT_BACKEND", "azure")
+    ENRICHMENT_CONCURRENCY: ClassVar[int] = int(os.getenv("ENRICHMENT_CONCURRENCY", "8"))
+    ENRICHMENT_CACHE_ENABLED: ClassVar[bool] = os.getenv("ENRICHMENT_CACHE_ENABLED", "true").lower() == "true"
+    ENRICHMENT_CACHE_PATH: ClassVar[str] = os.getenv("ENRICHMENT_CACHE_PATH", str(backend_dir / 'data' / 'enrichment_cache.db'))
+    ENRICHMENT_CACHE_MAX_BYTES: ClassVar[int] = int(os.getenv("ENRICHMENT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    # Bulk ingestion pipeline
+    BULK_QUEUE_SIZE: ClassVar[int] = int(os.getenv("BULK_QUEUE_SIZE", "8"))
+    BULK_UPLOAD_WORKERS: ClassVar[int] = int(os.getenv("BULK_UPLOAD_WORKERS", "4"))
+    BULK_PARSE_WORKERS: ClassVar[int] = int(os.getenv("BULK_PARSE_WORKERS", str(os.cpu_count() or 1)))
+    BULK_ENRICH_WORKERS: ClassVar[int] = int(os.getenv("BULK_ENRICH_WORKERS", "2"))
+    BULK_INDEX_WORKERS: ClassVar[int] = int(os.getenv("BULK_INDEX_WORKERS", "2"))
+
+    # Asynchronous ingestion jobs (0 workers keeps /upload synchronous). The worker count is
+    # per node: only the first process to open the job database starts workers
+    INGESTION_WORKERS: ClassVar[int] = int(os.getenv("INGESTION_WORKERS", str(os.cpu_count() or 1)))
+    INGESTION_JOB_DB_PATH: ClassVar[str] = os.getenv("INGESTION_JOB_DB_PATH", str(backend_dir / 'data' / 'ingestion_jobs.db'))
+    INGESTION_STAGING_DIR: ClassVar[str] = os.getenv("INGESTION_STAGING_DIR", str(backend_dir / 'data' / 'staging'))
+    INGESTION_JOB_STALE_SECONDS: ClassVar[float] = float(os.getenv("INGESTION_JOB_STALE_SECONDS", "300"))
+
     # Azure Language Service for Text Analytics 
     AZURE_LANGUAGE_SERVICE_NAME: ClassVar[str] = os.getenv("AZURE_LANGUAGE_SERVICE_NAME")
     AZURE_LANGUAGE_SERVICE_ENDPOINT: ClassVar[str] = os.getenv("AZURE_LANGUAGE_SERVICE_ENDPOINT")
+    AZURE_LANGUAGE_API_VERSION: ClassVar[str] = os.getenv("AZURE_LANGUAGE_API_VERSION", "2023-04-01")
     
     @property
     def AZURE_LANGUAGE_SERVICE_API_KEY(self) -> str:
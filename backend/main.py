@@ -7,7 +7,12 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from agents.agent_manager import AgentManager
+from agents.document_enhancer import ENRICHMENT_BACKENDS
+from agents.cache import cache_stats
+from agents.rate_limiter import get_rate_limiter
+from agents.langchain_integration import SearchTypeUnavailableError
 from middleware.telemetry import TelemetryMiddleware
+from typing import List, Optional
 import uvicorn
 import sys
 import os
@@ -18,6 +23,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Accepted values of the `enrichment` query parameter on uploads
+ENRICHMENT_CHOICES = ("none",) + tuple(ENRICHMENT_BACKENDS)
+
 from config.config import Config
 
 agent_manager = AgentManager()
@@ -56,23 +64,62 @@ try:
 
     logger.info("FastAPI application configured")
 
+    def enrichment_options(enrichment: Optional[str]) -> dict:
+        if enrichment is None:
+            return {}
+        if enrichment not in ENRICHMENT_CHOICES:
+            raise HTTPException(status_code=400, detail=f"enrichment must be one of {', '.join(ENRICHMENT_CHOICES)}")
+        return {"enrichment": enrichment}
+
     @app.post("/upload")
-    async def upload_file(file: UploadFile = File(...)):
+    async def upload_file(file: UploadFile = File(...), enrichment: Optional[str] = None):
         logger.info(f"Received upload request for file: {file.filename}")
+        options = enrichment_options(enrichment)
         try:
-            content = await file.read()
-            result = await agent_manager.ingestion_agent.upload_document(file.filename, content)
+            if agent_manager.ingestion_jobs:
+                job_id = await agent_manager.ingestion_jobs.submit_upload(file.filename, file, options)
+                logger.info(f"File {file.filename} queued for ingestion as job {job_id}")
+                return {"success": True, "status": "queued", "message": "File queued for ingestion", "job_id": job_id}
+            result = await agent_manager.ingestion_agent.upload_document_stream(file.filename, file, **options)
             if result:
                 logger.info(f"File {file.filename} uploaded and indexed successfully")
-                return {"success": True, "message": "File uploaded and indexed successfully"}
+                return {"success": True, "status": "indexed", "message": "File uploaded and indexed successfully"}
             else:
                 logger.error(f"Failed to upload or index file {file.filename}")
-                return {"success": False, "message": "Failed to upload or index file"}
+                return {"success": False, "status": "failed", "message": "Failed to upload or index file"}
         except Exception as e:
             logger.error(f"Error uploading file {file.filename}: {str(e)}")
             logger.exception("Full traceback:")
             raise HTTPException(status_code=500, detail=str(e))
 
+    @app.get("/jobs/{job_id}")
+    async def get_job(job_id: str):
+        if not agent_manager.ingestion_jobs:
+            raise HTTPException(status_code=404, detail="Ingestion jobs are disabled")
+        try:
+            job = await agent_manager.ingestion_jobs.get_job(job_id)
+        except Exception as e:
+            logger.error(f"Error reading job {job_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return job
+
+    @app.post("/upload_batch")
+    async def upload_batch(files: List[UploadFile] = File(...), enrichment: Optional[str] = None):
+        logger.info(f"Received bulk upload request for {len(files)} files")
+        options = enrichment_options(enrichment)
+        try:
+            report = await agent_manager.ingestion_agent.upload_documents_batch(
+                [(file.filename, file) for file in files], **options
+            )
+            logger.info(f"Bulk upload finished: {len(report['succeeded'])} succeeded, {len(report['failed'])} failed")
+            return {"success": not report["failed"], "report": report}
+        except Exception as e:
+            logger.error(f"Error in bulk upload: {str(e)}")
+            logger.exception("Full traceback:")
+            raise HTTPException(status_code=500, detail=str(e))
+
     @app.post("/index")
     async def index_documents():
         logger.info("Received request to index documents")
@@ -86,7 +133,7 @@ try:
 
     class QueryRequest(BaseModel):
         query: str = Field(..., min_length=1, max_length=1000)
-        search_type: str = Field(..., pattern="^(Vector|Hybrid)$")
+        search_type: str = Field(..., pattern="^(Vector|Hybrid|Local|Fused)$")
 
     @app.post("/query")
     async def query_llm(request: QueryRequest):
@@ -95,10 +142,32 @@ try:
             search_results, llm_response = await agent_manager.langchain_agent.process_query(request.query, request.search_type)
             logger.info("Query processed successfully")
             return {"search_results": search_results, "llm_response": llm_response}
+        except SearchTypeUnavailableError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
+    @app.get("/search_types")
+    async def search_types():
+        return {"search_types": agent_manager.langchain_agent.available_search_types()}
+
+    @app.get("/metrics/rate_limits")
+    async def rate_limit_metrics():
+        try:
+            return await get_rate_limiter().metrics()
+        except Exception as e:
+            logger.error(f"Error reading rate limit metrics: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @app.get("/metrics/retrieval")
+    async def retrieval_metrics():
+        return agent_manager.search_agent.retrieval_metrics()
+
+    @app.get("/metrics/caches")
+    async def cache_metrics():
+        return cache_stats()
+
     @app.get("/document_count")
     async def get_document_count():
         try:
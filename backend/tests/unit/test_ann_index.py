@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from agents.ann_index import IVFIndex
+from agents.langchain_integration import LangchainAgent, SearchTypeUnavailableError
+from agents.embedding_matrix import EmbeddingMatrix, nearest
+
+def clustered_vectors(count, dimensions=16, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    return (centers[rng.integers(0, clusters, count)] + 0.3 * rng.normal(size=(count, dimensions))).astype(np.float32)
+
+@pytest.mark.asyncio
+async def test_exact_search_before_training_with_replace_and_delete(tmp_path):
+    index = IVFIndex(str(tmp_path), 3, nlist=4)
+    await index.add(["a", "b", "c"], [[1, 0, 0], [0, 1, 0], [0, 0, 1]], [{"id": "a", "parent_id": "p"}, {"id": "b", "parent_id": "q"}, {"id": "c", "parent_id": "p"}])
+
+    assert [chunk_id for chunk_id, _ in (await index.search([[1, 0.1, 0]], k=2))[0]] == ["a", "b"]
+
+    await index.add(["a"], [[0, 0.9, 0.1]])
+    assert (await index.search([[0, 1, 0]], k=1))[0][0][0] in {"a", "b"}
+    await index.delete(parent_ids=["p"])
+    await index.delete(ids=["b"])
+
+    assert len(index) == 1
+    assert [chunk_id for chunk_id, _ in (await index.search([[1, 0, 0]], k=5))[0]] == ["a"]
+
+@pytest.mark.asyncio
+async def test_trained_index_finds_exact_neighbours_and_is_shared(tmp_path):
+    vectors = clustered_vectors(2000)
+    index = IVFIndex(str(tmp_path), 16, nlist=16, nprobe=4, train_factor=4)
+    for start in range(0, 2000, 500):
+        ids = [f"c{i}" for i in range(start, start + 500)]
+        await index.add(ids, vectors[start:start + 500], [{"id": chunk_id, "content": chunk_id} for chunk_id in ids])
+    # Adding only appends; training is a separate step
+    assert index.centroids is None
+    assert await index.maybe_train() and index.centroids is not None
+    assert not await index.maybe_train()
+
+    queries = vectors[:50] + 0.05
+    exact = nearest(EmbeddingMatrix(vectors).distances(queries), 5)
+    # A second handle, as another worker process would open it, sees the same data
+    results = await IVFIndex(str(tmp_path), 16, nlist=16, nprobe=4).search(queries, k=5)
+
+    recall = np.mean([len({f"c{i}" for i in row} & {chunk_id for chunk_id, _ in hits}) / 5 for row, hits in zip(exact, results)])
+    assert recall >= 0.9
+    await index.update_documents([{"id": "c7", "chunk_number": 3}])
+    assert await index.get_documents(["c7"]) == {"c7": {"id": "c7", "content": "c7", "chunk_number": 3}}
+
+@pytest.mark.asyncio
+async def test_search_rereads_a_snapshot_renumbered_by_another_process(tmp_path):
+    vectors = clustered_vectors(400)
+    reader = IVFIndex(str(tmp_path), 16, nlist=4, train_factor=4, refresh_interval=3600)
+    await reader.add([f"c{i}" for i in range(400)], vectors)
+    await reader.delete(ids=[f"c{i}" for i in range(0, 400, 2)])
+    # Another process retrains, renumbering the rows, before the reader refreshes
+    await IVFIndex(str(tmp_path), 16, nlist=4, train_factor=4).train()
+
+    hits = (await reader.search(vectors[1:2], k=1))[0]
+
+    assert hits[0][0] == "c1" and hits[0][1] < 1e-5
+
+@pytest.mark.asyncio
+async def test_local_search_is_only_offered_with_a_local_index(tmp_path):
+    embedding_agent = MagicMock(generate_embedding=AsyncMock())
+    disabled = LangchainAgent(MagicMock(), embedding_agent, MagicMock(), local_index=None)
+    enabled = LangchainAgent(MagicMock(), embedding_agent, MagicMock(), local_index=IVFIndex(str(tmp_path), 16))
+
+    assert "Local" not in disabled.available_search_types()
+    assert "Local" in enabled.available_search_types()
+    with pytest.raises(SearchTypeUnavailableError):
+        await disabled.process_query("question", "Local")
+    embedding_agent.generate_embedding.assert_not_awaited()
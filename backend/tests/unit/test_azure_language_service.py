@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from agents.azure_language_service import AzureLanguageService
+from agents.document_enhancer import DocumentEnhancer
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _request(self, name, batch):
+        self.calls.append((name, len(batch)))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if any(text == "fail" for text in batch):
+            raise RuntimeError("service error")
+
+    async def extract_key_phrases(self, batch):
+        await self._request("key_phrases", batch)
+        return [SimpleNamespace(is_error=text == "", key_phrases=[text.upper()]) for text in batch]
+
+    async def detect_language(self, batch):
+        await self._request("language", batch)
+        return [SimpleNamespace(is_error=False, primary_language=SimpleNamespace(name="English")) for _ in batch]
+
+@pytest.fixture
+def service():
+    service = AzureLanguageService(concurrency=2)
+    service.client = FakeClient()
+    return service
+
+@pytest.mark.asyncio
+async def test_requests_respect_batch_limit_and_concurrency(service):
+    texts = [f"t{i}" for i in range(35)]
+
+    phrases = await service.extract_key_phrases_batch(texts)
+
+    assert phrases == [[text.upper()] for text in texts]
+    assert [size for _, size in service.client.calls] == [10, 10, 10, 5]
+    assert service.client.max_in_flight == 2
+
+@pytest.mark.asyncio
+async def test_failed_batches_and_documents_get_defaults(service):
+    texts = ["ok"] * 10 + ["fail"] + ["", "fine"]
+
+    phrases = await service.extract_key_phrases_batch(texts)
+
+    assert phrases[:10] == [["OK"]] * 10
+    assert phrases[10:] == [[], [], []]
+
+@pytest.mark.asyncio
+async def test_enhancer_batches_chunks_across_operations(service, monkeypatch):
+    monkeypatch.setattr("config.config.Config.ENRICHMENT_CACHE_ENABLED", False)
+    enhancer = DocumentEnhancer()
+    enhancer.language_service = service
+
+    async def summaries(texts):
+        return [f"summary of {text}" for text in texts]
+    service.generate_summaries = summaries
+
+    chunks = await enhancer.process_chunks([{"id": "a", "content": "x"}, {"id": "b", "content": "y"}])
+
+    assert [chunk["summary"] for chunk in chunks] == ["summary of x", "summary of y"]
+    assert [chunk["key_phrases"] for chunk in chunks] == [["X"], ["Y"]]
+    assert service.client.calls == [("key_phrases", 2)]
@@ -0,0 +1,94 @@
+import io
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from agents.bulk_ingestion import BulkIngestionPipeline, collect_sources
+from agents.embedding_stage import EmbeddingStage
+
+@pytest.fixture
+def agent():
+    agent = MagicMock()
+    agent.config.INGESTION_ENRICH_BATCH_SIZE = 2
+    agent.config.INDEX_BATCH_SIZE = 3
+    agent.sanitize_filename.side_effect = lambda name: name.replace('.', '_')
+
+    async def upload_blob(filename, source):
+        if filename == "broken.md":
+            raise IOError("blob unavailable")
+        return source.read().decode(), False
+
+    async def parse_document(filename, path):
+        parent_id = filename.replace('.', '_')
+        parsed = MagicMock()
+        parsed.parent = {"id": parent_id, "filename": filename}
+        parsed.__enter__.return_value = parsed
+        parsed.iter_chunks.return_value = [
+            {"id": f"{parent_id}={word}", "parent_id": parent_id, "chunk_number": i, "content": word}
+            for i, word in enumerate(path.split())
+        ]
+        return parsed
+
+    async def plan_reindex(parent):
+        return {"unchanged_md": None, "b_md": {"b_md=six": 3}}.get(parent["id"], {})
+
+    def select_changed(chunks, known_chunks, chunk_numbers):
+        for chunk in chunks:
+            chunk_numbers[chunk["id"]] = chunk["chunk_number"]
+            if chunk["id"] not in known_chunks:
+                yield chunk
+
+    async def iter_changed_batches(parsed, known_chunks, chunk_numbers, batch_size):
+        changed = list(select_changed(parsed.iter_chunks(), known_chunks, chunk_numbers))
+        for i in range(0, len(changed), batch_size):
+            yield changed[i:i + batch_size]
+
+    async def enrich_chunks(chunks, enrichment=None):
+        return chunks
+
+    embedding_agent = AsyncMock()
+    embedding_agent.generate_embeddings.side_effect = lambda texts, priority=None: [[0.1] for _ in texts]
+    agent.upload_blob.side_effect = upload_blob
+    agent.parse_document.side_effect = parse_document
+    agent.iter_chunks.side_effect = lambda parsed: parsed.iter_chunks()
+    agent.plan_reindex.side_effect = plan_reindex
+    agent.iter_changed_batches = iter_changed_batches
+    agent.enrich_chunks.side_effect = enrich_chunks
+    agent.embedding_stage = EmbeddingStage(embedding_agent, batch_size=2, concurrency=2)
+    agent.index_batch = AsyncMock()
+    agent.finalize_document = AsyncMock()
+    return agent
+
+@pytest.mark.asyncio
+async def test_pipeline_indexes_all_chunks_and_reports_failures(agent):
+    sources = [
+        ("a.md", io.BytesIO(b"one two three four five")),
+        ("b.md", io.BytesIO(b"six seven")),
+        ("unchanged.md", io.BytesIO(b"same as before")),
+        ("broken.md", io.BytesIO(b"ignored")),
+        ("a_md", io.BytesIO(b"same id as a.md")),
+    ]
+
+    report = await BulkIngestionPipeline(agent, queue_size=2, upload_workers=2).run(sources)
+
+    indexed = [chunk for call in agent.index_batch.await_args_list for chunk in call.args[0]]
+    assert sorted(chunk["id"] for chunk in indexed) == ["a_md=five", "a_md=four", "a_md=one", "a_md=three", "a_md=two", "b_md=seven"]
+    assert all(chunk["contentVector"] == [0.1] for chunk in indexed)
+    assert sorted(report["succeeded"]) == ["a.md", "b.md", "unchanged.md"]
+    assert report["unchanged"] == ["unchanged.md"]
+    assert list(report["failed"]) == ["broken.md"]
+    assert report["duplicates"] == [{"filename": "a_md", "document_id": "a_md", "duplicate_of": "a.md"}]
+    assert report["stages"]["index"]["items"] == 6
+    finalized = {call.args[0]["id"]: call.args[2] for call in agent.finalize_document.await_args_list}
+    assert finalized["b_md"] == {"b_md=six": 0, "b_md=seven": 1}
+    assert len(finalized["a_md"]) == 5
+    assert "unchanged_md" not in finalized
+
+def test_collect_sources_from_directory_and_manifest(tmp_path):
+    (tmp_path / "docs" / "nested").mkdir(parents=True)
+    (tmp_path / "docs" / "a.md").write_text("a")
+    (tmp_path / "docs" / "nested" / "b.md").write_text("b")
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps(["docs/a.md", {"name": "renamed.md", "path": "docs/nested/b.md"}]))
+
+    assert [name for name, _ in collect_sources(str(tmp_path / "docs"))] == ["a.md", "nested/b.md"]
+    assert [name for name, _ in collect_sources(str(manifest))] == ["a.md", "renamed.md"]
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from agents.cache import AsyncCache, async_cache, cache_stats, invalidate_namespace
+
+class Service:
+    def __init__(self):
+        self.calls = []
+
+    @async_cache(namespace="test.lookup", maxsize=2, policy="lru")
+    async def lookup(self, query, top=5):
+        self.calls.append(query)
+        await asyncio.sleep(0.01)
+        if query == "fail":
+            raise RuntimeError("upstream error")
+        return f"{query}:{top}"
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    Service.lookup.cache_clear()
+
+@pytest.mark.asyncio
+async def test_keys_ignore_the_instance_and_concurrent_misses_share_one_call():
+    first, second = Service(), Service()
+
+    results = await asyncio.gather(*(service.lookup("q") for service in (first, second) * 5))
+
+    assert results == ["q:5"] * 10
+    assert first.calls + second.calls == ["q"]
+    stats = Service.lookup.cache_stats()
+    assert stats["misses"] == 1 and stats["coalesced"] == 9
+    assert await second.lookup(query="q", top=5) == "q:5" and Service.lookup.cache_stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_invalidation_are_counted():
+    service = Service()
+    for query in ("a", "b", "a", "c"):
+        await service.lookup(query)
+
+    assert Service.lookup.cache_stats()["evictions"] == 1
+    assert Service.lookup.invalidate(service, "a")
+    await service.lookup("a")
+    assert service.calls == ["a", "b", "c", "a"]
+    assert cache_stats()["test.lookup"]["invalidations"] >= 1
+    assert invalidate_namespace("test.lookup") and len(Service.lookup.cache) == 0
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter_and_are_not_cached():
+    service = Service()
+
+    results = await asyncio.gather(service.lookup("fail"), service.lookup("fail"), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        await service.lookup("fail")
+    assert service.calls == ["fail", "fail"]
+
+@pytest.mark.asyncio
+async def test_bare_decorator_gets_its_own_namespace():
+    @async_cache
+    async def square(x):
+        return x * x
+
+    assert await square(3) == 9 and await square(x=3) == 9
+    assert cache_stats()[f"{__name__}.test_bare_decorator_gets_its_own_namespace.<locals>.square"]["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_ttl_entries_expire():
+    now = 0
+    cache = AsyncCache("test.ttl", ttl=300, timer=lambda: now)
+
+    async def compute():
+        return now
+
+    assert [await cache.get_or_compute("key", compute), await cache.get_or_compute("key", compute)] == [0, 0]
+    now = 301
+    assert await cache.get_or_compute("key", compute) == 301
+    assert cache.stats()["expirations"] == 1
+
+@pytest.mark.asyncio
+async def test_values_computed_before_an_invalidation_are_not_stored():
+    cache = AsyncCache("test.generation", policy="lru")
+
+    async def compute():
+        cache.clear()
+        return "stale"
+
+    assert await cache.get_or_compute("key", compute) == "stale"
+    assert "key" not in cache
+
+@pytest.mark.asyncio
+async def test_cancelling_the_first_caller_leaves_the_others_waiting():
+    service = Service()
+    leader = asyncio.create_task(service.lookup("slow"))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(service.lookup("slow")) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    assert await asyncio.gather(*followers) == ["slow:5"] * 3
+    assert leader.cancelled()
+    assert service.calls == ["slow"]
+    assert await service.lookup("slow") == "slow:5" and service.calls == ["slow"]
+
+@pytest.mark.asyncio
+async def test_arguments_without_a_stable_repr_must_be_ignored_or_keyed():
+    class Client:
+        pass
+
+    @async_cache(namespace="test.unkeyable")
+    async def fetch(client, query):
+        return query
+
+    with pytest.raises(TypeError):
+        await fetch(Client(), "q")
+
+    @async_cache(namespace="test.ignored", ignore=("client",))
+    async def fetch_ignoring(client, query):
+        return id(client)
+
+    first, second = Client(), Client()
+    assert await fetch_ignoring(first, "q") == await fetch_ignoring(second, "q") == id(first)
@@ -0,0 +1,66 @@
+import pytest
+from agents.chunking import TextChunker, TokenCounter, build_chunk_document, iter_chunk_documents
+
+class WordCounter(TokenCounter):
+    def count(self, text):
+        return len(text.split()) if text.strip() else 0
+
+@pytest.fixture
+def chunker():
+    return TextChunker(chunk_size=10, chunk_overlap=3, token_counter=WordCounter())
+
+def test_chunks_respect_size_and_overlap(chunker):
+    words = [f"w{i}" for i in range(35)]
+    chunks = list(chunker.iter_chunks([" ".join(words)]))
+
+    assert all(len(chunk.split()) <= 10 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.split()[-3:] == current.split()[:3]
+    assert chunks[-1].split()[-1] == "w34"
+
+def test_chunking_is_independent_of_piece_boundaries(chunker):
+    text = " ".join(f"word{i}" for i in range(50))
+    whole = list(chunker.iter_chunks([text]))
+    streamed = list(chunker.iter_chunks(text[i:i + 7] for i in range(0, len(text), 7)))
+    assert streamed == whole
+
+def test_invalid_overlap():
+    with pytest.raises(ValueError):
+        TextChunker(chunk_size=10, chunk_overlap=10)
+
+def test_chunk_documents_follow_search_schema(chunker):
+    parent = {"id": "report_md", "filename": "report.md", "title": "Report", "content": "ignored"}
+    documents = list(iter_chunk_documents(parent, ["one two three"], chunker))
+
+    assert documents == [build_chunk_document(parent, 0, "one two three")]
+    assert documents[0]["id"].startswith("report_md=")
+    assert documents[0]["parent_id"] == "report_md"
+    assert documents[0]["chunk_number"] == 0
+    assert documents[0]["title"] == "Report"
+
+def test_chunk_id_ignores_position_and_document_hash(chunker):
+    parent = {"id": "doc", "filename": "doc.md", "document_hash": "v1"}
+    first = build_chunk_document(parent, 0, "same text")
+    moved = build_chunk_document(dict(parent, document_hash="v2"), 5, "same text")
+    changed = build_chunk_document(parent, 0, "other text")
+
+    assert first["id"] == moved["id"]
+    assert first["id"] != changed["id"]
+    assert "document_hash" not in first
+
+def test_inserting_text_keeps_ids_of_later_chunks(chunker):
+    parent = {"id": "doc", "filename": "doc.md"}
+    paragraphs = [" ".join(f"p{p}w{i}" for i in range(6)) for p in range(12)]
+    before = [chunk["id"] for chunk in iter_chunk_documents(parent, ["\n\n".join(paragraphs)], chunker)]
+    edited = paragraphs[:2] + ["an inserted paragraph"] + paragraphs[2:]
+    after = [chunk["id"] for chunk in iter_chunk_documents(parent, ["\n\n".join(edited)], chunker)]
+
+    assert len(before) > 4
+    assert len(set(before) - set(after)) <= 2
+
+def test_repeated_chunks_get_distinct_ids():
+    chunker = TextChunker(chunk_size=2, chunk_overlap=0, token_counter=WordCounter())
+    parent = {"id": "doc", "filename": "doc.md"}
+    ids = [chunk["id"] for chunk in iter_chunk_documents(parent, ["a b a b a b"], chunker)]
+
+    assert len(ids) == len(set(ids)) == 3
@@ -0,0 +1,48 @@
+import pytest
+from agents.diversity import DiversitySelector, collapse_neighbors, mmr
+from agents.langchain_integration import LangchainAgent
+
+def test_mmr_skips_near_duplicates_unless_lambda_is_one():
+    vectors = [[1.0, 0.0], [0.995, 0.0998], [0.0, 1.0]]
+
+    assert mmr([0.8, 0.6], vectors, k=2, lambda_=0.5) == [1, 2]
+    assert mmr([0.8, 0.6], vectors, k=2, lambda_=1.0) == [1, 0]
+    assert mmr([0.8, 0.6], vectors, k=5) == [1, 2, 0]
+    assert mmr([1.0, 0.1], [], k=2) == []
+
+def test_neighbouring_chunks_of_a_document_collapse_into_the_best():
+    results = [
+        {"id": "a3", "parent_id": "a", "chunk_number": 3},
+        {"id": "a4", "parent_id": "a", "chunk_number": 4},
+        {"id": "b4", "parent_id": "b", "chunk_number": 4},
+        {"id": "a6", "parent_id": "a", "chunk_number": 6},
+        {"id": "a2", "parent_id": "a", "chunk_number": 2},
+    ]
+
+    assert [r["id"] for r in collapse_neighbors(results)] == ["a3", "b4", "a6"]
+    assert [r["id"] for r in collapse_neighbors(results, window=0)] == ["a3", "a4", "b4", "a6", "a2"]
+
+def test_candidates_without_vectors_keep_their_order():
+    candidates = [{"id": "x", "parent_id": "p", "chunk_number": 0}, {"id": "y", "parent_id": "p", "chunk_number": 1}]
+
+    assert DiversitySelector(collapse=False).select([1.0], candidates, k=5) == candidates
+
+class FakeSearchAgent:
+    def __init__(self):
+        self.calls = []
+
+    async def vector_search(self, embedding, top=5, filter=None, order_by=None, with_vectors=False, lazy=False):
+        self.calls.append((top, with_vectors))
+        duplicates = [{"id": f"dup{i}", "parent_id": "a", "chunk_number": 10 * i, "contentVector": [1.0, 0.0]} for i in range(top - 1)]
+        return duplicates + [{"id": "other", "parent_id": "b", "chunk_number": 0, "contentVector": [0.6, 0.8]}]
+
+@pytest.mark.asyncio
+async def test_retrieval_replaces_redundant_chunks():
+    search_agent = FakeSearchAgent()
+    agent = LangchainAgent(search_agent, None, None, diversity=DiversitySelector(lambda_=0.5))
+    agent.diversity_fetch = 10
+
+    results = await agent.retrieve("q", [0.9, 0.1], "Vector", top=2)
+
+    assert search_agent.calls == [(10, True)]
+    assert [r["id"] for r in results] == ["dup0", "other"]
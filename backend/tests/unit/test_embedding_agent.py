@@ -0,0 +1,152 @@
+import asyncio
+import httpx
+import openai
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from agents.embedding_agent import EmbeddingAgent
+from agents.embedding_cache import EmbeddingCache
+from agents.tiered_cache import encode_value
+from agents.enrichment_cache import text_key
+
+@pytest.fixture(autouse=True)
+def no_default_cache(monkeypatch):
+    monkeypatch.setattr("config.config.Config.EMBEDDING_CACHE_ENABLED", False)
+
+def fake_agent(**kwargs):
+    agent = EmbeddingAgent(**kwargs)
+    agent.calls = []
+
+    async def generate_embeddings(texts):
+        agent.calls.append(list(texts))
+        await asyncio.sleep(0)
+        if "fail" in texts:
+            raise RuntimeError("service error")
+        return [[float(len(text))] for text in texts]
+    agent.generate_embeddings = generate_embeddings
+    return agent
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_call():
+    agent = fake_agent(coalesce_window_ms=5, coalesce_max_batch=100)
+
+    vectors = await asyncio.gather(*(agent.generate_embedding("x" * n) for n in (1, 2, 3, 2)))
+
+    assert vectors == [[1.0], [2.0], [3.0], [2.0]]
+    assert agent.calls == [["x", "xx", "xxx"]]
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_without_waiting_for_the_window():
+    agent = fake_agent(coalesce_window_ms=10_000, coalesce_max_batch=2)
+
+    vectors = await asyncio.wait_for(asyncio.gather(agent.generate_embedding("a"), agent.generate_embedding("bb")), 1)
+
+    assert vectors == [[1.0], [2.0]]
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_in_the_batch():
+    agent = fake_agent(coalesce_window_ms=5, coalesce_max_batch=100)
+
+    results = await asyncio.gather(agent.generate_embedding("fail"), agent.generate_embedding("ok"), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.inputs = []
+
+    async def create(self, input, model):
+        self.inputs.append(list(input))
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(text)), 0.5]) for text in input])
+
+def cached_agent(path):
+    agent = EmbeddingAgent(cache=EmbeddingCache(str(path)))
+    agent.client = SimpleNamespace(embeddings=FakeEmbeddings())
+    return agent
+
+@pytest.mark.asyncio
+async def test_cached_vectors_are_shared_and_requested_once(tmp_path):
+    agent = cached_agent(tmp_path / "embeddings.db")
+
+    assert await agent.generate_embeddings(["ab", "abc", "ab"]) == [[2.0, 0.5], [3.0, 0.5], [2.0, 0.5]]
+    # A second agent, e.g. in another worker process, reads the same file
+    other = cached_agent(tmp_path / "embeddings.db")
+    assert await other.generate_embeddings(["abc", "a\nb  c"]) == [[3.0, 0.5], [6.0, 0.5]]
+
+    assert agent.client.embeddings.inputs == [["ab", "abc"]]
+    assert other.client.embeddings.inputs == [["a b  c"]]
+    assert other.cache.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_cache_stores_float32_and_evicts_least_recently_used(tmp_path):
+    entry_bytes = len(encode_value(np.zeros(4, dtype=np.float32)))
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_bytes=int(3.5 * entry_bytes), evict_every=1, memory_items=0)
+    for name in ("a", "b", "c"):
+        await cache.put_many("deployment:model", {text_key(name): [1.0, 2.0, 3.0, 4.0]})
+    await cache.get_many("deployment:model", [text_key("a")])
+    await cache.put_many("deployment:model", {text_key("d"): [1.0, 2.0, 3.0, 4.0]})
+
+    found = await cache.get_many("deployment:model", [text_key(name) for name in "abcd"])
+
+    assert set(found) == {text_key("a"), text_key("c"), text_key("d")}
+    assert found[text_key("a")].dtype == np.float32
+    assert await cache.get_many("other:model", [text_key("a")]) == {}
+
+@pytest.mark.asyncio
+async def test_similar_chunks_are_ranked_for_a_batch_of_queries():
+    agent = EmbeddingAgent()
+
+    async def generate_embeddings(texts):
+        return [[1.0, 0.0] if text == "x" else [0.0, 1.0] for text in texts]
+    agent.generate_embeddings = generate_embeddings
+
+    results = await agent.search_similar_chunks_batch(["x", "y"], [[0.0, 2.0], [3.0, 0.1], [1.0, 1.0]], ["a", "b", "c"], n=2)
+
+    assert [[chunk for chunk, _ in result] for result in results] == [["b", "c"], ["a", "c"]]
+    assert results[1][0][1] == pytest.approx(0.0, abs=1e-6)
+
+class ThrottlingEmbeddings(FakeEmbeddings):
+    def __init__(self, max_inputs):
+        super().__init__()
+        self.max_inputs = max_inputs
+
+    async def create(self, input, model):
+        if len(input) > self.max_inputs:
+            self.inputs.append(len(input))
+            request = httpx.Request("POST", "https://example.invalid")
+            raise openai.RateLimitError("throttled", response=httpx.Response(429, headers={"retry-after-ms": "1"}, request=request), body=None)
+        return await super().create(input, model)
+
+@pytest.mark.asyncio
+async def test_large_inputs_are_split_and_returned_in_order(monkeypatch):
+    monkeypatch.setattr("config.config.Config.EMBEDDING_MAX_INPUTS", 3)
+    monkeypatch.setattr("config.config.Config.EMBEDDING_MAX_REQUEST_TOKENS", 20)
+    agent = EmbeddingAgent()
+    agent.client = SimpleNamespace(embeddings=FakeEmbeddings())
+    long_text = " ".join(f"word{i}" for i in range(30))
+    texts = ["x" * n for n in range(1, 8)] + [long_text]
+
+    assert await agent.generate_embeddings(texts) == [[float(len(text)), 0.5] for text in texts]
+    sizes = [len(batch) for batch in agent.client.embeddings.inputs]
+    assert max(sizes) <= 3 and sum(sizes) == len(texts)
+    assert [long_text] in agent.client.embeddings.inputs
+
+@pytest.mark.asyncio
+async def test_throttling_shrinks_batches_and_retries():
+    agent = EmbeddingAgent()
+    agent.client = SimpleNamespace(embeddings=ThrottlingEmbeddings(max_inputs=2))
+    texts = [f"t{i}" for i in range(10)]
+
+    assert await agent.generate_embeddings(texts) == [[float(len(text)), 0.5] for text in texts]
+    assert agent.client.embeddings.inputs[0] == 10
+    assert agent.batch_limit < agent.max_inputs
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr("config.config.Config.EMBEDDING_MAX_RETRIES", 2)
+    agent = EmbeddingAgent()
+    agent.client = SimpleNamespace(embeddings=ThrottlingEmbeddings(max_inputs=0))
+
+    with pytest.raises(openai.RateLimitError):
+        await agent.generate_embeddings(["a"])
+    assert agent.client.embeddings.inputs == [1, 1, 1]
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from scipy.spatial import distance
+from agents.embedding_matrix import EmbeddingMatrix, nearest
+
+SCIPY_METRICS = {
+    "cosine": distance.cosine,
+    "L1": distance.cityblock,
+    "L2": distance.euclidean,
+    "Linf": distance.chebyshev,
+}
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(50, 16))
+
+@pytest.mark.parametrize("metric", sorted(SCIPY_METRICS))
+def test_distances_match_scipy_for_single_and_batched_queries(vectors, metric):
+    matrix = EmbeddingMatrix(vectors.tolist())
+    queries = vectors[:3] + 0.1
+
+    single = matrix.distances(queries[0], metric)
+    batch = matrix.distances(queries, metric)
+
+    expected = np.array([[SCIPY_METRICS[metric](q, v) for v in vectors] for q in queries])
+    assert single.shape == (50,)
+    np.testing.assert_allclose(single, expected[0], rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(batch, expected, rtol=1e-4, atol=1e-4)
+
+def test_nearest_returns_closest_first_per_row():
+    distances = np.array([[0.5, 0.1, 0.9, 0.3], [0.2, 0.8, 0.0, 0.4]])
+
+    assert nearest(distances, 2).tolist() == [[1, 3], [2, 0]]
+    assert nearest(distances[0], 10).tolist() == [1, 3, 0, 2]
+
+def test_unknown_metric_is_rejected(vectors):
+    with pytest.raises(ValueError):
+        EmbeddingMatrix(vectors).distances(vectors[0], "hamming")
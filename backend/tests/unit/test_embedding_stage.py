@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from agents.chunking import TokenCounter
+from agents.embedding_stage import EmbeddingStage
+
+class WordCounter(TokenCounter):
+    def count(self, text):
+        return len(text.split())
+
+@pytest.fixture
+def embedding_agent():
+    agent = AsyncMock()
+    agent.generate_embeddings.side_effect = lambda texts, priority=None: [[float(len(text))] for text in texts]
+    return agent
+
+async def _collect(stage, chunks):
+    return [batch async for batch in stage.embed(chunks)]
+
+@pytest.mark.asyncio
+async def test_batches_respect_item_and_token_caps(embedding_agent):
+    stage = EmbeddingStage(embedding_agent, batch_size=3, max_batch_tokens=4, concurrency=2, token_counter=WordCounter())
+    chunks = [{"id": str(i), "content": "a b"} for i in range(7)]
+
+    batches = await _collect(stage, chunks)
+
+    assert sorted(len(batch) for batch in batches) == [1, 2, 2, 2]
+    assert all(chunk["contentVector"] == [3.0] for chunk in chunks)
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(embedding_agent):
+    in_flight = 0
+    peak = 0
+
+    async def generate_embeddings(texts, priority=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [[0.0] for _ in texts]
+
+    embedding_agent.generate_embeddings.side_effect = generate_embeddings
+    stage = EmbeddingStage(embedding_agent, batch_size=1, concurrency=3, token_counter=WordCounter())
+
+    batches = await _collect(stage, [{"content": "x"} for _ in range(10)])
+
+    assert len(batches) == 10
+    assert peak == 3
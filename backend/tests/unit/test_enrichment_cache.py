@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from agents.document_enhancer import DocumentEnhancer
+from agents.enrichment_cache import EnrichmentCache, text_key
+
+@pytest.fixture
+def cache(tmp_path):
+    return EnrichmentCache(str(tmp_path / "enrichment.db"), evict_every=1)
+
+@pytest.mark.asyncio
+async def test_lookup_is_keyed_by_normalized_text_namespace_and_operation(cache):
+    await cache.put_many("azure:v1", "summary", {text_key("Some  text\n"): "a summary"})
+
+    assert await cache.get_many("azure:v1", "summary", [text_key("Some text")]) == {text_key("Some text"): "a summary"}
+    assert await cache.get_many("azure:v2", "summary", [text_key("Some text")]) == {}
+    assert await cache.get_many("azure:v1", "key_phrases", [text_key("Some text")]) == {}
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 0.3333}
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EnrichmentCache(str(tmp_path / "enrichment.db"), max_bytes=30, evict_every=1)
+    await cache.put_many("ns", "summary", {"old": "x" * 10})
+    await cache.put_many("ns", "summary", {"used": "y" * 10})
+    await cache.get_many("ns", "summary", ["old"])
+    await cache.put_many("ns", "summary", {"new": "z" * 10})
+
+    assert set(await cache.get_many("ns", "summary", ["old", "used", "new"])) == {"old", "new"}
+
+@pytest.mark.asyncio
+async def test_enhancer_only_sends_uncached_distinct_texts(cache):
+    enhancer = DocumentEnhancer(cache=cache)
+    enhancer.language_service = MagicMock(cache_namespace="test:v1")
+    enhancer.language_service.generate_summaries = AsyncMock(side_effect=lambda texts: [t.upper() for t in texts])
+    enhancer.language_service.extract_key_phrases_batch = AsyncMock(side_effect=lambda texts: [[] for _ in texts])
+    chunks = [{"content": "a"}, {"content": "b"}, {"content": "a"}]
+
+    first = await enhancer.process_chunks(chunks)
+    second = await enhancer.process_chunks(chunks)
+
+    assert [chunk["summary"] for chunk in first] == [chunk["summary"] for chunk in second] == ["A", "B", "A"]
+    enhancer.language_service.generate_summaries.assert_awaited_once_with(["a", "b"])
+    # Empty results may be failures, so they are not cached
+    assert enhancer.language_service.extract_key_phrases_batch.await_count == 2
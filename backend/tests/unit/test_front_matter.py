@@ -0,0 +1,28 @@
+from agents.front_matter import FrontMatterParser
+
+def _parse(data: bytes, piece_size: int, **kwargs):
+    parser = FrontMatterParser(**kwargs)
+    body = []
+    for i in range(0, len(data), piece_size):
+        body.extend(parser.feed(data[i:i + piece_size]))
+    body.extend(parser.close())
+    return parser.metadata, "".join(body)
+
+def test_front_matter_split_across_pieces():
+    data = "---\ntitle: Test Title\nauthor: Ünïcode\n---\nBody line one\nBody line two\n".encode('utf-8')
+    for piece_size in (1, 3, 7, len(data)):
+        metadata, body = _parse(data, piece_size)
+        assert metadata == {"title": "Test Title", "author": "Ünïcode"}
+        assert body == "Body line one\nBody line two\n"
+
+def test_document_without_front_matter():
+    data = b"Just a plain document\nwith two lines\n"
+    metadata, body = _parse(data, 5)
+    assert metadata == {}
+    assert body == data.decode('utf-8')
+
+def test_front_matter_search_is_bounded():
+    data = b"x" * 100 + b"\n---\ntitle: late\n---\nrest"
+    metadata, body = _parse(data, 16, max_front_matter_bytes=32)
+    assert metadata == {}
+    assert body == data.decode('utf-8')
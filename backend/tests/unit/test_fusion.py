@@ -0,0 +1,54 @@
+import asyncio
+import pytest
+from agents.fusion import RetrievalStrategy, parse_strategies, reciprocal_rank_fusion
+from agents.cache import AsyncCache
+from agents.search_agent import SearchAgent
+
+def test_results_found_by_several_strategies_rank_first():
+    ranked = {
+        "vector": [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}],
+        "keyword": [{"id": "b", "score": 7.0}, {"id": "c", "score": 5.0}],
+    }
+
+    fused = reciprocal_rank_fusion(ranked, {"vector": 1.0, "keyword": 1.0}, k=60)
+
+    assert [result["id"] for result in fused] == ["b", "a", "c"]
+    assert fused[0]["score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[0]["ranks"] == {"vector": 2, "keyword": 1}
+    assert [result["id"] for result in reciprocal_rank_fusion(ranked, {"vector": 1.0, "keyword": 0.0}, top=1)] == ["a"]
+
+def test_strategies_are_parsed_from_config():
+    assert parse_strategies("vector:2, keyword") == [RetrievalStrategy("vector", "vector", 2.0), RetrievalStrategy("keyword", "keyword", 1.0)]
+    with pytest.raises(ValueError):
+        parse_strategies("semantic:1")
+
+class SlowSearchAgent(SearchAgent):
+    def __init__(self):
+        super().__init__(session=object(), results_cache=AsyncCache("test.fusion.results", policy="lru"))
+        self.filters = []
+
+    async def vector_search(self, embedding, top=5, filter=None, order_by=None, with_vectors=False, lazy=False):
+        await asyncio.sleep(0.05)
+        return [{"id": "a"}, {"id": "b"}]
+
+    async def keyword_search(self, query, top=5, filter=None, order_by=None, with_vectors=False, lazy=False):
+        await asyncio.sleep(0.05)
+        self.filters.append(filter)
+        return [{"id": "b"}]
+
+    async def hybrid_search(self, query, embedding, top=5, filter=None, order_by=None, with_vectors=False, lazy=False):
+        raise RuntimeError("service unavailable")
+
+@pytest.mark.asyncio
+async def test_strategies_run_concurrently_and_failures_are_left_out():
+    agent = SlowSearchAgent()
+    strategies = parse_strategies("vector,keyword,hybrid") + [RetrievalStrategy("recent", "keyword", 0.5, "published_date ge 2024-01-01")]
+
+    started = asyncio.get_running_loop().time()
+    results, timings = await agent.fused_search("q", [0.1], top=2, filter="author eq 'x'", strategies=strategies)
+
+    assert asyncio.get_running_loop().time() - started < 0.09
+    assert [result["id"] for result in results] == ["b", "a"]
+    assert set(timings) == {"vector", "keyword", "hybrid", "recent"}
+    assert sorted(agent.filters, key=len) == ["(author eq 'x')", "(author eq 'x') and (published_date ge 2024-01-01)"]
+    assert agent.retrieval_metrics()["strategies"]["hybrid"]["failures"] == 1
@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from types import SimpleNamespace
+from agents.indexing_agent import IndexingAgent, delete_all_chunks
+
+class FakeSearchClient:
+    def __init__(self, count, fail_after=None):
+        self.records = {f"chunk-{i}": {"id": f"chunk-{i}", "filename": f"doc-{i // 700}.txt"} for i in range(count)}
+        self.fail_after = fail_after
+        self.deletes = 0
+
+    async def search(self, search_text, select=None, top=50):
+        async def page():
+            for record in list(self.records.values())[:top]:
+                yield record
+        return page()
+
+    async def delete_documents(self, documents):
+        self.deletes += 1
+        outcomes = []
+        for document in documents:
+            succeeded = self.fail_after is None or self.deletes <= self.fail_after
+            if succeeded:
+                self.records.pop(document["id"])
+            outcomes.append(SimpleNamespace(key=document["id"], succeeded=succeeded))
+        return outcomes
+
+def make_agent(search_client):
+    agent = IndexingAgent.__new__(IndexingAgent)
+    agent.config = SimpleNamespace(AZURE_STORAGE_CONTAINER_NAME="docs")
+    agent.search_client = search_client
+    agent.blob_service_client = MagicMock()
+    agent.blob_service_client.get_blob_client.return_value.delete_blob = AsyncMock()
+    agent.manifest = SimpleNamespace(clear=AsyncMock())
+    agent.local_index = None
+    return agent
+
+@pytest.fixture(autouse=True)
+def index_version(mocker):
+    mocker.patch("agents.indexing_agent.get_index_version", return_value=SimpleNamespace(bump=AsyncMock()))
+
+@pytest.mark.asyncio
+async def test_delete_all_pages_through_more_than_one_search_page():
+    client = FakeSearchClient(2500)
+
+    filenames = await delete_all_chunks(client)
+
+    assert client.records == {} and client.deletes == 3
+    assert filenames == {"doc-0.txt", "doc-1.txt", "doc-2.txt", "doc-3.txt"}
+
+@pytest.mark.asyncio
+async def test_manifest_is_only_cleared_after_every_chunk_is_deleted():
+    agent = make_agent(FakeSearchClient(2500))
+    assert await agent.delete_all_documents()
+    agent.manifest.clear.assert_awaited_once()
+    assert agent.blob_service_client.get_blob_client.call_count == 4
+
+    failing = make_agent(FakeSearchClient(2500, fail_after=1))
+    assert not await failing.delete_all_documents()
+    failing.manifest.clear.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_deleted_chunks_still_visible_to_search_are_retried_then_given_up():
+    client = FakeSearchClient(10)
+    client.delete_documents = AsyncMock(return_value=[])
+
+    with pytest.raises(RuntimeError):
+        await delete_all_chunks(client, settle_delay=0, max_stale_pages=2)
+    assert client.delete_documents.await_count == 1
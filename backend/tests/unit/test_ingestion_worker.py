@@ -0,0 +1,15 @@
+import pytest
+from agents import ingestion_worker
+from agents.ingestion_worker import IngestionWorkerPool
+
+@pytest.mark.skipif(not ingestion_worker.fcntl_available, reason="needs fcntl")
+def test_only_one_pool_owns_the_workers(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    first = IngestionWorkerPool(db_path, str(tmp_path / "staging"), processes=1)
+    second = IngestionWorkerPool(db_path, str(tmp_path / "staging"), processes=1)
+
+    assert first._acquire_owner_lock()
+    assert not second._acquire_owner_lock()
+    first._release_owner_lock()
+    assert second._acquire_owner_lock()
+    second._release_owner_lock()
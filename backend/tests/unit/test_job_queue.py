@@ -0,0 +1,76 @@
+import time
+import pytest
+from agents.job_queue import JobQueue, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"), stale_after=60)
+
+def test_jobs_are_claimed_once_in_submission_order(queue):
+    first = queue.submit("a.md", "/tmp/a")
+    second = queue.submit("b.md", "/tmp/b")
+
+    assert queue.claim("w1")["id"] == first
+    assert queue.claim("w2")["id"] == second
+    assert queue.claim("w3") is None
+    assert queue.get(first)["status"] == JOB_RUNNING
+    assert queue.get(first)["worker"] == "w1"
+
+def test_progress_and_completion_are_recorded(queue, tmp_path):
+    job_id = queue.submit("a.md", str(tmp_path / "a"))
+    queue.claim("w1")
+    queue.update_progress(job_id, "index", {"indexed_chunks": 3}, {"upload": 0.5, "index": 1.25})
+    queue.complete(job_id, {"details": {"indexed_chunks": 3}})
+
+    job = queue.get(job_id)
+    assert job["status"] == JOB_SUCCEEDED
+    assert job["stage"] == "index"
+    assert job["stage_timings"] == {"upload": 0.5, "index": 1.25}
+    assert job["result"] == {"details": {"indexed_chunks": 3}}
+    assert queue.counts() == {JOB_SUCCEEDED: 1}
+
+def test_stale_running_jobs_are_requeued_then_failed(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), stale_after=0.01, max_attempts=2)
+    job_id = queue.submit("a.md", str(tmp_path / "a"))
+
+    assert queue.claim("w1")["id"] == job_id
+    time.sleep(0.02)
+    assert queue.claim("w2")["attempts"] == 2
+    time.sleep(0.02)
+    assert queue.claim("w3") is None
+    assert queue.get(job_id)["status"] == JOB_FAILED
+
+def test_staged_file_is_removed_when_job_finishes(queue, tmp_path):
+    staged = [tmp_path / "a", tmp_path / "b"]
+    for path in staged:
+        path.write_bytes(b"data")
+    completed = queue.submit("a.md", str(staged[0]))
+    failed = queue.submit("b.md", str(staged[1]))
+    queue.claim("w1")
+    queue.claim("w1")
+
+    queue.complete(completed, {})
+    queue.fail(failed, "boom")
+
+    assert not any(path.exists() for path in staged)
+
+def test_staged_file_of_abandoned_job_is_removed(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), stale_after=0.01, max_attempts=1)
+    staged = tmp_path / "a"
+    staged.write_bytes(b"data")
+    queue.submit("a.md", str(staged))
+    queue.claim("w1")
+    time.sleep(0.02)
+
+    assert queue.claim("w2") is None
+    assert not staged.exists()
+
+def test_jobs_survive_reopening(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job_id = JobQueue(path).submit("a.md", "/tmp/a")
+    assert JobQueue(path).get(job_id)["status"] == JOB_QUEUED
+
+def test_job_options_are_stored(queue):
+    job_id = queue.submit("a.md", "/tmp/a", {"enrichment": "local"})
+    assert queue.get(job_id)["options"] == {"enrichment": "local"}
+    assert queue.get(queue.submit("b.md", "/tmp/b"))["options"] == {}
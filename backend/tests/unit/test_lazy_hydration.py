@@ -0,0 +1,72 @@
+import pytest
+from agents.langchain_integration import LangchainAgent
+from agents.search_agent import SearchAgent
+
+class Results:
+    def __init__(self, rows):
+        self.rows = iter(rows)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+CHUNKS = {
+    f"doc={i}": {"id": f"doc={i}", "parent_id": "doc", "chunk_number": i, "filename": "doc.md", "content": f"chunk {i}", "@search.score": 1.0 - i / 100}
+    for i in range(20)
+}
+
+class FakeSearchClient:
+    def __init__(self):
+        self.calls = []
+
+    async def search(self, search_text=None, select=None, filter=None, top=None, **kwargs):
+        self.calls.append({"select": select, "filter": filter})
+        if filter and filter.startswith("search.in"):
+            ids = filter.split("'")[1].split(",")
+            rows = [CHUNKS[chunk_id] for chunk_id in ids if chunk_id in CHUNKS]
+        else:
+            rows = list(CHUNKS.values())[:top]
+        return Results([{field: row[field] for field in select if field in row} | {"@search.score": row["@search.score"]} for row in rows])
+
+@pytest.fixture
+def search_agent(monkeypatch):
+    monkeypatch.setattr("config.config.Config.RETRIEVAL_CACHE_ENABLED", False)
+    agent = SearchAgent(session=object())
+    agent.client = FakeSearchClient()
+    return agent
+
+@pytest.mark.asyncio
+async def test_lazy_search_returns_ids_and_scores_only(search_agent):
+    results = await search_agent.hybrid_search("q", [0.1], top=20, lazy=True)
+
+    assert len(results) == 20 and "content" not in results[0]
+    assert results[3] | {"captions": []} == {"id": "doc=3", "parent_id": "doc", "chunk_number": 3, "published_date": "", "score": 0.97, "captions": []}
+    assert "content" not in search_agent.client.calls[0]["select"]
+
+@pytest.mark.asyncio
+async def test_only_kept_chunks_are_hydrated_and_bodies_are_reused(search_agent):
+    results = await search_agent.hybrid_search("q", [0.1], top=20, lazy=True)
+
+    first = await search_agent.hydrate(results[:2] + [{"id": "doc=gone", "score": 0.1}])
+    second = await search_agent.hydrate(results[1:3])
+
+    assert [result["content"] for result in first] == ["chunk 0", "chunk 1"]
+    assert [result["content"] for result in second] == ["chunk 1", "chunk 2"]
+    lookups = [call["filter"] for call in search_agent.client.calls[1:]]
+    assert lookups == ["search.in(id, 'doc=0,doc=1,doc=gone', ',')", "search.in(id, 'doc=2', ',')"]
+    assert search_agent.retrieval_metrics()["hydration"] == {"hits": 1, "misses": 4, "cached_bodies": 3}
+
+@pytest.mark.asyncio
+async def test_process_query_hydrates_after_selection(search_agent):
+    agent = LangchainAgent(search_agent, None, None)
+    agent.lazy_hydration = True
+
+    results = await agent.retrieve("q", [0.1], "Hybrid", top=5)
+
+    assert [result["content"] for result in results] == [f"chunk {i}" for i in range(5)]
+    assert len(search_agent.client.calls) == 2
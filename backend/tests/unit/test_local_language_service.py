@@ -0,0 +1,58 @@
+import pytest
+from agents.document_enhancer import DocumentEnhancer
+from agents.local_language_service import LocalLanguageService
+
+ENGLISH = ("The committee reviewed the budget for the new library. Funding for the library was approved "
+           "after a long debate. Members asked for a detailed report on construction costs. The weather "
+           "was pleasant that afternoon. Construction of the library will start next spring.")
+FRENCH = "Le conseil municipal a voté le budget de la nouvelle bibliothèque pour les habitants de la ville."
+GERMAN = "Der Stadtrat hat den Haushalt für die neue Bibliothek beschlossen und die Bauarbeiten beginnen bald."
+
+@pytest.fixture
+def service():
+    return LocalLanguageService()
+
+@pytest.mark.asyncio
+async def test_languages_are_detected_per_text(service):
+    assert await service.detect_languages([ENGLISH, FRENCH, GERMAN, "1234"]) == ["English", "French", "German", "Unknown"]
+
+@pytest.mark.asyncio
+async def test_key_phrases_skip_stopwords_and_rank_repeated_terms_first(service):
+    phrases = await service.extract_key_phrases_batch([ENGLISH, "", FRENCH])
+
+    assert phrases[0][0] == "library"
+    assert "construction costs" in phrases[0]
+    assert "library funding" not in phrases[0]
+    assert not {"the", "for", "was"} & set(phrases[0])
+    assert phrases[1] == []
+    assert len(phrases[0]) <= service.max_key_phrases
+
+@pytest.mark.asyncio
+async def test_summaries_keep_top_sentences_in_document_order(service):
+    short = "Only one sentence here."
+
+    summaries = await service.generate_summaries([ENGLISH, short])
+
+    sentences = [s for s in ENGLISH.split(". ")]
+    picked = [s for s in sentences if s.rstrip(".") in summaries[0]]
+    assert len(picked) == service.summary_sentences
+    assert "weather" not in summaries[0]
+    assert summaries[0].index(picked[0].rstrip(".")) < summaries[0].index(picked[-1].rstrip("."))
+    assert summaries[1] == short
+
+@pytest.mark.asyncio
+async def test_enhancer_uses_backend_requested_per_call(monkeypatch):
+    monkeypatch.setattr("config.config.Config.ENRICHMENT_CACHE_ENABLED", False)
+    enhancer = DocumentEnhancer(backend="local")
+
+    documents = await enhancer.enhance_documents([{"id": "a", "content": ENGLISH}], backend="local")
+
+    assert documents[0]["language"] == "English"
+    assert documents[0]["entities"] == []
+    assert "library" in documents[0]["key_phrases"]
+    with pytest.raises(ValueError):
+        await enhancer.process_chunks([{"id": "a", "content": ENGLISH}], backend="other")
+
+def test_unknown_default_backend_is_rejected():
+    with pytest.raises(ValueError):
+        DocumentEnhancer(backend="other")
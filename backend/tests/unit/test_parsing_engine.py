@@ -0,0 +1,54 @@
+import pytest
+from agents.parsing_engine import ParsingEngine, extractor_for, parse_document
+
+OPTIONS = {"read_size": 16, "front_matter_max_bytes": 1024, "chunk_size": 4, "chunk_overlap": 1}
+
+def test_extractor_is_chosen_by_extension():
+    assert extractor_for("notes.md") == "markdown"
+    assert extractor_for("page.HTML") == "html"
+    assert extractor_for("server.log") == "text"
+    assert extractor_for("unknown.bin") == "markdown"
+
+def test_parse_markdown_with_front_matter(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("---\ntitle: Hello\nauthor: Ann\n---\none two three four five six seven")
+
+    result = parse_document(str(path), "doc.md", "doc_md", dict(OPTIONS, spool_dir=str(tmp_path)))
+
+    assert result["parent"]["title"] == "Hello"
+    assert result["parent"]["author"] == "Ann"
+    assert len(result["parent"]["document_hash"]) == 64
+    with open(result["chunks_path"], encoding="utf-8") as spool:
+        lines = spool.read().splitlines()
+    assert result["chunk_count"] == len(lines) > 1
+    assert "title" not in "".join(lines)
+
+def test_parse_html_extracts_visible_text_and_meta(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text(
+        "<html><head><title>Page</title><meta name='keywords' content='a, b'>"
+        "<script>var hidden = 1;</script></head><body><p>visible words here</p></body></html>"
+    )
+
+    result = parse_document(str(path), "page.html", "page_html", dict(OPTIONS, spool_dir=str(tmp_path)))
+
+    assert result["parent"]["title"] == "Page"
+    assert result["parent"]["key_phrases"] == ["a", "b"]
+    with open(result["chunks_path"], encoding="utf-8") as spool:
+        assert "hidden" not in spool.read()
+
+@pytest.mark.asyncio
+async def test_engine_yields_chunk_documents_and_removes_spool(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("alpha beta gamma delta epsilon")
+    engine = ParsingEngine(dict(OPTIONS, spool_dir=str(tmp_path)), max_workers=0)
+
+    with await engine.parse(str(path), "doc.txt", "doc_txt") as parsed:
+        chunks = list(parsed.iter_chunks())
+        spool = parsed.chunks_path
+
+    assert len(chunks) == parsed.chunk_count > 1
+    assert [chunk["chunk_number"] for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk["parent_id"] == "doc_txt" and chunk["id"].startswith("doc_txt=") for chunk in chunks)
+    assert not (tmp_path / spool).exists()
+    engine.shutdown()
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pytest
+from agents.quantized_store import QuantizedStore
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(30, 32))
+    return (centers[rng.integers(0, 30, 3000)] + 0.5 * rng.normal(size=(3000, 32))).astype(np.float32)
+
+@pytest.mark.parametrize("quantizer", ["int8", "pq"])
+def test_quantized_search_keeps_recall_and_shrinks_memory(tmp_path, vectors, quantizer):
+    store = QuantizedStore(str(tmp_path), quantizer, subspaces=8)
+    store.build([f"c{i}" for i in range(2000)], vectors[:2000])
+    store.add([f"c{i}" for i in range(2000, 3000)], vectors[2000:])
+
+    report = store.recall_report(vectors[:40] + 0.05, k=10)
+
+    assert report["vectors"] == 3000
+    assert report["recall"] >= 0.9
+    assert report["resident_bytes_per_vector"] == (32 if quantizer == "int8" else 8)
+    assert report["float32_bytes_per_vector"] == 128
+
+def test_store_reopens_and_reranks_exactly(tmp_path, vectors):
+    QuantizedStore(str(tmp_path)).build([f"c{i}" for i in range(3000)], vectors)
+    store = QuantizedStore(str(tmp_path))
+
+    hits = store.search(vectors[7], k=3)[0]
+
+    assert hits[0][0] == "c7"
+    assert hits[0][1] == pytest.approx(0.0, abs=1e-5)
+    with pytest.raises(ValueError):
+        QuantizedStore(str(tmp_path), "pq")
+
+def test_appends_write_only_the_new_rows(tmp_path, vectors):
+    store = QuantizedStore(str(tmp_path))
+    store.add([f"c{i}" for i in range(100)], vectors[:100])
+    file_id = os.stat(store.codes_path).st_ino
+    for start in range(100, 1000, 100):
+        store.add([f"c{i}" for i in range(start, start + 100)], vectors[start:start + 100])
+
+    # Spare capacity absorbed every append, so the files were never rewritten
+    assert os.stat(store.codes_path).st_ino == file_id
+    reopened = QuantizedStore(str(tmp_path))
+    assert len(reopened) == 1000 and reopened.memory_bytes() == 1000 * 32
+    assert reopened.search(vectors[950], k=1)[0][0][0] == "c950"
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from agents.rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimiter
+
+def limiter(tmp_path, **kwargs):
+    return RateLimiter(str(tmp_path / "limits.db"), {"embed": (600, 6000), "free": (0, 0)}, **kwargs)
+
+@pytest.mark.asyncio
+async def test_requests_and_tokens_are_drawn_from_shared_buckets(tmp_path):
+    first, second = limiter(tmp_path), limiter(tmp_path)
+
+    await first.acquire("embed", tokens=3000)
+    await second.acquire("embed", tokens=2900)
+
+    # 100 tokens left, refilling at 100 per second
+    assert first._try_acquire("embed", 600, PRIORITY_INTERACTIVE) == pytest.approx(5.0, abs=0.1)
+    metrics = await second.metrics()
+    assert metrics["embed"]["available"]["tokens"] == pytest.approx(100, abs=10)
+    assert metrics["embed"]["granted"][PRIORITY_INTERACTIVE] == 1
+
+@pytest.mark.asyncio
+async def test_batch_work_leaves_the_interactive_reserve(tmp_path):
+    rate_limiter = limiter(tmp_path, interactive_reserve=0.2)
+    await rate_limiter.acquire("embed", tokens=4500, priority=PRIORITY_BATCH)
+
+    assert rate_limiter._try_acquire("embed", 500, PRIORITY_BATCH) > 0
+    assert rate_limiter._try_acquire("embed", 500, PRIORITY_INTERACTIVE) == 0.0
+
+@pytest.mark.asyncio
+async def test_throttling_blocks_the_deployment_and_waiters_are_counted(tmp_path):
+    rate_limiter = limiter(tmp_path, poll_interval=0.01)
+    await rate_limiter.acquire("embed", tokens=1)
+    await rate_limiter.throttled("embed", retry_after=0.2)
+
+    waiter = asyncio.create_task(rate_limiter.acquire("embed", tokens=1))
+    await asyncio.sleep(0.05)
+    assert (await rate_limiter.metrics())["embed"]["queue_depth"][PRIORITY_INTERACTIVE] == 1
+    await asyncio.wait_for(waiter, 2)
+    assert (await rate_limiter.metrics())["embed"]["queue_depth"][PRIORITY_INTERACTIVE] == 0
+
+@pytest.mark.asyncio
+async def test_unlimited_deployments_are_not_throttled(tmp_path):
+    rate_limiter = limiter(tmp_path)
+    await asyncio.wait_for(asyncio.gather(*(rate_limiter.acquire("free", 10 ** 6) for _ in range(100))), 1)
+    await rate_limiter.acquire("unknown")
+
+@pytest.mark.asyncio
+async def test_batch_waiters_poll_and_take_quota_freed_early(tmp_path):
+    rate_limiter = limiter(tmp_path, batch_poll_interval=0.02)
+    await rate_limiter.acquire("embed", tokens=1)
+    await rate_limiter.throttled("embed", retry_after=60)
+
+    waiter = asyncio.create_task(rate_limiter.acquire("embed", tokens=1, priority=PRIORITY_BATCH))
+    await asyncio.sleep(0.05)
+    assert (await rate_limiter.metrics())["embed"]["queue_depth"][PRIORITY_BATCH] == 1
+    # The block is lifted and the buckets refilled long before the computed wait is over
+    with rate_limiter._connect() as conn:
+        conn.execute("UPDATE buckets SET level = 6000, blocked_until = 0")
+
+    await asyncio.wait_for(waiter, 1)
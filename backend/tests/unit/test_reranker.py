@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+import pytest
+from agents.langchain_integration import LangchainAgent
+from agents.reranker import Reranker
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+def candidate(id, vector, content, published_date=""):
+    return {"id": id, "contentVector": vector, "content": content, "published_date": published_date, "score": 1.0}
+
+def test_each_signal_can_decide_the_order():
+    candidates = [
+        candidate("near", [1.0, 0.0], "unrelated words"),
+        candidate("far", [0.0, 1.0], "unrelated words"),
+    ]
+    assert [r["id"] for r in Reranker().rerank("query", [1.0, 0.1], candidates, k=2, now=NOW)] == ["near", "far"]
+
+    candidates = [
+        candidate("other", [1.0, 0.0], "something else entirely"),
+        candidate("match", [1.0, 0.0], "refund policy: a refund takes five days"),
+    ]
+    assert Reranker().rerank("refund policy", [1.0, 0.0], candidates, k=1, now=NOW)[0]["id"] == "match"
+
+    candidates = [
+        candidate("old", [1.0, 0.0], "same", "2010-01-01T00:00:00Z"),
+        candidate("new", [1.0, 0.0], "same", "2024-05-01"),
+        candidate("undated", [1.0, 0.0], "same"),
+    ]
+    reranked = Reranker().rerank("same", [1.0, 0.0], candidates, k=3, now=NOW)
+    assert [r["id"] for r in reranked] == ["new", "old", "undated"]
+    assert reranked[0]["rerank_score"] > reranked[1]["rerank_score"]
+
+def test_candidates_without_vectors_score_zero_similarity():
+    candidates = [candidate("missing", None, "text"), candidate("present", [2.0, 0.0], "text")]
+
+    assert [r["id"] for r in Reranker().rerank("text", [1.0, 0.0], candidates, k=2, now=NOW)] == ["present", "missing"]
+    assert Reranker().rerank("text", [1.0], [], k=2) == []
+
+class FakeSearchAgent:
+    def __init__(self):
+        self.calls = []
+
+    async def hybrid_search(self, query, embedding, top=5, filter=None, order_by=None, with_vectors=False, lazy=False):
+        self.calls.append((top, with_vectors))
+        return [candidate(f"c{i}", [float(i == 7), 1.0 - float(i == 7)], "text") for i in range(top)]
+
+@pytest.mark.asyncio
+async def test_retrieval_over_fetches_and_keeps_the_best():
+    search_agent = FakeSearchAgent()
+    agent = LangchainAgent(search_agent, None, None, reranker=Reranker())
+    agent.rerank_fetch = 50
+
+    results = await agent.retrieve("text", [1.0, 0.0], "Hybrid", top=3)
+
+    assert search_agent.calls == [(50, True)]
+    assert len(results) == 3 and results[0]["id"] == "c7"
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from agents.cache import AsyncCache
+from agents.index_version import IndexVersion
+from agents.search_agent import SearchAgent
+
+class Results:
+    def __init__(self, rows):
+        self.rows = iter(rows)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakeSearchClient:
+    def __init__(self):
+        self.calls = []
+
+    async def search(self, search_text=None, **kwargs):
+        self.calls.append((search_text, kwargs.get("filter"), kwargs.get("top")))
+        await asyncio.sleep(0.01)
+        return Results([{"id": "c1", "filename": "doc.md", "content": "text", "@search.score": 0.8}])
+
+@pytest.fixture
+def search_agent(tmp_path, monkeypatch):
+    version = IndexVersion(str(tmp_path / "version.db"))
+    monkeypatch.setattr("agents.search_agent.get_index_version", lambda: version)
+    agent = SearchAgent(session=object(), results_cache=AsyncCache("test.search.results", policy="lru"))
+    agent.client = FakeSearchClient()
+    agent.index_version = version
+    return agent
+
+@pytest.mark.asyncio
+async def test_identical_searches_hit_the_cache(search_agent):
+    embedding = [0.1, 0.2]
+
+    results = await asyncio.gather(*(search_agent.hybrid_search("query", embedding) for _ in range(3)))
+    await search_agent.hybrid_search("query", embedding, top=10)
+    await search_agent.hybrid_search("query", embedding, filter="author eq 'x'")
+    await search_agent.vector_search(embedding)
+    await search_agent.vector_search(embedding)
+
+    assert results[0] == results[1] == results[2]
+    assert results[0][0]["id"] == "c1" and results[0][0]["score"] == 0.8
+    assert search_agent.client.calls == [
+        ("query", None, 5), ("query", None, 10), ("query", "author eq 'x'", 5), (None, None, 5)
+    ]
+
+@pytest.mark.asyncio
+async def test_index_changes_invalidate_cached_results(search_agent):
+    await search_agent.hybrid_search("query", [0.1])
+    await search_agent.index_version.bump()
+    await search_agent.hybrid_search("query", [0.1])
+
+    assert len(search_agent.client.calls) == 2
@@ -0,0 +1,92 @@
+import pytest
+from agents.index_version import IndexVersion
+from agents.langchain_integration import LangchainAgent
+from agents.semantic_cache import SemanticAnswerCache, history_digest
+from langchain_core.messages import HumanMessage
+
+def test_paraphrases_above_the_threshold_reuse_the_answer():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store([1.0, 0.1, 0.0], "Hybrid", 3, [{"id": "a"}], "answer")
+
+    assert cache.lookup([2.0, 0.3, 0.0], "Hybrid", 3) == ([{"id": "a"}], "answer")
+    assert cache.lookup([0.0, 1.0, 0.0], "Hybrid", 3) is None
+    assert cache.lookup([1.0, 0.1, 0.0], "Vector", 3) is None
+    assert cache.lookup([1.0, 0.1, 0.0], "Hybrid", 3, context=history_digest([HumanMessage("earlier question")])) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+def test_entries_from_an_older_index_version_are_dropped():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store([1.0, 0.0], "Vector", 1, [], "old")
+
+    assert cache.lookup([1.0, 0.0], "Vector", 2) is None
+    assert len(cache) == 0
+
+def test_oldest_entries_make_room():
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=2)
+    for i, vector in enumerate(([1.0, 0.0], [0.0, 1.0], [1.0, 1.0])):
+        cache.store(vector, "Vector", 0, [], str(i))
+
+    assert len(cache) == 2
+    assert cache.lookup([1.0, 0.0], "Vector", 0) is None
+    assert cache.lookup([1.0, 1.0], "Vector", 0) == ([], "2")
+
+@pytest.mark.asyncio
+async def test_index_version_is_shared_and_advances(tmp_path):
+    first, second = IndexVersion(str(tmp_path / "version.db")), IndexVersion(str(tmp_path / "version.db"))
+
+    assert await first.current() == 0
+    assert await second.bump() == 1
+    assert await first.current() == 1
+
+class FakeEmbeddingAgent:
+    async def generate_embedding(self, query):
+        return [1.0, 0.0] if "refund" in query else [0.0, 1.0]
+
+class FakeSearchAgent:
+    def __init__(self):
+        self.calls = 0
+
+    async def hybrid_search(self, query, embedding, top=5, with_vectors=False, lazy=False):
+        self.calls += 1
+        return [{"id": "chunk", "content": "Refunds take 5 days."}]
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_response(self, prompt):
+        self.calls += 1
+        return "Five days."
+
+@pytest.mark.asyncio
+async def test_repeat_questions_skip_retrieval_and_the_llm(tmp_path, monkeypatch):
+    version = IndexVersion(str(tmp_path / "version.db"))
+    monkeypatch.setattr("agents.langchain_integration.get_index_version", lambda: version)
+    search_agent, llm = FakeSearchAgent(), FakeLLM()
+    agent = LangchainAgent(search_agent, FakeEmbeddingAgent(), llm, answer_cache=SemanticAnswerCache(threshold=0.95))
+
+    first = await agent.process_query("how long does a refund take", "Hybrid")
+    # Each question opens a new conversation, so the chat histories match
+    agent.memory.clear()
+    second = await agent.process_query("refund duration?", "Hybrid")
+    agent.memory.clear()
+    await version.bump()
+    third = await agent.process_query("refund duration?", "Hybrid")
+
+    assert first == second == third
+    assert search_agent.calls == 2 and llm.calls == 2
+
+@pytest.mark.asyncio
+async def test_follow_ups_only_match_answers_given_after_the_same_history(tmp_path, monkeypatch):
+    version = IndexVersion(str(tmp_path / "version.db"))
+    monkeypatch.setattr("agents.langchain_integration.get_index_version", lambda: version)
+    search_agent, llm = FakeSearchAgent(), FakeLLM()
+    agent = LangchainAgent(search_agent, FakeEmbeddingAgent(), llm, answer_cache=SemanticAnswerCache(threshold=0.95))
+
+    await agent.process_query("which plans are there?", "Hybrid")
+    await agent.process_query("and what about the second one?", "Hybrid")
+    agent.memory.clear()
+    await agent.process_query("how long does a refund take", "Hybrid")
+    await agent.process_query("and what about the second one?", "Hybrid")
+
+    assert llm.calls == 4
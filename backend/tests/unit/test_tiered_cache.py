@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from agents.cache import AsyncCache
+from agents.embedding_cache import EmbeddingCache
+from agents.enrichment_cache import EnrichmentCache, text_key
+from agents.tiered_cache import MISSING, SharedCacheStore, decode_value, encode_value
+
+def test_values_round_trip_with_numpy_buffers():
+    vector = np.arange(6, dtype=np.float32).reshape(2, 3)
+    result = {"answer": "42", "scores": [0.5, 1], "vector": np.ones(2, dtype=np.float32)}
+
+    assert np.array_equal(decode_value(encode_value(vector)), vector)
+    assert decode_value(encode_value(vector)).dtype == np.float32
+    decoded = decode_value(encode_value(result))
+    assert decoded["answer"] == "42" and decoded["scores"] == [0.5, 1]
+    assert np.allclose(decoded["vector"], [1.0, 1.0])
+
+@pytest.mark.asyncio
+async def test_workers_share_results_through_the_store(tmp_path):
+    # Two caches on one file stand in for two uvicorn worker processes
+    first = AsyncCache("test.tiered", policy="lru", store=SharedCacheStore(str(tmp_path / "shared.db")))
+    second = AsyncCache("test.tiered", policy="lru", store=SharedCacheStore(str(tmp_path / "shared.db")))
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"content": "cached", "score": 0.9}
+
+    assert await first.get_or_compute("key", compute) == {"content": "cached", "score": 0.9}
+    assert await second.get_or_compute("key", compute) == {"content": "cached", "score": 0.9}
+    assert await second.get_or_compute("key", compute) == {"content": "cached", "score": 0.9}
+    assert calls == [1]
+    assert second.stats()["shared_hits"] == 1 and second.stats()["hits"] == 1
+
+    first.invalidate("key")
+    await next(iter(first._pending_deletes))
+    assert await second.store.get("test.tiered", "key") is MISSING
+
+@pytest.mark.asyncio
+async def test_expired_and_evicted_entries_are_dropped(tmp_path):
+    store = SharedCacheStore(str(tmp_path / "shared.db"), max_bytes=100, evict_every=1)
+    await store.put("ns", "old", "x" * 60)
+    await store.put("ns", "expired", "y", ttl=-1)
+    await store.put("ns", "new", "z" * 60)
+
+    assert await store.get("ns", "old") is MISSING
+    assert await store.get("ns", "expired") is MISSING
+    assert await store.get("ns", "new") == "z" * 60
+    assert (await store.stats())["ns"]["entries"] == 1
+
+@pytest.mark.asyncio
+async def test_embedding_cache_serves_recent_vectors_from_memory(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), memory_items=1)
+    await cache.put_many("deployment:model", {text_key("a"): [1.0, 2.0], text_key("b"): [3.0, 4.0]})
+
+    found = await cache.get_many("deployment:model", [text_key("a"), text_key("b")])
+
+    assert found[text_key("a")].tolist() == [1.0, 2.0] and found[text_key("b")].tolist() == [3.0, 4.0]
+    assert cache.stats()["memory_hits"] == 1 and cache.stats()["hits"] == 2
+
+@pytest.mark.asyncio
+async def test_caches_on_one_store_keep_to_their_own_namespaces(tmp_path):
+    path = str(tmp_path / "shared.db")
+    embeddings, enrichments = EmbeddingCache(path, memory_items=0), EnrichmentCache(path)
+    await embeddings.put_many("deployment:model", {"hash": [1.0, 2.0]})
+    await enrichments.put_many("deployment:model", "summary", {"hash": "a summary"})
+
+    await embeddings.clear()
+
+    assert await embeddings.get_many("deployment:model", ["hash"]) == {}
+    assert await enrichments.get_many("deployment:model", "summary", ["hash"]) == {"hash": "a summary"}
+    assert set(await SharedCacheStore(path).stats()) == {"enrichment:deployment:model:summary"}
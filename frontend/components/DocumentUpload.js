@@ -1,6 +1,23 @@
 import { useState } from 'react';
 
 const BACKEND_URL = 'http://localhost:8000'; // Adjust this if needed
+const JOB_POLL_INTERVAL_MS = 2000;
+
+// Queued uploads are indexed by a background worker; wait for the job to finish
+async function waitForJob(jobId) {
+  while (true) {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const response = await fetch(`${BACKEND_URL}/jobs/${jobId}`);
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.detail || 'Could not read ingestion job status');
+    }
+    const job = await response.json();
+    if (job.status === 'succeeded' || job.status === 'failed') {
+      return job;
+    }
+  }
+}
 
 export default function DocumentUpload({ updateDocumentCount }) {
   const [file, setFile] = useState(null);
@@ -25,7 +42,16 @@ export default function DocumentUpload({ updateDocumentCount }) {
 
       if (response.ok) {
         const result = await response.json();
-        if (result.success) {
+        if (result.success && result.status === 'queued') {
+          const job = await waitForJob(result.job_id);
+          if (job.status === 'succeeded') {
+            alert('Document uploaded and indexed successfully!');
+            setFile(null);
+            await updateDocumentCount();
+          } else {
+            alert(`Failed to index document: ${job.error || 'Unknown error'}`);
+          }
+        } else if (result.success) {
           alert('Document uploaded and indexed successfully!');
           setFile(null);
           await updateDocumentCount();
@@ -49,7 +75,7 @@ export default function DocumentUpload({ updateDocumentCount }) {
       <h2>Upload and Index Documents</h2>
       <input type="file" onChange={handleFileChange} accept=".txt,.pdf,.doc,.docx" />
       <button onClick={handleUpload} disabled={!file || uploading}>
-        {uploading ? 'Uploading...' : 'Upload and Index'}
+        {uploading ? 'Uploading and indexing...' : 'Upload and Index'}
       </button>
     </div>
   );
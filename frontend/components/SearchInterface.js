@@ -1,4 +1,7 @@
-import { useState } from 'react';
+import { useState, useEffect } from 'react';
+
+// Offered until the backend reports what it supports; Local needs LOCAL_INDEX_ENABLED
+const DEFAULT_SEARCH_TYPES = ['Vector', 'Hybrid', 'Fused'];
 
 export default function SearchInterface() {
   const [query, setQuery] = useState('');
@@ -6,6 +9,14 @@ export default function SearchInterface() {
   const [results, setResults] = useState([]);
   const [conversation, setConversation] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [searchTypes, setSearchTypes] = useState(DEFAULT_SEARCH_TYPES);
+
+  useEffect(() => {
+    fetch('/api/searchTypes')
+      .then((response) => (response.ok ? response.json() : Promise.reject(response.status)))
+      .then((data) => setSearchTypes(data.searchTypes))
+      .catch((error) => console.error('Error fetching search types:', error));
+  }, []);
 
   const handleSearch = async () => {
     setLoading(true);
@@ -37,8 +48,9 @@ export default function SearchInterface() {
           placeholder="Enter your query"
         />
         <select value={searchType} onChange={(e) => setSearchType(e.target.value)}>
-          <option value="Vector">Vector</option>
-          <option value="Hybrid">Hybrid</option>
+          {searchTypes.map((type) => (
+            <option key={type} value={type}>{type}</option>
+          ))}
         </select>
         <button onClick={handleSearch} disabled={loading}>
           {loading ? 'Searching...' : 'Search'}
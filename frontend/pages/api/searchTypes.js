@@ -0,0 +1,20 @@
+// pages/api/searchTypes.js
+export default async function handler(req, res) {
+  if (req.method === 'GET') {
+    try {
+      const backendUrl = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000';
+      const response = await fetch(`${backendUrl}/search_types`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const data = await response.json();
+      res.status(200).json({ searchTypes: data.search_types });
+    } catch (error) {
+      console.error('Error fetching search types:', error);
+      res.status(500).json({ error: 'Failed to fetch search types' });
+    }
+  } else {
+    res.setHeader('Allow', ['GET']);
+    res.status(405).end(`Method ${req.method} Not Allowed`);
+  }
+}